@@ -0,0 +1,87 @@
+"""Benchmark the AURIC file parsers on synthetic files.
+
+Times read_auric_file, auric_file_reader.read (both engines), parse_params
+and read_radtrans_options on files of several sizes, and reports the
+throughput and the peak memory allocated while parsing. No AURIC
+installation is needed.
+
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --sizes 100x20 2000x400 --repeat 5 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from pyauric.manager import read_auric_file, parse_params, read_radtrans_options
+from pyauric.reader import auric_file_reader
+from pyauric.synthetic import make_run_dir
+
+_default_sizes = ["100x20", "1000x100", "2000x400"]
+
+
+def parsers():
+    """(name, file, function) for each benchmark."""
+    reader = auric_file_reader()
+    return [("read_auric_file", "atmos.ver", read_auric_file),
+            ("read_auric_file[3 features]", "atmos.ver",
+             lambda f: read_auric_file(f, features=["1304 A (initial)", "1356 A (initial)", "6300 A (initial)"])),
+            ("auric_file_reader[fortran]", "atmos.ver", lambda f: reader.read(f, engine="fortran")),
+            ("auric_file_reader[numpy]", "atmos.ver", lambda f: reader.read(f, engine="numpy")),
+            ("auric_file_reader[numpy] .int", "losint.int", lambda f: reader.read(f, engine="numpy")),
+            ("parse_params", "param.inp", parse_params),
+            ("read_radtrans_options", "radtrans.opt", read_radtrans_options)]
+
+
+def measure(function, filename, repeat):
+    """Best wall time of `repeat` calls and peak memory of one call."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(filename)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function(filename)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes, nza, repeat):
+    results = []
+    with TemporaryDirectory(prefix="pyauric-bench-") as tempdir:
+        for size in sizes:
+            nalt, nfeatures = map(int, size.split("x"))
+            path = make_run_dir(os.path.join(tempdir, size), nalt=nalt, nza=nza, nfeatures=nfeatures)
+            for name, fname, function in parsers():
+                filename = os.path.join(path, fname)
+                nbytes = os.path.getsize(filename)
+                seconds, peak = measure(function, filename, repeat)
+                results.append({"benchmark": name, "size": size, "bytes": nbytes, "seconds": seconds,
+                                "MB/s": nbytes / seconds / 1e6, "peak_MB": peak / 1e6})
+                print("{:32s} {:>10s} {:10.2f} kB {:10.4f} s {:10.2f} MB/s {:8.2f} MB peak".format(
+                    name, size, nbytes / 1e3, seconds, nbytes / seconds / 1e6, peak / 1e6))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=_default_sizes,
+                        help="NALTxFEATURES for each set of files (default: %(default)s)")
+    parser.add_argument("--nza", type=int, default=37, help="number of zenith angles in .int files")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per benchmark, the best is reported")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    results = run(args.sizes, args.nza, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
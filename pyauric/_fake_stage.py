@@ -0,0 +1,135 @@
+"""The executable installed by pyauric.fake.FakeAURIC.
+
+Every fake AURIC command is a link to this script, which runs the stage
+named by the link. It only uses the standard library, so a command starts
+in a few milliseconds; its settings, including the stage costs, are read
+from fake-auric.json next to it. Only geoparm imports pyauric.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+
+_param_line = re.compile( r"^\s*(\S+)\s*=\s*(\S+)\s*:" )
+
+def read_params():
+    params = {}
+    with open( 'param.inp' ) as f:
+        for line in f:
+            m = _param_line.match( line )
+            if m:
+                params[m.group(1)] = float( m.group(2) )
+    return params
+
+def read_view():
+    with open( 'view.inp' ) as f:
+        lines = f.read().split( "\n" )
+    return float( lines[0].split()[0] ), [ float( x ) for x in lines[1:] if x.strip() ]
+
+def deck_digest():
+    h = hashlib.sha1()
+    for fname in ( 'param.inp', 'view.inp', 'radtrans.opt' ):
+        try:
+            with open( fname, 'rb' ) as f:
+                h.update( f.read() )
+        except FileNotFoundError:
+            pass
+    return h.hexdigest()
+
+def injected( name, stage, config, rng ):
+    """Whether `stage` is made to fail or hang, `name` being 'fail' or 'hang'."""
+    forced = os.getenv( "PYAURIC_FAKE_" + name.upper(), "" )
+    if stage in [ s.strip() for s in forced.split( "," ) ]:
+        return True
+    return rng.random() < config[name].get( stage, 0.0 )
+
+def spend( seconds, mode ):
+    deadline = time.monotonic() + seconds
+    if mode == "cpu":
+        x = 0
+        while time.monotonic() < deadline:
+            for i in range( 10000 ):
+                x += i
+    else:
+        time.sleep( max( seconds, 0.0 ) )
+
+def block( values, fmt, per_line=6 ):
+    return "".join( "".join( fmt.format( x ) for x in values[i:i+per_line] ) + "\n"
+                    for i in range( 0, len(values), per_line ) )
+
+def write_output( fname, first, index_heading, index, name, features, rng ):
+    """Write an output file in the layout of pyauric.synthetic."""
+    parts = [ first, index_heading + "\n", block( index, "{:12.2f}" ), name + "\n" ]
+    for feature in features:
+        scale = 10.0**rng.randint( -5, 7 )
+        parts.append( feature + "\n" )
+        parts.append( block( [ rng.lognormvariate( 0, 2 ) * scale for _ in index ], "{:12.3E}" ) )
+    with open( fname, 'w' ) as f:
+        f.write( "".join( parts ) )
+
+def write( stage, kind, params, config, rng ):
+    fname = config["outputs"][stage]
+    features = config["features"]
+    if kind == "volume":
+        nalt = int( params.get( 'NALT', 100 ) )
+        top = params.get( 'ZUB', 1000.0 )
+        alt = [ 80 + ( top - 80 ) * i / max( nalt - 1, 1 ) for i in range( nalt ) ]
+        write_output( fname, "{:5d}{:5d}\n".format( nalt, len(features) ), "Altitudes (km)", alt,
+                      "Volume emission rates (ph/cm3/s)", features, rng )
+        return
+    zobs, za = read_view()
+    if kind == "sight":
+        write_output( fname, "{:5d}{:5d}\nZOBS = {:7.3f} km\n".format( len(za), len(features), zobs ),
+                      "Zenith Angles (deg)", za, "Intensities (R)", features, rng )
+    else:
+        nwave = config["nwave"]
+        wave = [ 1000 + 1000.0 * i / max( nwave - 1, 1 ) for i in range( nwave ) ]
+        write_output( fname, "{:5d}{:5d}\n".format( nwave, len(za) ), "Wavelengths (A)", wave,
+                      "Synthetic spectra (R/A)", [ "ZA {:6.2f} deg".format( x ) for x in za ], rng )
+
+def geoparm( params, config ):
+    """Set SZA and SLT in param.inp, as geoparm does. Reads whether to compute F10.7 and Ap from stdin."""
+    sys.stdin.readline()
+    sys.path.insert( 0, config["package"] )
+    from pyauric.geometry import solar_geometry
+    from pyauric.manager import update_params
+    sza, slt = solar_geometry( params['YYDDD'], params['UTSEC'], params['GLAT'], params['GLON'] )
+    update_params( 'param.inp', { 'SZA':float( sza ), 'SLT':float( slt ) } )
+
+def main( stage, config ):
+    """Run the fake `stage` in the current directory. Returns the exit status."""
+    with open( config ) as f:
+        config = json.load( f )
+    params = read_params()
+    digest = deck_digest()
+    rng = random.Random( "{}:{}:{}".format( config["seed"], stage, digest ) ) \
+          if config["seed"] is not None else random.Random()
+
+    needs = config["needs"].get( stage, [] )
+    if needs and not any( os.path.exists( f ) for f in needs ):
+        print( "{}: missing input, one of {}".format( stage, " ".join( needs ) ), file=sys.stderr )
+        return 2
+    if injected( "hang", stage, config, rng ):
+        print( "{}: hanging".format( stage ), flush=True )
+        while True:
+            time.sleep( 60 )
+    seconds = config["cost"][stage] * config["time_scale"]
+    if stage not in config["fixed"]:
+        seconds *= params.get( 'NALT', config["reference_nalt"] ) / config["reference_nalt"]
+    print( "{}: running for {:.3f} s".format( stage, seconds ), flush=True )
+    spend( seconds, config["mode"] )
+    if injected( "fail", stage, config, rng ):
+        print( "{}: injected failure".format( stage ), file=sys.stderr )
+        return 1
+    if stage == 'geoparm':
+        geoparm( params, config )
+    else:
+        write( stage, config["kinds"][stage], params, config, random.Random( stage + digest ) )
+    return 0
+
+if __name__ == "__main__":
+    here = os.path.dirname( os.path.abspath( sys.argv[0] ) )
+    sys.exit( main( os.path.basename( sys.argv[0] ), os.path.join( here, "fake-auric.json" ) ) )
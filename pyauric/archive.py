@@ -0,0 +1,183 @@
+"""Binary archives of AURIC output files.
+
+Parsing the text outputs again every time an old run is opened is slow. An
+archive holds everything auric_file_reader.read returns, plus the param.inp
+values of the run, in a file that is memory-mapped when it is opened:
+
+    write_archive('/runs/glat30/mergeint.int', params=auric.params)
+    arc = read_archive('/runs/glat30/mergeint.int.pyar')
+    arc.profile('1356 A (initial)')     # a view into the file, nothing is copied
+
+AURICManager.load reads the archive instead of the text file when there is
+one next to it, made from the current version of the text file.
+
+Layout: the 8 byte magic string, the length of the header as a little-endian
+uint64, the header as JSON, padding to a multiple of 64 bytes, then a C-order
+array of shape (1 + number of features, length) whose first row is the index
+(ALT or ZA) and whose other rows are the features, in the order of the file.
+"""
+import os
+import json
+import struct
+from collections import OrderedDict
+
+import numpy as np
+try:
+    import pandas as pd
+except ImportError as err:
+    _has_pandas=False
+else:
+    _has_pandas=True
+
+from .reader import auric_file_reader
+from .cache import _file_stamp
+
+_magic = b'PYAURIC\x01'
+_align = 64
+suffix = '.pyar'
+
+def archive_name( filename ):
+    """Name of the archive of AURIC output file `filename`."""
+    return filename + suffix
+
+def _jsonable( value ):
+    if isinstance( value, (bool, int, float, np.number) ):
+        return value.item() if isinstance( value, np.number ) else value
+    return str( value )
+
+def write_archive( filename, archive=None, params=None, dtype=np.float64, reader=None ):
+    """Convert AURIC output file `filename` to an archive.
+
+    Parameters
+    ----------
+    filename: string
+        AURIC output file
+    archive: string, optional
+        name of the archive. Default is archive_name(filename).
+    params: dictionary, optional
+        param.inp values of the run. Default is read from param.inp next to
+        `filename`, if there is one.
+    dtype: [ float64 | float32 ]
+        type of the stored values
+    reader: auric_file_reader, optional
+        reader for the text file
+
+    Returns
+    -------
+    archive: string
+    """
+    from .manager import parse_params
+    archive = archive_name( filename ) if archive is None else archive
+    reader = auric_file_reader( engine='numpy' ) if reader is None else reader
+    stamp = _file_stamp( filename )
+    out = reader.read( filename, returnDataFrame=False )
+    if params is None:
+        fpath = os.path.join( os.path.dirname( filename ), 'param.inp' )
+        params = {x[0]:x[1] for x in parse_params( fpath ) if len(x)>1} if os.path.isfile( fpath ) else {}
+    (heading, index), = out['index'].items()
+    columns = [ np.asarray( index ) ] + [ np.asarray( v ) for v in out['data'].values() ]
+    for name, column in zip( out['data'], columns[1:] ):
+        if len(column) != len(index):
+            raise ValueError( "{} has {} values of {!r}, but {} of {!r}".format(
+                filename, len(column), name, len(index), heading ) )
+    dtype = np.dtype( dtype ).newbyteorder( '<' )
+    header = OrderedDict( [ ("version", 1),
+                            ("dtype", dtype.str),
+                            ("length", len(index)),
+                            ("index", heading),
+                            ("ylabel", out['ylabel']),
+                            ("features", list( out['data'] )),
+                            ("info", out['info']),
+                            ("params", {k:_jsonable( v ) for k, v in params.items()}),
+                            ("source", {"name":os.path.basename( filename ), "stamp":list( stamp )}) ] )
+    text = json.dumps( header ).encode()
+    offset = -( -( len(_magic) + 8 + len(text) ) // _align ) * _align
+    tmp = os.path.join( os.path.dirname( archive ), ".{}.tmp".format( os.path.basename( archive ) ) )
+    try:
+        with open( tmp, 'wb' ) as f:
+            f.write( _magic + struct.pack( '<Q', len(text) ) + text )
+            f.write( b' ' * ( offset - f.tell() ) )
+            f.write( np.asarray( columns, dtype=dtype ).tobytes() )
+        os.replace( tmp, archive )
+    finally:
+        if os.path.exists( tmp ):
+            os.remove( tmp )
+    return archive
+
+class AURICArchive( object ):
+    """An archive opened with read_archive.
+
+    Attributes
+    ----------
+    header: OrderedDict
+        'index' and 'ylabel' headings, 'features', 'info' lines,
+        'params' and 'source' file name and stamp
+    data: memmap
+        the index in row 0, then one row per feature
+    """
+    def __init__( self, filename ):
+        self.filename = filename
+        with open( filename, 'rb' ) as f:
+            if f.read( len(_magic) ) != _magic:
+                raise ValueError( "{} is not a pyauric archive".format( filename ) )
+            size, = struct.unpack( '<Q', f.read( 8 ) )
+            self.header = json.loads( f.read( size ).decode(), object_pairs_hook=OrderedDict )
+        offset = -( -( len(_magic) + 8 + size ) // _align ) * _align
+        shape = ( 1 + len( self.header["features"] ), self.header["length"] )
+        if shape[0] * shape[1]:
+            self.data = np.memmap( filename, dtype=self.header["dtype"], mode='r', offset=offset, shape=shape )
+        else:
+            self.data = np.zeros( shape, dtype=self.header["dtype"] )
+        self._rows = { name:i + 1 for i, name in enumerate( self.header["features"] ) }
+
+    @property
+    def features( self ):
+        return list( self.header["features"] )
+
+    @property
+    def params( self ):
+        return dict( self.header["params"] )
+
+    @property
+    def index( self ):
+        return self.data[0]
+
+    def profile( self, feature ):
+        """Values of `feature`, as a view into the archive."""
+        return self.data[self._rows[feature]]
+
+    def is_current( self, filename=None ):
+        """Whether the text file the archive was made from is unchanged.
+
+        The text file is looked for next to the archive unless `filename`
+        is given. An archive whose text file is gone is current.
+        """
+        if filename is None:
+            filename = os.path.join( os.path.dirname( self.filename ), self.header["source"]["name"] )
+        try:
+            return list( _file_stamp( filename ) ) == self.header["source"]["stamp"]
+        except FileNotFoundError:
+            return True
+
+    def read( self, returnDataFrame=True ):
+        """The same DataFrame or dictionary as auric_file_reader.read, backed by the archive."""
+        h = self.header
+        source = os.path.join( os.path.dirname( self.filename ), h["source"]["name"] )
+        title = "Data from {}".format( h["source"]["name"] )
+        if returnDataFrame and _has_pandas:
+            idx = pd.Index( self.index, name=h["index"] )
+            df = pd.DataFrame( self.data[1:].T, index=idx, columns=h["features"], copy=False )
+            df.ylabel = h["ylabel"]
+            df.filename = source
+            df.title = title
+            return df
+        return { 'info':list( h["info"] ),
+                 'index':OrderedDict( [ (h["index"], self.index) ] ),
+                 'data':OrderedDict( (name, self.profile( name )) for name in h["features"] ),
+                 'ylabel':h["ylabel"],
+                 'filename':source,
+                 'title':title }
+
+def read_archive( filename ):
+    """Open the archive `filename`."""
+    return AURICArchive( filename )
@@ -1,5 +1,15 @@
+import os
+import json
+import asyncio
+import logging
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 from .bands import band_command
 
+logger = logging.getLogger(__name__)
+
 
 def assemble_batch_run(auric):
     """Yield the sequence of AURIC commands in a batch run.
@@ -12,7 +22,24 @@ def assemble_batch_run(auric):
     ------
     cmd: Command in the batch run
     """
-    sza = auric.params['SZA']
+    yield from (auric.new_command(c) for c in batch_stages(auric))
+
+
+def batch_stages(auric, params=None):
+    """Names of the commands in the batch run of `auric`.
+
+    Parameters
+    ----------
+    auric: AURICManager
+    params: dictionary, optional
+        param.inp values to use instead of the current ones, e.g. for a
+        sweep case that has not been set up yet
+
+    Returns
+    -------
+    names: list of strings
+    """
+    sza = dict(auric.params, **(params or {}))['SZA']
     daytime = (0 < sza) and (sza < 90)
     nighttime = (110 < sza) and (sza < 180)
     if not (daytime or nighttime):
@@ -22,13 +49,12 @@ def assemble_batch_run(auric):
     lyman_beta = auric.exists('ly_beta.opt')
     synthetic_spectra = auric.band_options
     use_eflux = auric.use_eflux
-    yield from (auric.new_command(c)
-                for c in airglow_sequence(daytime,
-                                          optically_thick,
-                                          lyman_alpha,
-                                          lyman_beta,
-                                          synthetic_spectra,
-                                          use_eflux))
+    return list(airglow_sequence(daytime,
+                                 optically_thick,
+                                 lyman_alpha,
+                                 lyman_beta,
+                                 synthetic_spectra,
+                                 use_eflux))
 
 
 def airglow_sequence(daytime,
@@ -73,3 +99,409 @@ def dayglow_sequence(use_eflux):  # implement this fully later because nightglow
                 'e_impact',
                 'daychem',
                 'mergever']
+
+
+# Input files each stage reads from the working directory. Intermediate
+# files are not listed: they differ between AURIC versions, so the outputs of
+# a stage are recorded when it runs instead.
+_stage_inputs = {'atmos': ['param.inp', 'dbpath.inp'],
+                 'ionos': ['param.inp', 'dbpath.inp'],
+                 'solar': ['param.inp', 'dbpath.inp'],
+                 'colden': ['param.inp'],
+                 'pesource': ['param.inp'],
+                 'peflux': ['param.inp'],
+                 'eflux': ['param.inp'],
+                 'e_impact': ['param.inp'],
+                 'daychem': ['param.inp'],
+                 'niteglo': ['param.inp'],
+                 'losden': ['view.inp'],
+                 'radtrans': ['radtrans.opt', 'view.inp'],
+                 'losint': ['radtrans.opt', 'view.inp'],
+                 'ly_alpha': ['ly_alpha.opt', 'view.inp'],
+                 'ly_beta': ['ly_beta.opt', 'view.inp'],
+                 }
+
+# Stages whose outputs each stage reads, if they are part of the run. Apart
+# from solar, the volume emission stages are kept in a chain; the
+# line-of-sight stages after losden are where stages can run independently.
+_stage_after = {'atmos': [],
+                'ionos': ['atmos'],
+                'solar': [],
+                'colden': ['atmos', 'solar'],
+                'pesource': ['solar', 'colden'],
+                'peflux': ['ionos', 'pesource'],
+                'eflux': ['ionos', 'pesource'],
+                'e_impact': ['peflux', 'eflux'],
+                'daychem': ['e_impact'],
+                'mergever': ['e_impact', 'daychem'],
+                'niteglo': ['atmos', 'ionos'],
+                'losden': ['atmos', 'mergever', 'niteglo'],
+                'radtrans': ['losden', 'mergever', 'niteglo'],
+                'losint': ['losden', 'mergever', 'niteglo', 'radtrans'],
+                'ly_alpha': ['atmos', 'losden'],
+                'ly_beta': ['atmos', 'losden'],
+                'mergeint': ['losint', 'ly_alpha', 'ly_beta'],
+                }
+
+_ledger_name = '.pyauric-batch.json'
+
+
+def stage_inputs(name):
+    """Files in the working directory that stage `name` reads."""
+    return list(_stage_inputs.get(name, []))
+
+
+def stage_graph(names):
+    """Map each stage in `names` to the stages in `names` it depends on.
+
+    Parameters
+    ----------
+    names: list of strings
+        command names in the order they run, e.g. from airglow_sequence
+
+    Returns
+    -------
+    graph: OrderedDict
+    """
+    graph = OrderedDict()
+    for name in names:
+        if name.startswith('syn_'):
+            after = ['mergeint']
+        elif name == 'mergesyn':
+            after = ['mergeint'] + [n for n in names if n.startswith('syn_')]
+        else:
+            after = _stage_after.get(name, [])
+        graph[name] = [n for n in after if n in graph]
+    return graph
+
+
+def _snapshot(path):
+    """Modification time and size of every file in `path`."""
+    out = {}
+    for entry in os.scandir(path):
+        if entry.is_file() and entry.name != _ledger_name:
+            st = entry.stat()
+            out[entry.name] = (st.st_mtime_ns, st.st_size)
+    return out
+
+
+def file_digest(filename):
+    """SHA-1 hash of the contents of a file, or None if it is missing."""
+    h = hashlib.sha1()
+    try:
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(2**20), b''):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+def _entry(filename, digest=True):
+    """Ledger entry of a file: [mtime, size, hash], or None if it is missing."""
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size, file_digest(filename) if digest else None]
+
+
+def _matches(filename, entry):
+    """Whether a file is the one a ledger entry describes.
+
+    A file whose modification time or size changed still matches if its
+    hash is unchanged, when the entry has one."""
+    now = _entry(filename, False)
+    if now is None or entry is None:
+        return now is entry
+    if now[:2] == list(entry[:2]):
+        return True
+    return entry[2] is not None and file_digest(filename) == entry[2]
+
+
+class BatchLedger(object):
+    """Stamps and hashes of the inputs and outputs of the last run of each stage.
+
+    The ledger is kept in a hidden file in the working directory, so it
+    travels with the directory and survives between sessions.
+
+    Parameters
+    ----------
+    path: string
+        AURIC working directory
+    """
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.join(path, _ledger_name)
+        try:
+            with open(self.filename) as f:
+                self.stages = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.stages = {}
+
+    def stale(self, name, rerun=(), after=None):
+        """Why stage `name` has to run again, or None if it is up to date.
+
+        Parameters
+        ----------
+        name: string
+            stage name
+        rerun: collection of strings
+            upstream stages of `name` that are running again
+        after: list of strings, optional
+            upstream stages of `name` in this batch (see stage_graph). The
+            stage is stale if they differ from the ones it last ran after,
+            e.g. when radtrans or a synthetic band is switched off.
+        """
+        record = self.stages.get(name)
+        if record is None:
+            return 'no previous run'
+        if record['code'] != 0:
+            return 'previous run failed'
+        for fname in stage_inputs(name):
+            if not _matches(os.path.join(self.path, fname), record['inputs'].get(fname)):
+                return '{} changed'.format(fname)
+        if after is not None and record.get('after') != list(after):
+            return 'upstream stages changed'
+        for upstream in rerun:
+            return 'upstream {} reran'.format(upstream)
+        for fname, entry in record['outputs'].items():
+            fpath = os.path.join(self.path, fname)
+            if not os.path.exists(fpath):
+                return '{} is missing'.format(fname)
+            if not _matches(fpath, entry):
+                return '{} changed'.format(fname)
+        return None
+
+    def record(self, codes, before, digests=True, after=None):
+        """Record a run of one or more stages.
+
+        Files written while several stages were running at once can't be
+        told apart, so each of those stages owns all of them.
+
+        A stage that one of these stages no longer runs after, like peflux
+        once e_impact has run after eflux, is forgotten: what it made is no
+        longer what the stages downstream of it read.
+
+        Parameters
+        ----------
+        codes: dictionary
+            stage name -> return code of the stages that ran
+        before: dictionary
+            snapshot of the working directory taken before the stages ran
+        digests: bool
+            hash the inputs and outputs. Without hashes a file only matches
+            the ledger while its modification time and size are unchanged.
+        after: dictionary, optional
+            stage name -> its upstream stages in the batch (see stage_graph)
+        """
+        now = _snapshot(self.path)
+        outputs = {}
+        for fname, stamp in now.items():
+            if before.get(fname) != stamp:
+                outputs[fname] = [stamp[0], stamp[1],
+                                  file_digest(os.path.join(self.path, fname)) if digests else None]
+        # a file belongs to the last stage that wrote it
+        for other in self.stages.values():
+            for fname in outputs:
+                other['outputs'].pop(fname, None)
+        for name, code in codes.items():
+            self._forget_replaced(name, (after or {}).get(name, []))
+            self.stages[name] = {'code': code,
+                                 'after': list((after or {}).get(name, [])),
+                                 'inputs': {f: _entry(os.path.join(self.path, f), digests)
+                                            for f in stage_inputs(name)},
+                                 'outputs': dict(outputs)}
+        self.save()
+
+    def record_outputs(self, outputs, digests=False):
+        """Record stages whose outputs were put in place without running them.
+
+        Parameters
+        ----------
+        outputs: dictionary
+            stage name -> names of its output files, in the order the
+            stages run, e.g. as copied back from a run cache
+        digests: bool
+            hash the inputs and outputs (see record)
+        """
+        for fname in set(f for files in outputs.values() for f in files):
+            for other in self.stages.values():
+                other['outputs'].pop(fname, None)
+        graph = stage_graph(list(outputs))
+        for name, files in outputs.items():
+            self._forget_replaced(name, graph[name])
+            self.stages[name] = {'code': 0,
+                                 'after': graph[name],
+                                 'inputs': {f: _entry(os.path.join(self.path, f), digests)
+                                            for f in stage_inputs(name)},
+                                 'outputs': {f: _entry(os.path.join(self.path, f), digests) for f in files}}
+        self.save()
+
+    def _forget_replaced(self, name, after):
+        """Drop the stages `name` last ran after but no longer does."""
+        previous = self.stages.get(name, {}).get('after', [])
+        for upstream in previous:
+            if upstream not in after:
+                self.stages.pop(upstream, None)
+
+    def save(self):
+        with open(self.filename, 'w') as f:
+            json.dump(self.stages, f, indent=1, sort_keys=True)
+
+
+class _BatchPlan(object):
+    """Bookkeeping for a batch run: which stages can start, which are skipped
+    and what to record in the ledger. Shared by run_batch and run_batch_async.
+
+    Only incremental runs hash the files they record; other runs record
+    their modification times and sizes, so an incremental run after them
+    can still skip the stages whose files haven't been touched.
+    """
+    def __init__(self, auric, incremental, concurrency, stages=None):
+        self.path = auric.path
+        self.tracer = getattr(auric, 'tracer', None)
+        self.nalt = auric.params.get('NALT')
+        commands = list(assemble_batch_run(auric))
+        # upstream stages in the whole batch, even if only some stages run
+        self.after = stage_graph([c.cmd for c in commands])
+        self.commands = OrderedDict((c.cmd, c) for c in commands
+                                    if stages is None or c.cmd in stages)
+        self.graph = stage_graph(list(self.commands))
+        self.ledger = BatchLedger(auric.path)
+        self.incremental = incremental
+        self.limit = max(concurrency, 1)
+        self.done = {}
+        self.skipped = []
+        self.waiting = list(self.graph)
+        self.running = set()
+        self.group, self.before = {}, None   # stages that ran together and the snapshot before them
+
+    @property
+    def finished(self):
+        return not (self.waiting or self.running)
+
+    def launch(self):
+        """Names of the stages to start now. Up-to-date stages are skipped."""
+        out = []
+        progress = True
+        while progress:
+            progress = False
+            for name in list(self.waiting):
+                if len(self.running) >= self.limit:
+                    break
+                if not all(u in self.done for u in self.graph[name]):
+                    continue
+                self.waiting.remove(name)
+                progress = True
+                rerun = [u for u in self.graph[name] if self.done[u] is not None]
+                if self.incremental and self.ledger.stale(name, rerun, self.after[name]) is None:
+                    self.done[name] = None
+                    self.skipped.append(name)
+                    continue
+                if not self.running:
+                    self.before = _snapshot(self.path)
+                self.running.add(name)
+                out.append(name)
+        return out
+
+    def finish(self, name, result):
+        """Note that stage `name` finished with CommandResult `result`.
+
+        Returns the stages that ran together with it, stage name -> result,
+        once they have all finished, to be passed to record. Otherwise None.
+        """
+        self.running.remove(name)
+        self.done[name] = result.returncode
+        self.group[name] = result
+        if self.running:
+            return None
+        group, self.group = self.group, {}
+        return group
+
+    def record(self, group):
+        """Record a group of stages returned by finish in the ledger and the tracer."""
+        self.ledger.record(OrderedDict((n, r.returncode) for n, r in group.items()), self.before,
+                           self.incremental, self.after)
+        if self.tracer is not None:
+            for n, r in group.items():
+                outputs = {f: v[1] for f, v in self.ledger.stages[n]['outputs'].items()}
+                self.tracer.record(r, self.path, n, outputs, self.nalt)
+
+    def report(self):
+        if self.skipped:
+            logger.info("skipped unchanged stages: %s", " ".join(self.skipped))
+        return OrderedDict((name, self.done[name]) for name in self.graph)
+
+
+def run_batch(auric, incremental=False, concurrency=1, timeout=None, stages=None):
+    """Run the batch commands of `auric`.
+
+    Stages start as soon as the stages they depend on (see stage_graph)
+    have finished, so independent stages like ly_alpha, ly_beta and the
+    syn_* commands can run at the same time. mergeint and mergesyn wait for
+    all of the stages they merge.
+
+    Parameters
+    ----------
+    auric: AURICManager
+    incremental: bool
+        only run the stages whose inputs changed since they last ran
+        successfully, and the stages downstream of them.
+    concurrency: int
+        maximum number of stages running at once. 1 runs the stages in
+        order, one at a time.
+    timeout: float, optional
+        seconds each command may run before it is killed
+    stages: collection of strings, optional
+        run only these stages of the batch. The outputs of the others are
+        assumed to be in place.
+
+    Returns
+    -------
+    codes: OrderedDict
+        stage name -> return code, or None if the stage was skipped
+    """
+    plan = _BatchPlan(auric, incremental, concurrency, stages)
+    running = {}                # future -> stage name
+    with ThreadPoolExecutor(max_workers=plan.limit) as pool:
+        while not plan.finished:
+            for name in plan.launch():
+                running[pool.submit(plan.commands[name].execute, None, timeout)] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                group = plan.finish(running.pop(future), future.result())
+                if group:
+                    plan.record(group)
+    return plan.report()
+
+
+async def run_batch_async(auric, incremental=False, concurrency=1, timeout=None, stages=None):
+    """asyncio version of run_batch.
+
+    If the task is cancelled, every running command is killed. Files are
+    hashed for the ledger in the default executor, not in the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    plan = _BatchPlan(auric, incremental, concurrency, stages)
+    running = {}                # task -> stage name
+    try:
+        while not plan.finished:
+            for name in await loop.run_in_executor(None, plan.launch):
+                task = asyncio.ensure_future(plan.commands[name].execute_async(timeout=timeout))
+                running[task] = name
+            if not running:
+                continue
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                group = plan.finish(running.pop(task), task.result())
+                if group:
+                    await loop.run_in_executor(None, plan.record, group)
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    return plan.report()
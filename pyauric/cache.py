@@ -0,0 +1,175 @@
+"""In-memory cache of parsed AURIC files.
+
+Entries are keyed by the file path and remember the modification time and
+size of the file(s) they were parsed from, so a changed file is parsed again.
+The cache holds at most `maxsize` bytes and evicts the least recently used
+entries first.
+
+Every lookup gets the same parsed arrays, so they are made read-only when
+they are cached. Dictionaries and lists around them are copied on each
+lookup, so callers can change what they get without changing what later
+lookups return. Data frames are copied shallowly where pandas copies on
+write (pandas >= 3 or with the copy_on_write option set) and whole
+otherwise; the copy keeps the ylabel, title and filename of the parsed frame.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# attributes auric_file_reader.read sets on a data frame, which pandas doesn't copy
+_frame_attrs = ( "ylabel", "title", "filename" )
+
+def _copy_on_write():
+    """Whether pandas copies a shallow copy's data before it is changed."""
+    if pd is None:
+        return False
+    if int( pd.__version__.split( "." )[0] ) >= 3:
+        return True
+    return bool( pd.options.mode.copy_on_write )
+
+def _file_stamp( filename ):
+    """Modification time and size of a file, used to tell if it has changed."""
+    st = os.stat( filename )
+    return st.st_mtime_ns, st.st_size
+
+def _stamps( paths ):
+    """Stamps of several files. Missing files get None."""
+    out = []
+    for path in paths:
+        try:
+            out.append( _file_stamp( path ) )
+        except FileNotFoundError:
+            out.append( None )
+    return tuple( out )
+
+def _sizeof( obj ):
+    """Rough estimate of the memory used by a parsed object."""
+    if hasattr( obj, "memory_usage" ):   # pandas DataFrame
+        return int( obj.memory_usage( deep=True ).sum() )
+    if isinstance( obj, np.ndarray ):
+        return obj.nbytes
+    if isinstance( obj, dict ):
+        return sys.getsizeof( obj ) + sum( _sizeof(k) + _sizeof(v) for k, v in obj.items() )
+    if isinstance( obj, (list, tuple) ):
+        return sys.getsizeof( obj ) + sum( _sizeof(x) for x in obj )
+    return sys.getsizeof( obj )
+
+def _freeze( obj ):
+    """Make the arrays in a parsed object read-only."""
+    if isinstance( obj, np.ndarray ):
+        obj.setflags( write=False )
+    elif isinstance( obj, dict ):
+        for v in obj.values():
+            _freeze( v )
+    elif isinstance( obj, (list, tuple) ):
+        for x in obj:
+            _freeze( x )
+
+def _share( obj ):
+    """A copy of a cached object that shares its (read-only) arrays."""
+    if hasattr( obj, "memory_usage" ):   # pandas DataFrame
+        df = obj.copy( deep=not _copy_on_write() )
+        for name in _frame_attrs:
+            if name in obj.__dict__:
+                setattr( df, name, obj.__dict__[name] )
+        return df
+    if isinstance( obj, dict ):
+        return obj.__class__( ( k, _share( v ) ) for k, v in obj.items() )
+    if isinstance( obj, list ):
+        return [ _share( x ) for x in obj ]
+    return obj
+
+class ParseCache( object ):
+    """LRU cache of parsed files, validated by modification time and size.
+
+    Arrays in cached values are read-only; see the module docstring.
+
+    Parameters
+    ----------
+    maxsize: int
+        memory budget in bytes. 0 disables the cache.
+
+    Attributes
+    ----------
+    hits: int
+        number of lookups answered from the cache
+    misses: int
+        number of lookups that had to parse the file
+    """
+    def __init__( self, maxsize=64*2**20 ):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.currsize = 0
+        self._entries = OrderedDict() # key -> (paths, stamps, size, value)
+        self._lock = threading.Lock()
+
+    def get( self, key, paths, parse ):
+        """Return the cached value for `key`, or call `parse()` and cache the result.
+
+        Parameters
+        ----------
+        key: hashable
+            cache key, usually including the path of the file
+        paths: list of strings
+            files the value is parsed from. The entry is stale if any of
+            them has changed since it was cached.
+        parse: callable
+            function of no arguments that parses the file(s)
+        """
+        stamps = _stamps( paths )
+        with self._lock:
+            entry = self._entries.get( key )
+            if entry is not None and entry[1] == stamps:
+                self._entries.move_to_end( key )
+                self.hits += 1
+                return _share( entry[3] )
+            self.misses += 1
+        value = parse()
+        _freeze( value )
+        size = _sizeof( value )
+        with self._lock:
+            self._discard( key )
+            if size <= self.maxsize:
+                self._entries[key] = ( tuple(paths), stamps, size, value )
+                self.currsize += size
+                while self.currsize > self.maxsize:
+                    self._discard( next( iter( self._entries ) ) )
+        return _share( value )
+
+    def invalidate( self, path=None ):
+        """Drop the entries parsed from `path`, or every entry if no path is given."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self.currsize = 0
+                return
+            path = os.path.abspath( path )
+            for key in [k for k, e in self._entries.items() if path in e[0]]:
+                self._discard( key )
+
+    def __getstate__( self ):
+        # entries are not worth sending to other processes
+        return { "maxsize":self.maxsize }
+
+    def __setstate__( self, state ):
+        self.__init__( state["maxsize"] )
+
+    def info( self ):
+        """Hit and miss counters and memory use, like functools.lru_cache."""
+        return CacheInfo( self.hits, self.misses, self.maxsize, self.currsize )
+
+    def _discard( self, key ):
+        entry = self._entries.pop( key, None )
+        if entry is not None:
+            self.currsize -= entry[2]
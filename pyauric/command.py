@@ -1,10 +1,85 @@
+import os
+import sys
+import time
+import asyncio
+import signal
+import logging
+import threading
 import subprocess as sp
+from collections import deque, namedtuple
+
+CommandResult = namedtuple("CommandResult", ["cmd", "returncode", "wall_time", "tail", "timed_out",
+                                             "start", "cpu_time", "max_rss"])
+CommandResult.__doc__ = """Outcome of running a Command.
+
+cmd: the command and its arguments
+returncode: return code of the process, negative if it was killed by a signal
+wall_time: elapsed time in seconds
+tail: the last lines of output, as (stream, line) pairs
+timed_out: whether the process was killed because it ran past the timeout
+start: time the command started, in seconds since the epoch
+cpu_time: user + system CPU seconds used by the process, or None if unknown
+max_rss: peak resident set size of the process in bytes, or None if unknown
+"""
+
+_max_line = 2**16
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+_rss_unit = 1 if sys.platform == "darwin" else 1024
+
+def print_sink(stream, line):
+    """Print output as it arrives. This is the default sink."""
+    print(line, file=sys.stderr if stream == "stderr" else sys.stdout, flush=True)
+
+def discard(stream, line):
+    """Ignore output."""
+    pass
+
+class LogSink:
+    """Send output to a logger, stderr at a higher level than stdout.
+
+    Parameters
+    ----------
+    logger: logging.Logger or string
+        the logger or the name of one
+    level: int
+        level for stdout lines
+    error_level: int
+        level for stderr lines
+    """
+    def __init__(self, logger="pyauric", level=logging.INFO, error_level=logging.WARNING):
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.level = level
+        self.error_level = error_level
+
+    def __call__(self, stream, line):
+        self.logger.log(self.error_level if stream == "stderr" else self.level, "%s", line)
+
+class FileSink:
+    """Append output to a file.
+
+    Parameters
+    ----------
+    filename: string
+        file to append to. It is opened for each run, so one sink can be
+        shared by many commands.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def __call__(self, stream, line):
+        with self._lock, open(self.filename, "a") as f:
+            f.write(line + "\n")
 
 class Command:
     """
-    A basic wrapper for Popen. 
+    A basic wrapper for Popen.
     Command is compatible with the old, unecessarily comlpicated Command. This command will block execution as well, because AURIC commands have side effects.
 
+    Output is read as it is produced and handed line by line to each sink,
+    so chatty commands can't fill the pipes. Only the last `tail` lines are
+    kept in memory.
+
     Parameters
     ----------
     cmd: list of strings
@@ -13,41 +88,205 @@ class Command:
         dictionary of environment variables.
     cwd: string
         the path in which to execute the command
+    sinks: list of callables, optional
+        functions of (stream, line) that receive the output, where stream is
+        'stdout' or 'stderr'. Default is [print_sink]. See also discard,
+        LogSink and FileSink.
+    tail: int
+        number of output lines to keep in the result
     """
-    def __init__(self,cmd=[],env={},cwd=""):
+    def __init__(self,cmd=[],env={},cwd="",sinks=None,tail=20):
         self.cmd = cmd
         self.env = env
         self.cwd = cwd
+        self.sinks = [print_sink] if sinks is None else list(sinks)
+        self.tail = tail
 
     def run(self, timeout=None):
+        """Run the command and return its return code.
+
+        If it runs for more than `timeout` seconds, the command and any
+        processes it started are killed."""
+        return self.execute(timeout=timeout).returncode
+
+    def execute(self, input_string=None, timeout=None):
         """Run the command.
-        timeout is accepted for compatibility with the old version."""
-        p = sp.Popen(self.cmd,env=self.env,cwd=self.cwd, stdout=sp.PIPE, stderr=sp.PIPE)
-        code = p.wait(timeout)
-        print(p.stdout.read().decode('utf-8'))
-        print(p.stderr.read().decode('utf-8'))
-        return code
+
+        Parameters
+        ----------
+        input_string: bytes, optional
+            input to send to stdin. Can include newlines.
+        timeout: float, optional
+            seconds to wait before killing the command's process group,
+            including time its children keep its output open after it exits
+
+        Returns
+        -------
+        result: CommandResult
+        """
+        started, start = time.time(), time.monotonic()
+        p = sp.Popen(self.cmd, env=self.env, cwd=self.cwd,
+                     stdin=sp.PIPE if input_string is not None else sp.DEVNULL,
+                     stdout=sp.PIPE, stderr=sp.PIPE,
+                     start_new_session=True)
+        tail = deque(maxlen=self.tail)
+        lock = threading.Lock()
+        readers = [threading.Thread(target=self._pump, args=(name, pipe, tail, lock), daemon=True)
+                   for name, pipe in (("stdout", p.stdout), ("stderr", p.stderr))]
+        for reader in readers:
+            reader.start()
+        if input_string is not None:
+            try:
+                p.stdin.write(input_string)
+                p.stdin.close()
+            except BrokenPipeError:
+                pass
+        expired = []
+        reaped = []
+        reaping = threading.Lock()
+        timer = None
+        if timeout is not None:
+            def expire():
+                # once the process is reaped its group id may belong to
+                # someone else, so only kill it before then
+                with reaping:
+                    if not reaped:
+                        expired.append(True)
+                        _kill_group(p)
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            # reap the process ourselves to get its resource usage
+            while True:
+                with reaping:
+                    pid, status, usage = os.wait4(p.pid, os.WNOHANG)
+                    if pid:
+                        reaped.append(True)
+                        break
+                # wait without reaping, so the timer can't kill a reused group
+                os.waitid(os.P_PID, p.pid, os.WEXITED | os.WNOWAIT)
+        except BaseException:
+            # e.g. KeyboardInterrupt: don't leave the command running
+            if not reaped:
+                _kill_group(p)
+                p.wait()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        p.returncode = code = os.waitstatus_to_exitcode(status)
+        # a child left in the group can hold the pipes open after the command
+        # exits. The group id can't be reused while it lives, so the group
+        # can still be killed when the timeout runs out.
+        for reader in readers:
+            reader.join(None if timeout is None else max(start + timeout - time.monotonic(), 0))
+        if any(reader.is_alive() for reader in readers):
+            expired.append(True)
+            _kill_group(p)
+            for reader in readers:
+                reader.join()
+        return CommandResult(self.cmd, code, time.monotonic() - start, list(tail), bool(expired),
+                             started, usage.ru_utime + usage.ru_stime, usage.ru_maxrss * _rss_unit)
+
+    async def execute_async(self, input_string=None, timeout=None):
+        """Run the command without blocking the event loop.
+
+        Takes the same arguments and returns the same result as execute,
+        except that the CPU time and memory use are not measured. If the
+        task running it is cancelled, the command's process group is killed
+        before the cancellation propagates.
+        """
+        started, start = time.time(), time.monotonic()
+        argv = [self.cmd] if isinstance(self.cmd, str) else list(self.cmd)
+        p = await asyncio.create_subprocess_exec(*argv, env=self.env, cwd=self.cwd,
+                                                 stdin=sp.PIPE if input_string is not None else sp.DEVNULL,
+                                                 stdout=sp.PIPE, stderr=sp.PIPE,
+                                                 limit=_max_line, start_new_session=True)
+        tail = deque(maxlen=self.tail)
+        lock = threading.Lock()
+        readers = [asyncio.ensure_future(self._pump_async(name, stream, tail, lock))
+                   for name, stream in (("stdout", p.stdout), ("stderr", p.stderr))]
+        timed_out = False
+        try:
+            if input_string is not None:
+                try:
+                    p.stdin.write(input_string)
+                    await p.stdin.drain()
+                    p.stdin.close()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            try:
+                code = await asyncio.wait_for(p.wait(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                _kill_group(p)
+                code = await p.wait()
+            await asyncio.gather(*readers)
+        except BaseException:
+            # cancelled: don't leave the command running
+            _kill_group(p)
+            for reader in readers:
+                reader.cancel()
+            await asyncio.shield(p.wait())
+            raise
+        return CommandResult(self.cmd, code, time.monotonic() - start, list(tail), timed_out,
+                             started, None, None)
+
+    def _pump(self, name, pipe, tail, lock):
+        """Hand the lines from `pipe` to the sinks until it closes."""
+        with pipe:
+            for raw in iter(lambda: pipe.readline(_max_line), b''):
+                self._emit(name, raw, tail, lock)
+
+    async def _pump_async(self, name, stream, tail, lock):
+        """Hand the lines from `stream` to the sinks until it closes."""
+        while True:
+            try:
+                raw = await stream.readline()
+            except ValueError:
+                # the line is longer than the buffer, pass it on in pieces
+                raw = await stream.read(_max_line)
+            if not raw:
+                break
+            self._emit(name, raw, tail, lock)
+
+    def _emit(self, name, raw, tail, lock):
+        line = raw.decode('utf-8', errors='replace').rstrip('\n')
+        with lock:
+            tail.append((name, line))
+            for sink in self.sinks:
+                sink(name, line)
+
+def _kill_group(p):
+    """Kill a process started with start_new_session=True and its children."""
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
 
 class InputCommand(Command):
     def run(self,input_string=b'',timeout=None):
         """Run the command, optionally sending a string to stidn.
-        
+
         Parameters
         ----------
         input_string: bytes
             input to communicate to stdin. Can include newlines.
+        timeout: float, optional
+            seconds to wait before killing the command
 
         Returns
         -------
         code: int
             return code of the command
         """
-        p = sp.Popen(self.cmd,env=self.env,cwd=self.cwd,stdin=sp.PIPE)
-        if input_string:
-            p.communicate(input_string)
-        code = p.wait()
-        return code
-    
+        return self.execute(input_string, timeout).returncode
+
+    async def run_async(self,input_string=b'',timeout=None):
+        """asyncio version of run."""
+        return (await self.execute_async(input_string, timeout)).returncode
+
 if __name__=="__main__":
     import os
     cmd = Command(["auric"]
@@ -0,0 +1,222 @@
+"""Fast approximate answers from the outputs of a finished sweep.
+
+An Emulator interpolates the stacked outputs of a grid sweep (see
+pyauric.stack) at new parameter values, for many points at once, in a few
+milliseconds instead of the minutes a run takes:
+
+    arr = sweep.stack('mergeint.int')
+    emu = Emulator(arr)
+    res = emu.query({'GLAT': [12.5, 47.0], 'UTSEC': 30000})
+    res.values          # (point, ZA, feature)
+    res.trusted         # False for points outside the swept grid
+
+Points outside the grid are extrapolated from its edge and reported as not
+trusted. Give the emulator a manager and a directory to run AURIC for those
+points instead:
+
+    emu = Emulator(arr, auric=auric, root='/scratch/emulator', fname='mergeint.int')
+    res = emu.query(points, run=True)
+"""
+import os
+import tempfile
+import itertools
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from .stack import read_output
+
+EmulatorResult = namedtuple("EmulatorResult", ["values", "distance", "trusted", "source"])
+EmulatorResult.__doc__ = """Answer to an Emulator query.
+
+values: array of shape (point, ALT or ZA, feature)
+distance: distance of each point from the grid, in grid spacings. 0 inside the grid.
+trusted: whether each value is interpolated inside the trusted region or run
+source: 'emulator' or 'auric' for each point
+"""
+
+_methods = ( 'linear', 'cubic' )
+
+def _linear_weights( x, q ):
+    """Indices and weights of the two grid points around each of `q`."""
+    if len(x) == 1:
+        return np.zeros( (len(q), 1), dtype=int ), np.ones( (len(q), 1) )
+    i = np.clip( np.searchsorted( x, q ) - 1, 0, len(x) - 2 )
+    t = np.clip( ( q - x[i] ) / ( x[i+1] - x[i] ), 0.0, 1.0 )
+    return np.stack( [ i, i+1 ], axis=1 ), np.stack( [ 1 - t, t ], axis=1 )
+
+def _cubic_weights( x, q ):
+    """Indices and weights of the four grid points of a Catmull-Rom spline through `x`.
+
+    The slope at each grid point is the centered difference of its
+    neighbours, one-sided at the ends, so non-uniform grids are fine.
+    """
+    if len(x) < 3:
+        return _linear_weights( x, q )
+    n = len(x)
+    i = np.clip( np.searchsorted( x, q ) - 1, 0, n - 2 )
+    idx = np.stack( [ np.maximum( i-1, 0 ), i, i+1, np.minimum( i+2, n-1 ) ], axis=1 )
+    h = x[i+1] - x[i]
+    t = np.clip( ( q - x[i] ) / h, 0.0, 1.0 )
+    h00, h10 = 2*t**3 - 3*t**2 + 1, t**3 - 2*t**2 + t
+    h01, h11 = -2*t**3 + 3*t**2, t**3 - t**2
+    left = h / ( x[idx[:, 2]] - x[idx[:, 0]] )      # slope at i is (y[i+1] - y[i-1]) / (x[i+1] - x[i-1])
+    right = h / ( x[idx[:, 3]] - x[idx[:, 1]] )     # slope at i+1
+    w = np.stack( [ -h10 * left, h00 - h11 * right, h01 + h10 * left, h11 * right ], axis=1 )
+    return idx, w
+
+class Emulator( object ):
+    """Interpolates a grid sweep's stacked outputs at new parameter values.
+
+    Parameters
+    ----------
+    array: SweepArray
+        from stack_sweep on a grid sweep: one dimension per swept
+        parameter, then ALT or ZA, then feature
+    method: [ 'linear' | 'cubic' ]
+        multilinear interpolation, or a Catmull-Rom spline along each
+        parameter (linear along parameters with fewer than 3 values)
+    max_distance: float
+        largest distance from the grid (see distance) that is trusted
+    auric: AURICManager, optional
+        base manager of the sweep, to run the untrusted points
+    root: string, optional
+        directory for those runs. Each query that runs AURIC gets a new
+        directory inside it, which is kept after the query.
+    fname: string, optional
+        output file the array was stacked from
+    processes: int, optional
+        number of worker processes for those runs
+    """
+    def __init__( self, array, method='linear', max_distance=0.0, auric=None, root=None, fname=None,
+                  processes=None ):
+        if method not in _methods:
+            raise ValueError( "method must be one of {}, not {!r}".format( _methods, method ) )
+        if "case" in array.dims:
+            raise ValueError( "an Emulator needs the outputs of a grid sweep" )
+        self.params = list( array.dims[:-2] )
+        self.axis = array.dims[-2]
+        self.features = list( array.coords["feature"] )
+        self.index = np.asarray( array.coords[self.axis] )
+        data = array.data
+        self.grid = []
+        for d, name in enumerate( self.params ):
+            x = np.asarray( array.coords[name], dtype=float )
+            order = np.argsort( x, kind="stable" )
+            if ( order != np.arange( len(x) ) ).any():
+                data = np.take( data, order, axis=d )
+            self.grid.append( x[order] )
+        self.data = data
+        self.method = method
+        self.max_distance = max_distance
+        self.auric, self.root, self.fname, self.processes = auric, root, fname, processes
+
+    def _points( self, points ):
+        """Columns of query values, one per parameter."""
+        if not hasattr( points, "keys" ):
+            points = { name:[ p[name] for p in points ] for name in self.params } if len(points) else \
+                     { name:[] for name in self.params }
+        unknown = set( points ) - set( self.params )
+        if unknown:
+            raise ValueError( "the emulator was not trained on {}".format( ", ".join( sorted( unknown ) ) ) )
+        columns = np.broadcast_arrays( *( np.atleast_1d( np.asarray( points[name], dtype=float ) )
+                                          for name in self.params ) )
+        return [ c.ravel() for c in columns ]
+
+    def distance( self, points ):
+        """Distance of each point outside the grid, in grid spacings along each parameter.
+
+        Points inside the grid are at 0. Values of a parameter that was not
+        swept (a single value) other than that value are infinitely far.
+        """
+        columns = self._points( points )
+        total = np.zeros( len( columns[0] ) if columns else 1 )
+        for x, q in zip( self.grid, columns ):
+            outside = np.maximum( x[0] - q, 0 ) + np.maximum( q - x[-1], 0 )
+            if len(x) > 1:
+                total += ( outside / ( ( x[-1] - x[0] ) / ( len(x) - 1 ) ) )**2
+            else:
+                total += np.where( outside > 0, np.inf, 0.0 )
+        return np.sqrt( total )
+
+    def interpolate( self, points, features=None ):
+        """Interpolated values at `points`, shape (point, ALT or ZA, feature)."""
+        columns = self._points( points )
+        fidx = [ self.features.index( f ) for f in features ] if features is not None else slice( None )
+        weights = _cubic_weights if self.method == 'cubic' else _linear_weights
+        axes = [ weights( x, q ) for x, q in zip( self.grid, columns ) ]
+        npoints = len( columns[0] ) if columns else 1
+        out = None
+        for corner in itertools.product( *( range( w.shape[1] ) for _, w in axes ) ):
+            idx = tuple( i[:, c] for (i, _), c in zip( axes, corner ) )
+            w = np.ones( npoints )
+            for (_, wd), c in zip( axes, corner ):
+                w = w * wd[:, c]
+            term = w[:, None, None] * self.data[idx][:, :, fidx]
+            out = term if out is None else out + term
+        return out
+
+    def query( self, points, features=None, run=False ):
+        """Values at `points`.
+
+        Parameters
+        ----------
+        points: mapping or list of mappings
+            parameter name -> value or array of values (broadcast together),
+            or one dictionary per point. Every swept parameter must be given.
+        features: list of strings, optional
+            features to return. Default is all of them.
+        run: bool
+            run AURIC for the points that are not trusted. Needs `auric`,
+            `root` and `fname`.
+
+        Returns
+        -------
+        result: EmulatorResult
+        """
+        columns = self._points( points )
+        by_name = dict( zip( self.params, columns ) )
+        values = self.interpolate( by_name, features )
+        distance = self.distance( by_name )
+        trusted = ( distance <= self.max_distance ) & np.isfinite( values ).all( axis=(1, 2) )
+        source = np.full( len(distance), 'emulator', dtype=object )
+        if run and not trusted.all():
+            if self.auric is None or self.root is None or self.fname is None:
+                raise ValueError( "an Emulator needs auric, root and fname to run AURIC" )
+            values, trusted, source = self._run( by_name, features, values, trusted, source )
+        return EmulatorResult( values, distance, trusted, source )
+
+    def _run( self, by_name, features, values, trusted, source ):
+        from .sweep import Sweep
+        todo = np.flatnonzero( ~trusted )
+        cases = [ OrderedDict( (name, float( by_name[name][i] )) for name in self.params ) for i in todo ]
+        # a directory of its own, so nothing is left from the runs of an earlier query
+        os.makedirs( self.root, exist_ok=True )
+        root = tempfile.mkdtemp( prefix="query-", dir=self.root )
+        sweep = Sweep( self.auric, cases, root, processes=self.processes )
+        results = sweep.run( collect=_Collect( self.fname, features or self.features ) )
+        values = values.copy()
+        trusted = trusted.copy()
+        for i, r in zip( todo, results ):
+            if r.status == 'done' and r.value is not None and r.value.shape == values.shape[1:]:
+                values[i] = r.value
+                trusted[i] = True
+                source[i] = 'auric'
+        return values, trusted, source
+
+    def retrieve( self, params, features=None, run=False ):
+        """Values at one point, laid out like AURICManager.retrieve."""
+        res = self.query( { k:[v] for k, v in params.items() }, features, run )
+        out = { self.axis:self.index.copy() }
+        for j, feature in enumerate( features or self.features ):
+            out[feature] = res.values[0, :, j]
+        return out
+
+class _Collect( object ):
+    """Sweep collect function returning the (ALT or ZA, feature) array of an output file."""
+    def __init__( self, fname, features ):
+        self.fname = fname
+        self.features = features
+
+    def __call__( self, auric ):
+        return read_output( auric.pathto( self.fname ), self.features ).data
@@ -0,0 +1,165 @@
+"""A stand-in AURIC installation for testing and load-testing the runner.
+
+FakeAURIC writes an $AURIC_ROOT with a bin/<sysname> directory holding a
+fake executable for geoparm and for every command airglow_sequence can
+emit. Each one reads the input deck of the directory it runs in, takes as
+long as its stage would (sleeping, or burning CPU), and writes well-formed
+output files that the pyauric readers parse: <stage>.ver altitude profiles
+for the volume emission stages, <stage>.int zenith angle profiles at the
+angles of view.inp for the line-of-sight stages and <stage>.syn spectra for
+the synthetic spectra. The profiles depend only on the input deck, so runs
+with the same inputs write the same outputs. geoparm sets SZA and SLT from
+the date, time and position.
+
+    fake = FakeAURIC('/tmp/fake-auric', time_scale=0.01, fail={'losint': 0.1})
+    auric = fake.manager('/tmp/fake-auric/run')
+    auric.runbatch()
+
+Stage costs come from a CostModel, so they grow with NALT like real ones.
+A stage fails when the outputs of the stages it follows are missing.
+Failures and hangs are also injected with a probability per stage, or for
+every run of a manager by naming the stages in its environment:
+
+    auric.env['PYAURIC_FAKE_FAIL'] = 'losint'
+    auric.env['PYAURIC_FAKE_HANG'] = 'mergeint,syn_lbh'
+
+A failing stage exits with status 1 without writing its outputs. A hanging
+stage sleeps until it is killed. The settings are kept in a JSON file in
+the bin directory and read by every command, so configure changes them for
+commands started afterwards.
+"""
+import os
+import sys
+import json
+
+import numpy as np
+
+from .bands import _band_cmd
+from .batch import _stage_after
+from .manager import AURICManager, write_view, write_radtrans_options
+from .schedule import CostModel, _fixed_stages, _reference_nalt
+from .synthetic import feature_names, write_param
+
+_volume_stages = ['atmos', 'ionos', 'solar', 'colden', 'pesource', 'peflux', 'eflux', 'e_impact', 'daychem',
+                  'mergever', 'niteglo']
+_sight_stages = ['losden', 'radtrans', 'losint', 'ly_alpha', 'ly_beta', 'mergeint']
+_spectrum_stages = sorted( set( _band_cmd.values() ) ) + ['mergesyn']
+commands = ['geoparm'] + _volume_stages + _sight_stages + _spectrum_stages
+
+_script_name = 'fake-auric'
+_config_name = 'fake-auric.json'
+_defaults = { "stage_cost":{}, "time_scale":1.0, "mode":"sleep", "fail":{}, "hang":{},
+              "nfeatures":20, "nwave":200, "seed":None }
+
+def output_name( stage ):
+    """Name of the output file the fake `stage` writes."""
+    if stage in _volume_stages:
+        return stage + '.ver'
+    if stage in _sight_stages:
+        return stage + '.int'
+    return stage + '.syn'
+
+def _kind( stage ):
+    if stage in _volume_stages:
+        return "volume"
+    return "sight" if stage in _sight_stages else "spectrum"
+
+def _needs( stage ):
+    """Output files of which at least one must exist before `stage` runs."""
+    if stage in _band_cmd.values():
+        return [ output_name( 'losden' ) ]
+    return [ output_name( s ) for s in _stage_after.get( stage, [] ) ]
+
+class FakeAURIC( object ):
+    """An AURIC_ROOT with fake executables.
+
+    Parameters
+    ----------
+    root: string
+        directory to install in. bin/<sysname> is made inside it.
+    stage_cost: dictionary, optional
+        stage name -> seconds with NALT = 100, overriding the CostModel defaults
+    time_scale: float
+        factor applied to every stage cost, e.g. 0.01 for quick tests
+    mode: [ 'sleep' | 'cpu' ]
+        whether a stage sleeps or keeps a core busy for its cost
+    fail, hang: dictionary, optional
+        stage name -> probability that a run of the stage fails or hangs
+    nfeatures: int
+        number of profiles in each .ver and .int file
+    nwave: int
+        number of wavelengths in each .syn file
+    seed: int, optional
+        makes the injected failures and hangs depend only on the seed, the
+        stage and the input deck, so they happen again when a run is repeated
+    """
+    def __init__( self, root, **settings ):
+        self.root = os.path.abspath( root )
+        self.bindir = os.path.join( self.root, "bin", os.uname().sysname )
+        self.config = os.path.join( self.bindir, _config_name )
+        os.makedirs( self.bindir, exist_ok=True )
+        os.makedirs( os.path.join( self.root, "database" ), exist_ok=True )
+        script = os.path.join( self.bindir, _script_name )
+        with open( os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "_fake_stage.py" ) ) as f:
+            source = f.read()
+        with open( script, 'w' ) as f:
+            f.write( "#!{}\n".format( sys.executable ) + source )
+        os.chmod( script, 0o755 )
+        for name in commands:
+            exe = os.path.join( self.bindir, name )
+            if os.path.lexists( exe ):
+                os.remove( exe )
+            os.symlink( _script_name, exe )
+        self.settings = dict( _defaults )
+        self.configure( **settings )
+
+    def configure( self, **settings ):
+        """Change settings (see FakeAURIC) for the commands started from now on."""
+        unknown = set( settings ) - set( _defaults )
+        if unknown:
+            raise TypeError( "unknown settings: {}".format( ", ".join( sorted( unknown ) ) ) )
+        if settings.get( "mode", "sleep" ) not in ( "sleep", "cpu" ):
+            raise ValueError( "mode must be 'sleep' or 'cpu', not {!r}".format( settings["mode"] ) )
+        self.settings.update( settings )
+        model = CostModel( self.settings["stage_cost"] )
+        config = dict( self.settings,
+                       cost={ name:model.cost( name ) for name in commands },
+                       fixed=sorted( _fixed_stages ),
+                       reference_nalt=_reference_nalt,
+                       outputs={ name:output_name( name ) for name in commands },
+                       kinds={ name:_kind( name ) for name in commands },
+                       needs={ name:_needs( name ) for name in commands },
+                       features=feature_names( self.settings["nfeatures"] ),
+                       package=os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+        tmp = self.config + ".tmp"
+        with open( tmp, 'w' ) as f:
+            json.dump( config, f, indent=1 )
+        os.replace( tmp, self.config )
+
+    @property
+    def env( self ):
+        """Environment variables that make AURIC commands run the fake executables."""
+        return { "AURIC_ROOT":self.root,
+                 "PATH":":".join( [ self.bindir, os.getenv( "PATH", "" ) ] ) }
+
+    def make_workdir( self, path, nalt=100, za=np.linspace( 90, 180, 19 ), zobs=300.0, params={} ):
+        """Write param.inp, view.inp, radtrans.opt and dbpath.inp to directory `path`."""
+        os.makedirs( path, exist_ok=True )
+        write_param( os.path.join( path, "param.inp" ), nalt, params )
+        write_view( os.path.join( path, "view.inp" ), zobs, za )
+        write_radtrans_options( os.path.join( path, "radtrans.opt" ), {} )
+        with open( os.path.join( path, "dbpath.inp" ), 'w' ) as f:
+            f.write( os.path.join( self.root, "database" ) + "\n" )
+        return path
+
+    def manager( self, path, **kwargs ):
+        """An AURICManager for directory `path` that runs the fake executables.
+
+        The input deck is written with make_workdir if `path` has no
+        param.inp. Keyword arguments are passed to AURICManager.
+        """
+        if not os.path.exists( os.path.join( path, "param.inp" ) ):
+            self.make_workdir( path )
+        auric = AURICManager( path, **kwargs )
+        auric.env.update( self.env )
+        return auric
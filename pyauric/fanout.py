@@ -0,0 +1,127 @@
+"""Line-of-sight runs for many observers from one atmosphere.
+
+The volume emission stages of a batch (atmos through mergever or niteglo)
+don't read view.inp, so every observer geometry of the same atmosphere can
+share them. run_geometries runs them once, then runs the line-of-sight
+stages (losden and everything after it) for each geometry in its own
+subdirectory, where the volume emission outputs are linked in, not copied.
+The links point to one read-only copy of the outputs in root/.volume-emission,
+so a stage that tries to rewrite one fails instead of changing the inputs
+of the other geometries or the files of the base run:
+
+    geometries = [(300.0, np.linspace(90, 180, 37)), (850.0, np.linspace(100, 180, 81))]
+    results = run_geometries(auric, geometries, '/scratch/views')
+    results[1].array.data       # (ZA, feature) intensities seen from 850 km
+"""
+import os
+import traceback
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .batch import batch_stages, run_batch, BatchLedger
+from .pool import clone_settings, clone_file, input_files
+from .stack import read_output
+
+GeometryResult = namedtuple("GeometryResult", ["index", "zobs", "za", "path", "codes", "array", "error"])
+GeometryResult.__doc__ = """Outcome of the line-of-sight stages for one geometry.
+
+index: position of the geometry in the list
+zobs: observer altitude (km)
+za: zenith angles (deg)
+path: working directory of the geometry
+codes: stage name -> return code of the line-of-sight stages
+array: SweepArray of the output file with dimensions ('ZA', 'feature'), or None
+error: description of the exception raised for the geometry, or None
+"""
+
+def split_stages( names ):
+    """Split batch stage names into the volume emission stages and the line-of-sight stages."""
+    names = list( names )
+    if 'losden' not in names:
+        return names, []
+    i = names.index( 'losden' )
+    return names[:i], names[i:]
+
+_shared_dir = '.volume-emission'
+
+def _share_outputs( auric, path, stages ):
+    """Copy the outputs of `stages` of `auric` to directory `path`, read-only. Returns their names."""
+    os.makedirs( path, exist_ok=True )
+    ledger = BatchLedger( auric.path )
+    names = []
+    for name in stages:
+        for fname in ledger.stages.get( name, {} ).get( 'outputs', {} ):
+            if fname in input_files or not auric.exists( fname ):
+                continue
+            dst = os.path.join( path, fname )
+            clone_file( auric.pathto( fname ), dst )
+            os.chmod( dst, 0o444 )
+            names.append( fname )
+    return names
+
+def _link_outputs( shared, path, names ):
+    """Symlink files `names` in directory `shared` into directory `path`."""
+    for fname in names:
+        dst = os.path.join( path, fname )
+        if os.path.lexists( dst ):
+            os.remove( dst )
+        os.symlink( os.path.join( shared, fname ), dst )
+
+def run_geometries( auric, geometries, root, fname='mergeint.int', features=None,
+                    concurrency=None, timeout=None, incremental=True ):
+    """Run the volume emission stages once and the line-of-sight stages for each geometry.
+
+    Parameters
+    ----------
+    auric: AURICManager
+        the atmosphere. The volume emission stages run in its directory.
+    geometries: list of (zobs, za)
+        observer altitude (km) and zenith angles (deg) of each view.inp
+    root: string
+        directory in which a subdirectory is made for each geometry
+    fname: string
+        output file to read for each geometry
+    features: list of strings, optional
+        profiles to read. Default is all of them.
+    concurrency: int, optional
+        number of geometries running at once. Default is the number of cores.
+    timeout: float, optional
+        seconds each command may run before it is killed
+    incremental: bool
+        skip the volume emission stages that are up to date (see runbatch)
+
+    Returns
+    -------
+    results: list of GeometryResult, in the order of `geometries`
+    """
+    auric.flush()
+    upstream, los = split_stages( batch_stages( auric ) )
+    codes = run_batch( auric, incremental, timeout=timeout, stages=upstream )
+    auric.cache.invalidate()
+    failed = [ name for name, code in codes.items() if code not in (0, None) ]
+    if failed:
+        raise RuntimeError( "volume emission stages failed: {}".format( " ".join( failed ) ) )
+    shared = os.path.join( os.path.abspath( root ), _shared_dir )
+    outputs = _share_outputs( auric, shared, upstream )
+
+    width = len( str( max( len(geometries) - 1, 0 ) ) )
+    def run( i ):
+        zobs, za = geometries[i]
+        path = os.path.join( os.path.abspath( root ), "view-{:0{}d}".format( i, width ) )
+        try:
+            os.makedirs( path, exist_ok=True )
+            sub = auric.clone( path, **clone_settings( auric ) )
+            sub.deck.set_view( zobs, za )
+            sub.flush()
+            _link_outputs( shared, path, outputs )
+            sub_codes = dict( run_batch( sub, timeout=timeout, stages=los ) )
+            array = read_output( sub.pathto( fname ), features ) if sub.exists( fname ) else None
+            return GeometryResult( i, zobs, np.asarray( za ), path, sub_codes, array, None )
+        except Exception:
+            return GeometryResult( i, zobs, np.asarray( za ), path, {}, None, traceback.format_exc() )
+
+    workers = concurrency or os.cpu_count() or 1
+    with ThreadPoolExecutor( max_workers=workers ) as pool:
+        return list( pool.map( run, range( len(geometries) ) ) )
@@ -0,0 +1,146 @@
+"""Solar geometry of sweep cases, computed before running anything.
+
+AURIC only runs cases with 0 < SZA < 90 (dayglow) or 110 < SZA < 180
+(nightglow), and when geoparm computes SZA the case has to be set up and
+geoparm run before that is known. solar_geometry estimates SZA and solar
+local time from YYDDD, UTSEC, GLAT and GLON for whole arrays at once, and
+plan_sweep uses it to find the invalid cases of a sweep and to group the
+valid ones by the commands their batch runs:
+
+    plan = plan_sweep(auric, sweep.cases)
+    plan.invalid        # indices of the twilight cases
+    plan.groups         # command sequence -> indices of the cases that run it
+
+The estimate uses the approximations of Spencer (1971) for the solar
+declination and the equation of time, which are good to a fraction of a
+degree, so cases within `margin` degrees of a boundary are left to geoparm.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from .batch import batch_stages
+
+_day = ( 0.0, 90.0 )
+_night = ( 110.0, 180.0 )
+
+def day_of_year( yyddd ):
+    """Year and day of the year of YYDDD (or YYYYDDD) dates. Two digit years before 50 are 20YY."""
+    yyddd = np.asarray( yyddd, dtype=np.int64 )
+    year = yyddd // 1000
+    year = np.where( year < 50, year + 2000, np.where( year < 100, year + 1900, year ) )
+    return year, yyddd % 1000
+
+def solar_geometry( yyddd, utsec, glat, glon ):
+    """Solar zenith angle and solar local time.
+
+    Parameters
+    ----------
+    yyddd, utsec, glat, glon: array_like
+        date, universal time (s), latitude and longitude (deg, east
+        positive), as in param.inp. They are broadcast together.
+
+    Returns
+    -------
+    sza: ndarray
+        solar zenith angle (deg)
+    slt: ndarray
+        apparent solar local time (hours)
+    """
+    year, doy = day_of_year( yyddd )
+    utsec, glat, glon = ( np.asarray( x, dtype=float ) for x in ( utsec, glat, glon ) )
+    leap = ( ( year % 4 == 0 ) & ( year % 100 != 0 ) ) | ( year % 400 == 0 )
+    gamma = 2 * np.pi / np.where( leap, 366.0, 365.0 ) * ( doy - 1 + ( utsec / 3600.0 - 12 ) / 24 )
+    eqtime = 229.18 * ( 0.000075 + 0.001868 * np.cos( gamma ) - 0.032077 * np.sin( gamma )
+                        - 0.014615 * np.cos( 2 * gamma ) - 0.040849 * np.sin( 2 * gamma ) )
+    decl = ( 0.006918 - 0.399912 * np.cos( gamma ) + 0.070257 * np.sin( gamma )
+             - 0.006758 * np.cos( 2 * gamma ) + 0.000907 * np.sin( 2 * gamma )
+             - 0.002697 * np.cos( 3 * gamma ) + 0.00148 * np.sin( 3 * gamma ) )
+    slt = np.mod( utsec / 3600.0 + glon / 15.0 + eqtime / 60.0, 24.0 )
+    hour_angle = np.radians( ( slt - 12.0 ) * 15.0 )
+    lat = np.radians( glat )
+    cos_sza = np.sin( lat ) * np.sin( decl ) + np.cos( lat ) * np.cos( decl ) * np.cos( hour_angle )
+    return np.degrees( np.arccos( np.clip( cos_sza, -1.0, 1.0 ) ) ), slt
+
+def regime( sza, margin=0.0 ):
+    """'day', 'night' or 'twilight' (AURIC can't run it) for each SZA.
+
+    Angles within `margin` degrees of the edge of the day or night ranges
+    count as inside them.
+    """
+    sza = np.asarray( sza, dtype=float )
+    day = ( _day[0] - margin < sza ) & ( sza < _day[1] + margin )
+    night = ( _night[0] - margin < sza ) & ( sza < _night[1] + margin )
+    # an SZA near 100 with a big margin is both, the nearer range wins
+    night &= ~day | ( sza > 100.0 )
+    day &= ~night
+    return np.where( day, 'day', np.where( night, 'night', 'twilight' ) )
+
+class SweepPlan( object ):
+    """Solar geometry and command sequences of the cases of a sweep.
+
+    Attributes
+    ----------
+    sza, slt: ndarray
+        SZA (deg) and solar local time (hours) of each case. The SZA is
+        estimated with solar_geometry if geoparm computes it, otherwise it
+        is the case's param.inp value.
+    regime: ndarray of strings
+        'day', 'night' or 'twilight'
+    valid: ndarray of bool
+    invalid: list of int
+        indices of the cases AURIC can't run
+    groups: OrderedDict
+        tuple of command names -> indices of the valid cases that run them
+    """
+    def __init__( self, sza, slt, regime, groups ):
+        self.sza = sza
+        self.slt = slt
+        self.regime = regime
+        self.valid = regime != 'twilight'
+        self.invalid = [ int(i) for i in np.flatnonzero( ~self.valid ) ]
+        self.groups = groups
+
+    def __len__( self ):
+        return len( self.sza )
+
+    def params( self, index, case ):
+        """`case` with the planned SZA and SLT added."""
+        return OrderedDict( case, SZA=float( self.sza[index] ), SLT=float( self.slt[index] ) )
+
+def plan_sweep( auric, cases, geoparm=True, margin=1.0 ):
+    """Work out which cases of a sweep AURIC can run, and what each runs.
+
+    Parameters
+    ----------
+    auric: AURICManager
+        base manager. Its param.inp supplies anything the cases don't set.
+    cases: list of dictionaries
+        param.inp values of each case
+    geoparm: bool
+        whether geoparm will compute SZA and SLT from the date, time and
+        position. If False the SZA of each case is used as it is.
+    margin: float
+        degrees by which an estimated SZA may be outside the valid ranges
+        before the case is rejected. Not used if `geoparm` is False.
+
+    Returns
+    -------
+    plan: SweepPlan
+    """
+    base = auric.params
+    def column( name ):
+        return np.array( [ case.get( name, base.get( name, np.nan ) ) for case in cases ], dtype=float )
+    if geoparm:
+        sza, slt = solar_geometry( column( 'YYDDD' ), column( 'UTSEC' ), column( 'GLAT' ), column( 'GLON' ) )
+        kinds = regime( sza, margin )
+    else:
+        sza, slt = column( 'SZA' ), column( 'SLT' )
+        kinds = regime( sza )
+    plan = SweepPlan( sza, slt, kinds, OrderedDict() )
+    # of the case parameters, only the regime changes the commands
+    for kind, typical in ( ('day', 45.0), ('night', 145.0) ):
+        members = [ int(i) for i in np.flatnonzero( kinds == kind ) ]
+        if members:
+            plan.groups[ tuple( batch_stages( auric, {'SZA':typical} ) ) ] = members
+    return plan
@@ -1,12 +1,18 @@
-import os, re, traceback, shutil
+import os, re, traceback, shutil, tempfile, logging
 import numpy as np
 from .reader import auric_file_reader
 from .command import Command, InputCommand
 from .switch import Switch
-from .batch import assemble_batch_run
+from .batch import assemble_batch_run, run_batch, run_batch_async
 from .bands import _bands
+from .cache import ParseCache, _file_stamp
+from .runcache import run_outputs, stage_outputs
+from .pool import clone_inputs
+from .archive import archive_name, read_archive, write_archive
 from collections import OrderedDict, ChainMap
 
+logger = logging.getLogger(__name__)
+
 _AURIC_ROOT = os.getenv("AURIC_ROOT")
 if _AURIC_ROOT is None:
     _AURIC_ROOT=os.path.join(os.getenv("HOME"),"auric")
@@ -43,14 +49,33 @@ class AURICManager( object ):
         N2+ Meinel
     no_bands: bool, optional
         NO Bands (Gamma, Delta, Epsilon)
+    cache_size: int, optional
+        Memory budget in bytes for parsed files. 0 disables the cache.
 
     Attributes
     ----------
-    TODO
+    cache: ParseCache
+        Parsed files, reused until the file changes on disk. Parsed output
+        files are shared with the cache, so don't modify them in place.
+    sinks: list of callables or None
+        Where commands send their output, see Command. None prints it.
+    tracer: Tracer or None
+        If set, records the timing of every command the manager runs.
+    run_cache: RunCache or None
+        If set, batch runs whose inputs match a stored run copy its
+        outputs instead of running AURIC, and new runs are stored.
+    scratch: Scratch or None
+        If set, batches run in a memory-backed scratch directory and only
+        the final outputs are copied back to `path`.
+    deck: InputDeck
+        param.inp, view.inp and radtrans.opt, edited in memory by
+        set_params and write. The edited files are written by flush, which
+        is called before every run and clone.
     """
     def __init__( self, path=_AURIC_ROOT,
                   band_options=_band_options_default,
                   use_eflux = False,
+                  cache_size = 64*2**20,
                   **band_kwds):
         assert os.path.isdir(path), "Invalid AURIC path, '{}'".format( path )
         self.path = os.path.abspath( path )
@@ -58,31 +83,111 @@ class AURICManager( object ):
                      "PATH":":".join([_AURIC_BIN_DIR,
                                         os.getenv("PATH")])
         }
+        self.sinks = None
+        self.tracer = None
+        self.run_cache = None
+        self.scratch = None
         self.batchfile = os.path.join( path, "onerun.sh" )
         self.batch_command = self.new_command( ["bash", self.batchfile] )
         self._reader = auric_file_reader()
-        self.band_options = band_options
+        self.cache = ParseCache( cache_size )
+        self.deck = InputDeck( self.path, self.cache )
+        self.band_options = dict( band_options )
         self.use_eflux = use_eflux
         for k,v in band_kwds.items():
             self.band_options[k] = v
 
     def new_command(self,cmd):
         """Create a process for an auric command with the proper environment."""
-        return Command(cmd,env=self.env,cwd=self.path)
+        return Command(cmd,env=self.env,cwd=self.path,sinks=self.sinks)
+
+    def runbatch( self, timeout=None, incremental=False, concurrency=1 ):
+        """Execute the batch run.
 
-    def runbatch( self, timeout=10 ):
-        """Execute batch file."""
+        Parameters
+        ----------
+        timeout: float, optional
+            seconds each command may run before it is killed. Default is
+            no limit.
+        incremental: bool
+            Only run the stages whose input files changed since they last
+            ran successfully, and the stages downstream of them.
+        concurrency: int
+            Maximum number of independent stages (e.g. the syn_* commands)
+            running at once.
+
+        Returns
+        -------
+        codes: list
+            return code of each command in the batch, None if it was skipped
+            or its outputs were restored from the run cache
+        """
         #self.batch_command.run( timeout )
-        for cmd in self.batch:
-            cmd.run()
-        #return "running onerun.sh"
+        self.flush()
+        key, codes = self._restore_run()
+        if codes is None and self.scratch is not None:
+            codes = self.scratch.run( self, concurrency, timeout, incremental=incremental,
+                                      finished=lambda work, codes: self._store_run( key, codes, work ) )
+        elif codes is None:
+            codes = list( run_batch( self, incremental, concurrency, timeout ).values() )
+            self._store_run( key, codes )
+        # AURIC rewrites its outputs in place
+        self.cache.invalidate()
+        return codes
+
+    def _restore_run( self ):
+        """Key of this run in the run cache, and codes if its outputs were restored."""
+        if self.run_cache is None:
+            return None, None
+        key = self.run_cache.key( self )
+        if self.run_cache.restore( key, self.path ):
+            logger.info( "restored outputs from the run cache" )
+            return key, [None] * len( self.batch )
+        return key, None
+
+    def _store_run( self, key, codes, work=None ):
+        """Store the outputs of a successful run in the run cache. `work` is the manager it ran in, if not this one."""
+        work = work or self
+        if key is not None and all( c in (0, None) for c in codes ):
+            self.run_cache.store( key, work.path, run_outputs( work ), stage_outputs( work ) )
 
     def customrun( self, commands, timeout=10 ):
+        self.flush()
         commands = map(self.new_command, commands)
         for cmd in commands:
-            cmd.run(timeout)
+            self._trace( cmd.execute(timeout=timeout) )
+        self.cache.invalidate()
         return "running {}".format(" ".join( [ c.cmd for c in commands ] ) )
 
+    async def runbatch_async( self, timeout=None, incremental=False, concurrency=1 ):
+        """asyncio version of runbatch, with the same arguments.
+
+        Cancelling the task kills the running commands."""
+        self.flush()
+        try:
+            key, codes = self._restore_run()
+            if codes is None and self.scratch is not None:
+                codes = await self.scratch.run_async( self, concurrency, timeout, incremental=incremental,
+                                                      finished=lambda work, codes: self._store_run( key, codes, work ) )
+            elif codes is None:
+                codes = list( ( await run_batch_async( self, incremental, concurrency, timeout ) ).values() )
+                self._store_run( key, codes )
+        finally:
+            self.cache.invalidate()
+        return codes
+
+    async def customrun_async( self, commands, timeout=10 ):
+        """asyncio version of customrun. Returns the return code of each command."""
+        self.flush()
+        codes = []
+        try:
+            for cmd in map(self.new_command, commands):
+                result = self._trace( await cmd.execute_async( timeout=timeout ) )
+                codes.append( result.returncode )
+        finally:
+            self.cache.invalidate()
+        return codes
+
     def run_geoparm(self,compute_F107_and_Ap):
         """The command `geoparm` derives the geomagnetic coordinates, solar zenith angle, and solar local time from the mandatory parameters. It requires user input to specify whether F10.7 and Ap should be computed or left alone.
 
@@ -96,16 +201,36 @@ class AURICManager( object ):
         out: int
             return code of geoparm
         """
+        self.flush()
         input_string = b'Y\n' if compute_F107_and_Ap else b'N\n'
-        geoparm = InputCommand(cmd='geoparm',env=self.env,cwd=self.path)
-        out = geoparm.run(input_string)
+        geoparm = InputCommand(cmd='geoparm',env=self.env,cwd=self.path,sinks=self.sinks)
+        out = self._trace( geoparm.execute(input_string) ).returncode
+        # geoparm rewrites param.inp in place, often with the same size
+        self.deck.reload( 'param.inp' )
+        return out
+
+    async def run_geoparm_async( self, compute_F107_and_Ap, timeout=None ):
+        """asyncio version of run_geoparm."""
+        self.flush()
+        input_string = b'Y\n' if compute_F107_and_Ap else b'N\n'
+        geoparm = InputCommand(cmd='geoparm',env=self.env,cwd=self.path,sinks=self.sinks)
+        try:
+            out = self._trace( await geoparm.execute_async( input_string, timeout ) ).returncode
+        finally:
+            self.deck.reload( 'param.inp' )
         return out
     
+    def _trace( self, result ):
+        """Pass a CommandResult to the tracer, if there is one."""
+        if self.tracer is not None:
+            self.tracer.record( result, self.path, nalt=self.params.get( 'NALT' ) )
+        return result
+
     def retrieve( self, filename, 
         features=['O+e 832 A (initial)','O+e 833 A (initial)','O+e 834 A (initial)',
         'O+hv 832 A (initial)','O+hv 833 A (initial)','O+hv 834 A (initial)'] ):
         """Retrieve desired features from file 'filename'."""
-        data = read_auric_file( self.pathto( filename ) )
+        data = self.index( filename ).read( features )
         out={}
         out["ALT"] = np.asarray(data["ALT"])
         out["ZA"] = np.asarray(data["ZA"])
@@ -113,138 +238,292 @@ class AURICManager( object ):
             out[feature] = np.asarray(data["profiles"][feature])
         return out
 
+    def index( self, filename ):
+        """Index of the AURIC output file `filename`. The index is kept and reused until the file changes."""
+        fpath = self.pathto( filename )
+        return self.cache.get( ('index', fpath), [fpath], lambda: AURICFileIndex( fpath ) )
+
     def read( self, fname ):
         """Parse data from an auric input or output file."""
         fpath = self.pathto( fname )
         out=None
         try:
             if fname == 'view.inp':
-                out = read_view( fpath )
+                out = self.deck.view
             elif fname == 'radtrans.opt':
-                out = read_radtrans_options( fpath )
+                out = self.deck.radtrans_options
             else:
-                out = read_auric_file( fpath )
+                out = self.cache.get( ('read', fpath), [fpath], lambda: read_auric_file( fpath ) )
         except Exception as err:
             traceback.print_exc()
             print("pyauric doesn't recognize this type of file.")
         finally:
             return out
 
-    def write( self, fname, ftype=None, options={}, **kwargs ):
-        fpath = self.pathto( fname )
+    def write( self, fname, ftype=None, options={} ):
+        """Change view.inp or radtrans.opt. The file is written by the next flush."""
         if fname == "view.inp" or ftype == "view":
             h, za = self.view
             viewdict = ChainMap(options, {'ZOBS': h, 'ZA': za})
-            h, za = viewdict["ZOBS"], viewdict["ZA"]
-            write_view( filename=fpath, h=h, za=za )
+            self.deck.set_view( viewdict["ZOBS"], viewdict["ZA"] )
         elif fname == "radtrans.opt" or ftype == "radtrans":
-            write_radtrans_options( filename=fpath, options=options, **kwargs )
+            self.deck.set_radtrans_options( options )
         else:
             raise Exception("pyauric doesn't know how to write that kind of file yet.")
 
+    def flush( self ):
+        """Write the input files edited since the last flush. Returns their names."""
+        written = self.deck.flush()
+        for fname in written:
+            self.cache.invalidate( self.pathto( fname ) )
+        return written
+
     def pathto( self, fname ):
         """Absolute path to file 'fname' in the auric directory."""
         return os.path.abspath( os.path.join( self.path, fname ) )
 
     def set_params( self, paramdict ):
-        """Change the values in param.inp using a dictionary."""
-        filename = self.pathto('param.inp')
-        update_params( filename, paramdict )
+        """Change the values in param.inp using a dictionary. The file is written by the next flush."""
+        self.deck.set_params( paramdict )
         return paramdict
 
     def load(self, filename,**kwargs):
-        """Load data from `filename`. Default behavior returns a pandas data frame. Pass returnDataFrame=False to get a dictionary instead."""
-        df = self._reader.read(os.path.join(self.path,filename),**kwargs)
+        """Load data from `filename`. Default behavior returns a pandas data frame. Pass returnDataFrame=False to get a dictionary instead.
+
+        If there is an archive of the file (see archive) made from its
+        current version, the data are memory-mapped from the archive instead.
+        If only a gzipped copy of the file (`filename`.gz) is left, it is
+        decompressed as it is read.
+
+        Parsed files are cached (see cache). Each call returns its own data
+        frame, but with returnDataFrame=False the arrays are shared with the
+        cache and read-only; copy them before changing them."""
+        fpath = self.pathto( filename )
+        apath = archive_name( fpath )
+        if set( kwargs ) <= {'returnDataFrame', 'engine'} and os.path.isfile( apath ):
+            arc = self.cache.get( ('archive', apath), [apath], lambda: read_archive( apath ) )
+            if arc.is_current( fpath ):
+                return arc.read( kwargs.get( 'returnDataFrame', True ) )
+        if not os.path.isfile( fpath ) and os.path.isfile( fpath + '.gz' ):
+            fpath += '.gz'
+        key = ('load', fpath, tuple(sorted(kwargs.items())))
+        df = self.cache.get( key, [fpath], lambda: self._reader.read(fpath,**kwargs) )
         return df
 
+    def archive(self, filename, dtype=np.float64):
+        """Write a binary archive of output file `filename` that load will use instead of the text. Returns its path."""
+        return write_archive( self.pathto( filename ), params=self.params, dtype=dtype )
+
     def exists(self,fname):
         return os.path.isfile(self.pathto(fname))
 
     def clone(self, newpath, *args, **kwargs):
         '''Make a copy of this auric manager in a new directory. This copies
         .inp and .opt files. The new directory is created if necessary.
+
+        The files are reflinked where the filesystem supports it and copied
+        otherwise, never hard linked, so editing the clone's files can't
+        change this directory's.
         '''
+        self.flush()
         if not os.path.exists(newpath):
             os.mkdir(newpath)
 
-        # dbpath.inp, param.inp, view.inp should always be present
+        # dbpath.inp, param.inp, view.inp should always be present. The .opt
+        # files may not be.
+        cloned = clone_inputs(self.path, newpath)
         for file in ["dbpath.inp", "param.inp", "view.inp"]:
-            shutil.copy(self.pathto(file), os.path.join(newpath))
-
-        # The .opt files may not be present
-        for file in ["ly_alpha.opt", "ly_beta.opt", "radtrans.opt"]:
-            try:
-                shutil.copy(self.pathto(file), os.path.join(newpath))
-            except FileNotFoundError:
-                pass
-                
+            if file not in cloned:
+                raise FileNotFoundError(self.pathto(file))
 
         # Return a new instance
-        return self.__class__(newpath, *args, **kwargs)
+        new = self.__class__(newpath, *args, **kwargs)
+        new.sinks, new.tracer, new.run_cache = self.sinks, self.tracer, self.run_cache
+        new.scratch = self.scratch
+        new.env = dict(self.env)
+        return new
     
     @property
     def radtrans_options( self ):
-        return self.read('radtrans.opt')
+        return self.deck.radtrans_options
     
     @property
     def view( self ):
-        return self.read( 'view.inp' )
+        return self.deck.view
     
     @property
     def params( self ):
-        p = [x for x in parse_params( self.pathto( 'param.inp' ) ) if len(x)>1]
-        return {x[0]:x[1] for x in p}
+        return self.deck.params
         #return parse_params( self.pathto( 'param.inp' ) )
 
     @property
     def batch(self):
         return list(assemble_batch_run(self))
 
-def read_auric_file( filename ):
+_ZA_HEADING = "Zenith Angles (deg)"
+_ALT_HEADING = "Altitudes (km)"
+_decimal_pattern = re.compile(r"([ ]*[0-9]*\.[0-9]*[ ]*)*") # match decimal numbers separated by whitespace
+_sci_pattern = re.compile(r"([ ]*[0-9]\.[0-9]{3}E(\+|-)[0-9]{2}[ ]*)*") # match floats in sci. notation
+
+class AURICFileIndex( object ):
+    """Byte offsets of the sections of an AURIC output file.
+
+    Building the index only looks at the heading lines, so a few profiles
+    can be read from a large file without parsing the rest of it. The index
+    remembers the modification time and size of the file, so it can be
+    reused until the file changes.
+
+    Parameters
+    ----------
+    filename: string
+        AURIC output file to index
+
+    Attributes
+    ----------
+    header: OrderedDict
+        'ZOBS' and 'type' entries found in the headings, if any
+    sections: dict
+        byte ranges of the 'ZA' and 'ALT' sections
+    profiles: OrderedDict
+        byte ranges of each profile, in the order they appear in the file
+    """
+    def __init__( self, filename ):
+        self.filename = filename
+        self.stamp = _file_stamp( filename )
+        self.header = OrderedDict()
+        self.sections = { "ZA":[], "ALT":[] }
+        self.profiles = OrderedDict()
+        with open( filename, 'rb' ) as f:
+            self._build( f.read() )
+
+    @property
+    def features( self ):
+        return list( self.profiles )
+
+    def is_current( self ):
+        """Whether the file is unchanged since it was indexed."""
+        try:
+            return _file_stamp( self.filename ) == self.stamp
+        except FileNotFoundError:
+            return False
+
+    def _build( self, raw ):
+        buf = np.frombuffer( raw, dtype=np.uint8 )
+        ends = np.flatnonzero( buf == ord('\n') ) + 1
+        if raw and not raw.endswith( b'\n' ):
+            ends = np.append( ends, len(raw) )
+        if len(ends) == 0:
+            return
+        starts = np.concatenate( ([0], ends[:-1]) )
+        # headings start with anything but a space, including empty lines
+        headings = np.flatnonzero( buf[starts] != ord(' ') )
+        nlines = len(starts)
+
+        def line( i ):
+            return raw[starts[i]:ends[i]].decode()
+
+        ranges = None           # where lines under the current heading go
+        def attribute( first, last ):
+            if ranges is None or first >= last:
+                return
+            start, stop = int(starts[first]), int(ends[last-1])
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = ( ranges[-1][0], stop )
+            else:
+                ranges.append( ( start, stop ) )
+
+        heading = None
+        # headings are not consistent across all auric files T.T
+        first = line(0)
+        if re.search(r"observer altitude \(km\)", first):
+            self.header['ZOBS'] = re.search(r".[0-9]+\.[0-9]+", first).group(0)
+            heading = _ZA_HEADING
+            ranges = self.sections["ZA"]
+
+        # skip the first line, because it just describes the size of the data.
+        i = 1
+        for h in list( headings[headings > 0] ) + [nlines]:
+            # lines i..h-1 belong to the current heading
+            if "ZOBS" == heading:
+                for j in range( i, h ):
+                    if not self._zobs( line(j) ):
+                        attribute( j, j+1 )
+            else:
+                attribute( i, h )
+            if h == nlines:
+                break
+            text = line(h)
+            heading = re.search(r"[^\=]*",text).group(0).strip() # match all non-equals signs
+            if "ZOBS" == heading:
+                if self._zobs( text ):
+                    i = h+1
+                    continue
+            elif _ZA_HEADING in heading:
+                ranges = self.sections["ZA"]
+            elif _ALT_HEADING in heading:
+                ranges = self.sections["ALT"]
+            elif re.search(r"\A[A-Z][a-z][a-z]+",heading):
+                self.header['type'] = heading
+            elif re.search(r"\A[0-9]{3,4} A|\A[A-Z.*[0-9].*|\A\[",heading): # match a wavelength, transition name, or initial bracket
+                if heading not in self.profiles:
+                    ranges = self.profiles[heading] = []
+                    i = h+1
+                    continue
+                ranges = self.profiles[heading]
+            attribute( h, h+1 )
+            i = h+1
+
+    def _zobs( self, text ):
+        m = re.search(r"(?<=ZOBS \= )[0-9]{3}\.[0-9]{3}",text) # match ###.### after 'ZOBS = '
+        if m:
+            self.header['ZOBS'] = float(m.group(0))
+        return m
+
+    def read( self, features=None ):
+        """Parse the index sections and the profiles in `features`.
+
+        Parameters
+        ----------
+        features: list of strings, optional
+            names of the profiles to parse. Default is all of them.
+
+        Returns
+        -------
+        out: OrderedDict
+            same layout as read_auric_file
+        """
+        if features is None:
+            features = self.features
+        out = OrderedDict()
+        with open( self.filename, 'rb' ) as f:
+            out["ZA"] = self._parse( f, self.sections["ZA"], _decimal_pattern )
+            out["ALT"] = self._parse( f, self.sections["ALT"], _decimal_pattern )
+            out["profiles"] = OrderedDict()
+            for feature in features:
+                out["profiles"][feature] = self._parse( f, self.profiles[feature], _sci_pattern )
+        out.update( self.header )
+        return out
+
+    @staticmethod
+    def _parse( f, ranges, pattern ):
+        data = []
+        for start, stop in ranges:
+            f.seek( start )
+            for line in f.read( stop - start ).decode().splitlines():
+                m = pattern.search(line)
+                if m:
+                    data.extend([float(n) for n in m.group(0).split()])
+        return data
+
+def read_auric_file( filename, features=None, index=None ):
     """Reads a file from AURIC and returns a dictionary of the file's contents.
     
-    All data for the line named ### are returned in out['profiles']['###']."""
-    with open(filename,'r') as f:
-        lines=f.readlines()
-    heading = None
-    out = OrderedDict()
-    out["ZA"] = []
-    out["ALT"] = []
-    out["profiles"] = OrderedDict()
-    # https://stackoverflow.com/questions/940822/regular-expression-syntax-for-match-nothing
-    pattern = r"(?!)"           # Matches nothing (not even the empty string)
-    data = []
-    # headings are not consistent across all auric files T.T
-    if re.search(r"observer altitude \(km\)", lines[0]):
-        out['ZOBS'] = re.search(r".[0-9]+\.[0-9]+", lines[0]).group(0)
-        heading = "Zenith Angles (deg)"
-    for i, line in enumerate(lines[1:]): # skip the first line, because it just describes the size of the data.
-        if re.search(r"\A[^ ]",line):
-            heading = re.search(r"[^\=]*",line).group(0).strip() # match all non-equals signs
-        if "ZOBS" == heading:
-            m = re.search(r"(?<=ZOBS \= )[0-9]{3}\.[0-9]{3}",line) # match ###.### after 'ZOBS = '
-            if m: 
-                out['ZOBS']=float(m.group(0))
-                continue
-        elif "Zenith Angles (deg)" in heading:
-            pattern = r"([ ]*[0-9]*\.[0-9]*[ ]*)*" # match decimal numbers separated by whitespace
-            data = out["ZA"]
-        elif "Altitudes (km)" in heading:
-            pattern = r"([ ]*[0-9]*\.[0-9]*[ ]*)*" # match decimal numbers separated by whitespace
-            data = out["ALT"]
-        elif re.search(r"\A[A-Z][a-z][a-z]+",heading):
-            out['type'] = heading
-        elif re.search(r"\A[0-9]{3,4} A|\A[A-Z.*[0-9].*|\A\[",heading): # match a wavelength, transition name, or initial bracket
-            if heading not in out["profiles"]: 
-                out["profiles"][heading] = []
-                continue
-            pattern = r"([ ]*[0-9]\.[0-9]{3}E(\+|-)[0-9]{2}[ ]*)*" # match floats in sci. notation
-            data = out["profiles"][heading]
- 
-        m = re.search(pattern,line)
-        if m:
-            data.extend([float(n) for n in m.group(0).split()])
-    return out
+    All data for the line named ### are returned in out['profiles']['###'].
+    Pass a list of `features` to parse only those profiles, and an
+    AURICFileIndex of the file as `index` to skip indexing it again."""
+    if index is None or not index.is_current():
+        index = AURICFileIndex( filename )
+    return index.read( features )
 
 def read_view(filename="view.inp"):
     """Read view.inp, which has a weird format."""
@@ -271,9 +550,11 @@ def read_radtrans_options(filename='radtrans.opt'):
             options[m.group(1)]=Switch(m.group(2))
     return options
 
+_radtrans_keys = ['832', '833', '834', '1304', '1356', '1040', '1026', '989', '1048', '1066', '1135', '1199']
+
 def write_radtrans_options( filename='radtrans.opt', options={} ):
     """Takes a dictionary of options and a filename and writes a radtrans options file for use with AURIC."""
-    keylist=['832', '833', '834', '1304', '1356', '1040', '1026', '989', '1048', '1066', '1135', '1199']
+    keylist=_radtrans_keys
     for key in keylist:
         if key not in options.keys():
             options[key] = Switch("OFF") #set any missing keys to OFF
@@ -318,16 +599,150 @@ def modify_params( parsed_lines, paramdict ):
 def write_params( filename, parsed_lines ):
     """Writes a set of lines parsed by parse_params to *filename*."""
     intkeys = ['NALT', 'YYDDD'] 
-    lines=[None]*32
-    for i, line in enumerate(parsed_lines):
-        if isinstance(parsed_lines[i], str):
-            lines[i]=parsed_lines[i]
-        elif parsed_lines[i][0] in intkeys:
-            lines[i] = "{: >12s} = {: >10.0f} : {:<s}\n".format(*parsed_lines[i])
-        elif parsed_lines[i][1] == -1:
-            lines[i] = "{: >12s} = {: >10.0f} : {:<s}\n".format(*parsed_lines[i])
+    lines=[]
+    for line in parsed_lines:
+        if isinstance(line, str):
+            lines.append(line)
+        elif line[0] in intkeys:
+            lines.append("{: >12s} = {: >10.0f} : {:<s}\n".format(*line))
+        elif line[1] == -1:
+            lines.append("{: >12s} = {: >10.0f} : {:<s}\n".format(*line))
         else:
-            lines[i] = "{: >12s} = {: >10.2f} : {:<s}\n".format(*parsed_lines[i])
+            lines.append("{: >12s} = {: >10.2f} : {:<s}\n".format(*line))
     with open( filename, 'w' ) as f:
         for line in lines:
             f.write(line)
+
+def _atomic_write( filename, write, *args ):
+    """Call write(tmpname, *args) and rename the result to `filename`, so
+    readers never see a partly written file."""
+    fd, tmp = tempfile.mkstemp( prefix=".{}.".format( os.path.basename( filename ) ), suffix=".tmp",
+                                dir=os.path.dirname( filename ) )
+    os.close( fd )
+    try:
+        write( tmp, *args )
+        # mkstemp makes the file private; keep the mode the file had
+        if os.path.exists( filename ):
+            shutil.copymode( filename, tmp )
+        else:
+            os.chmod( tmp, 0o644 )
+        os.replace( tmp, filename )
+    finally:
+        if os.path.exists( tmp ):
+            os.remove( tmp )
+
+class InputDeck( object ):
+    """The input files of an AURIC directory, parsed once and edited in memory.
+
+    param.inp, view.inp and radtrans.opt are parsed through a ParseCache,
+    so they are parsed the first time they are needed and again only if
+    they change on disk. Edits are made to a copy and mark the file dirty;
+    flush writes the dirty files, each with a write-and-rename so AURIC
+    never reads a partial file. If a dirty file also changes on disk, the
+    edits in memory win.
+
+    Parameters
+    ----------
+    path: string
+        AURIC working directory
+    cache: ParseCache, optional
+        cache of the parsed files. Default is a new one.
+    """
+    files = ( 'param.inp', 'view.inp', 'radtrans.opt' )
+
+    def __init__( self, path, cache=None ):
+        self.path = path
+        self.cache = ParseCache() if cache is None else cache
+        self._data = {}         # file name -> edited contents
+        self.dirty = set()
+
+    def _get( self, fname ):
+        if fname in self.dirty:
+            return self._data[fname]
+        fpath = os.path.abspath( os.path.join( self.path, fname ) )
+        return self.cache.get( ('deck', fpath), [fpath], lambda: self._parse( fname, fpath ) )
+
+    def _edit( self, fname ):
+        """Contents of `fname` to edit, marking it dirty."""
+        if fname not in self.dirty:
+            self._data[fname] = self._get( fname )
+            self.dirty.add( fname )
+        return self._data[fname]
+
+    @staticmethod
+    def _parse( fname, fpath ):
+        if fname == 'param.inp':
+            return parse_params( fpath )
+        if fname == 'view.inp':
+            return read_view( fpath )
+        # radtrans.opt is optional
+        return read_radtrans_options( fpath ) if os.path.isfile( fpath ) else {}
+
+    def reload( self, fname ):
+        """Forget the parsed `fname`, e.g. after a program other than AURICManager rewrote it.
+
+        The file is parsed again the next time it is needed, even if its
+        modification time and size are unchanged. Edits to it that have not
+        been flushed are lost."""
+        self._data.pop( fname, None )
+        self.dirty.discard( fname )
+        self.cache.invalidate( os.path.join( self.path, fname ) )
+
+    @property
+    def params( self ):
+        """Dictionary of the values in param.inp."""
+        return {x[0]:x[1] for x in self._get( 'param.inp' ) if len(x)>1}
+
+    def set_params( self, paramdict ):
+        """Change the values in param.inp using a dictionary."""
+        modify_params( self._edit( 'param.inp' ), paramdict )
+
+    @property
+    def view( self ):
+        """Observer altitude and zenith angles from view.inp."""
+        h, za = self._get( 'view.inp' )
+        return h, za.copy()
+
+    def set_view( self, h=None, za=None ):
+        """Change the observer altitude and/or zenith angles in view.inp."""
+        old_h, old_za = self._edit( 'view.inp' )
+        self._data['view.inp'] = ( old_h if h is None else float(h),
+                                   old_za if za is None else np.asarray( za, dtype=float ) )
+
+    @property
+    def radtrans_options( self ):
+        """Dictionary of the options in radtrans.opt."""
+        return dict( self._get( 'radtrans.opt' ) )
+
+    def set_radtrans_options( self, options ):
+        """Replace the options in radtrans.opt. Missing options are OFF."""
+        switches = { k:Switch("OFF") for k in _radtrans_keys }
+        switches.update( ( k, Switch(v) ) for k, v in options.items() )
+        self._data['radtrans.opt'] = switches
+        self.dirty.add( 'radtrans.opt' )
+
+    def flush( self ):
+        """Write the files that were edited. Returns their names."""
+        written = []
+        for fname in self.files:
+            if fname not in self.dirty:
+                continue
+            fpath = os.path.join( self.path, fname )
+            data = self._data[fname]
+            if fname == 'param.inp':
+                _atomic_write( fpath, write_params, data )
+            elif fname == 'view.inp':
+                _atomic_write( fpath, write_view, data[0], data[1] )
+            else:
+                _atomic_write( fpath, write_radtrans_options, dict( data ) )
+            self.cache.invalidate( fpath )
+            self.dirty.discard( fname )
+            self._data.pop( fname )
+            written.append( fname )
+        return written
+
+    def discard( self ):
+        """Forget the edits that have not been flushed."""
+        for fname in self.dirty:
+            self._data.pop( fname, None )
+        self.dirty.clear()
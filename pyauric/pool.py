@@ -0,0 +1,202 @@
+"""Reusable AURIC working directories.
+
+Making a fresh clone for every run costs a directory and a copy of every
+input file, and leaves the directory behind. A WorkdirPool creates its
+directories once from a template manager and lends them out; when a lease
+ends, everything but the input deck is removed and the deck is put back the
+way the template has it.
+
+    with WorkdirPool(auric, '/scratch/pool', 4) as pool:
+        with pool.lease() as case:
+            case.set_params({'GLAT': 30})
+            case.runbatch()
+            intensities = case.retrieve('mergeint.int')
+
+Input files are cloned with a reflink (a copy-on-write copy, on filesystems
+that support it) and copied otherwise. They are never hard linked: a case
+that wrote to a hard link, through AURIC or by hand, would change the
+template and every other clone.
+"""
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # not on Windows
+    fcntl = None
+
+from .cache import _file_stamp
+
+# files pyauric or AURIC may rewrite in place. The others are normally only
+# read, but nothing stops a case from editing them.
+_edited_files = ['param.inp', 'view.inp', 'radtrans.opt']
+_shared_files = ['dbpath.inp', 'ly_alpha.opt', 'ly_beta.opt']
+input_files = _edited_files + _shared_files
+
+_FICLONE = 0x40049409   # linux ioctl that shares the blocks of a file
+
+def clone_settings( auric ):
+    """Keyword arguments that make a clone of `auric` behave like it."""
+    return { "band_options":dict( auric.band_options ),
+             "use_eflux":auric.use_eflux,
+             "cache_size":auric.cache.maxsize }
+
+def _reflink( src, dst ):
+    if fcntl is None:
+        raise OSError( "reflinks are not supported" )
+    with open( src, 'rb' ) as s, open( dst, 'wb' ) as d:
+        fcntl.ioctl( d.fileno(), _FICLONE, s.fileno() )
+    shutil.copystat( src, dst )
+
+def clone_file( src, dst, link=True ):
+    """Make `dst` a copy of `src` that keeps its modification time.
+
+    Parameters
+    ----------
+    src, dst: string
+    link: bool
+        share the data with `src` through a reflink if possible, so the
+        blocks are only copied when one of the files is written to
+
+    Returns
+    -------
+    how: string
+        'reflink' or 'copy'
+    """
+    if os.path.lexists( dst ):
+        os.remove( dst )
+    if link:
+        try:
+            _reflink( src, dst )
+            return 'reflink'
+        except OSError:
+            if os.path.lexists( dst ):
+                os.remove( dst )
+    shutil.copy2( src, dst )
+    return 'copy'
+
+def clone_inputs( src, dst, link=True ):
+    """Clone the input files in directory `src` that exist into `dst`. Returns their names."""
+    cloned = []
+    for fname in input_files:
+        try:
+            clone_file( os.path.join( src, fname ), os.path.join( dst, fname ), link )
+        except FileNotFoundError:
+            continue
+        cloned.append( fname )
+    return cloned
+
+class WorkdirPool( object ):
+    """A fixed set of working directories made from a template AURICManager.
+
+    Parameters
+    ----------
+    template: AURICManager
+        its input files are cloned into every directory, and leases are
+        managers with its settings, environment, sinks, tracer, run cache and
+        scratch.
+    root: string
+        directory in which the pool directories are created
+    size: int
+        number of directories
+    link: bool
+        reflink input files from the template where possible (see clone_file)
+
+    Attributes
+    ----------
+    slots: list of strings
+        the pool directories
+    """
+    def __init__( self, template, root, size, link=True ):
+        template.flush()
+        self.template = template
+        self.root = os.path.abspath( root )
+        self.link = link
+        width = len( str( max( size - 1, 0 ) ) )
+        self.slots = [ os.path.join( self.root, "slot-{:0{}d}".format( i, width ) ) for i in range( size ) ]
+        for slot in self.slots:
+            os.makedirs( slot, exist_ok=True )
+            self.reset( slot )
+        self._free = list( reversed( self.slots ) )
+        self._cond = threading.Condition()
+
+    def __len__( self ):
+        return len( self.slots )
+
+    def __getstate__( self ):
+        # leases are only handed out in the process that made the pool
+        state = self.__dict__.copy()
+        del state["_free"], state["_cond"]
+        return state
+
+    def __setstate__( self, state ):
+        self.__dict__.update( state )
+        self._free = []
+        self._cond = threading.Condition()
+
+    def manager( self, slot ):
+        """An AURICManager for directory `slot`, set up like the template."""
+        new = self.template.__class__( slot, **clone_settings( self.template ) )
+        new.sinks, new.tracer, new.run_cache = self.template.sinks, self.template.tracer, self.template.run_cache
+        new.scratch = self.template.scratch
+        new.env = dict( self.template.env )
+        return new
+
+    def reset( self, slot ):
+        """Remove everything but the input files from `slot` and restore the template's input files."""
+        keep = {}
+        for fname in input_files:
+            try:
+                keep[fname] = _file_stamp( os.path.join( self.template.path, fname ) )
+            except FileNotFoundError:
+                pass
+        for entry in os.scandir( slot ):
+            if entry.name in keep:
+                st = entry.stat( follow_symlinks=False )
+                if ( st.st_mtime_ns, st.st_size ) == keep[entry.name]:
+                    del keep[entry.name]
+                    continue
+            if entry.is_dir( follow_symlinks=False ):
+                shutil.rmtree( entry.path )
+            else:
+                os.remove( entry.path )
+        for fname in keep:
+            clone_file( os.path.join( self.template.path, fname ), os.path.join( slot, fname ), self.link )
+
+    @contextmanager
+    def lease( self, timeout=None ):
+        """Borrow a directory, waiting for one to be free.
+
+        Yields an AURICManager for the directory. It is reset when the
+        lease ends, so read what you need from it inside the block.
+        """
+        with self._cond:
+            if not self._cond.wait_for( lambda: self._free, timeout ):
+                raise TimeoutError( "no free AURIC directory in {}".format( self.root ) )
+            slot = self._free.pop()
+        try:
+            yield self.manager( slot )
+        finally:
+            try:
+                self.reset( slot )
+            finally:
+                with self._cond:
+                    self._free.append( slot )
+                    self._cond.notify()
+
+    def close( self ):
+        """Remove the pool directories."""
+        for slot in self.slots:
+            shutil.rmtree( slot, ignore_errors=True )
+        try:
+            os.rmdir( self.root )
+        except OSError:
+            pass
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
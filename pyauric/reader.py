@@ -7,7 +7,21 @@ except ImportError as err:
 else:
     _has_pandas=True
 from collections import OrderedDict
+import gzip
+import re
 
+_engines = ('fortran', 'numpy')
+
+# bytes that can appear in a numeric fortran record
+_numeric_bytes = np.zeros(256, dtype=bool)
+_numeric_bytes[np.frombuffer(b" 0123456789.+-EeDd", dtype=np.uint8)] = True
+
+
+def _open(filename, mode='r'):
+    """Open `filename`. Gzipped files (.gz) are decompressed as they are read."""
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode if 'b' in mode else mode + 't')
+    return open(filename, mode)
 
 class _dummy_reader( object ):
     def __init__(self):
@@ -16,17 +30,102 @@ class _dummy_reader( object ):
     def read(self, s):
         return [s.strip()]
 
+def _record_layout(fmt):
+    """Return (count, width) for a simple repeated record format like '6E12.3'."""
+    m = re.fullmatch(r"\s*([0-9]*)\s*[A-Z]+([0-9]+)(\.[0-9]+)?\s*", fmt.upper())
+    if m is None:
+        return None
+    return int(m.group(1) or 1), int(m.group(2))
+
+def _split_records(raw, width):
+    """Lay out the lines of `raw` as rows of a space-padded byte matrix.
+
+    Returns the matrix (one row of `width` bytes per line), the length of
+    each line and whether each line looks like a numeric record.
+    """
+    if raw and not raw.endswith(b'\n'):
+        raw += b'\n'
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))[:len(ends)]
+    lengths = ends - starts
+    cols = np.arange(width)
+    inside = cols[None, :] < lengths[:, None]
+    where = np.minimum(starts[:, None] + cols[None, :], max(len(buf) - 1, 0))
+    records = np.where(inside, buf[where], ord(' ')).astype(np.uint8)
+    is_data = _numeric_bytes[records].all(axis=1)
+    return records, lengths, is_data
+
 class auric_file_reader( object ):
+    """Read AURIC output files (.ver, .int, ...) into DataFrames.
+
+    Parameters
+    ----------
+    headingformat: string
+        format of the heading lines (unused, headings are read verbatim)
+    indexformat: string
+        fortran format of the index (ALT or ZA) records
+    dataformat: string
+        fortran format of the data records
+    engine: ['fortran' | 'numpy']
+        default parser engine. 'fortran' reads each line with
+        FortranRecordReader. 'numpy' finds the block boundaries in one pass
+        and decodes whole blocks at once, which is much faster on big files.
+    """
     def __init__(self,
         headingformat='A',
         indexformat='6F12.2',
-        dataformat='6E12.3'):
+        dataformat='6E12.3',
+        engine='fortran'):
         self.heading_reader = _dummy_reader()
         self.index_reader = ff.FortranRecordReader(indexformat)
         self.data_reader = ff.FortranRecordReader(dataformat)
+        self.index_layout = _record_layout(indexformat)
+        self.data_layout = _record_layout(dataformat)
+        self.engine = engine
+
+    def read(self, filename, returnDataFrame=True, engine=None):
+        """Read `filename`.
+
+        Parameters
+        ----------
+        filename: string
+            path to the AURIC output file
+        returnDataFrame: bool
+            return a pandas DataFrame if possible, otherwise a dictionary
+        engine: [None | 'fortran' | 'numpy']
+            parser engine for this call. Defaults to self.engine.
+        """
+        engine = self.engine if engine is None else engine
+        if engine == 'fortran':
+            info, index, data, name = self._read_fortran(filename)
+        elif engine == 'numpy':
+            info, index, data, name = self._read_numpy(filename)
+        else:
+            raise ValueError("engine must be one of {}, not {!r}".format(_engines, engine))
+
+        title = "Data from {}".format(filename.split('/')[-1])
+        if returnDataFrame and _has_pandas:
+            idx = pd.Index(list(index.values())[0],name=list(index.keys())[0])
+            df = pd.DataFrame(data,index=idx)
+            df.ylabel = name
+            df.filename = filename
+            df.title = title
+            # df.extra_info = info
+            return df
+        else:
+            out = { 'info':info
+                    , 'index':index
+                    , 'data':data
+                    , 'ylabel':name
+                    , 'filename':filename
+                    , 'title':title
+            }
+            return out
 
-    def read(self, filename, returnDataFrame=True):
-        with open(filename) as f:
+    def _read_fortran(self, filename):
+        """Read the file line by line with FortranRecordReader."""
+        with _open(filename) as f:
             lines = f.readlines()
 
         hr = self.heading_reader
@@ -80,23 +179,74 @@ class auric_file_reader( object ):
                 data_array =  np.hstack( data_list[::-1] )
                 index[header] = data_array
 
-        title = "Data from {}".format(filename.split('/')[-1])
-        if returnDataFrame and _has_pandas:
-            idx = pd.Index(list(index.values())[0],name=list(index.keys())[0])
-            df = pd.DataFrame(data,index=idx)
-            df.ylabel = name
-            df.filename = filename
-            df.title = title
-            # df.extra_info = info
-            return df
+        return info, index, data, name
+
+    def _read_numpy(self, filename):
+        """Find the header and data blocks in one pass and decode each block in bulk.
+
+        The block structure is interpreted exactly as in _read_fortran, so
+        both engines return the same result.
+        """
+        if self.index_layout is None or self.data_layout is None:
+            raise ValueError("the numpy engine only supports simple record formats like '6E12.3'")
+        with _open(filename, 'rb') as f:
+            raw = f.read()
+        if b'\r' in raw:
+            # _read_fortran reads in text mode, which turns CRLF and CR line
+            # endings into LF. A stray CR would make every record a header.
+            raw = raw.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        width = max(n * w for n, w in (self.index_layout, self.data_layout))
+        records, lengths, is_data = _split_records(raw, width)
+        lines = raw.split(b'\n')
+
+        def text(i):
+            return self.heading_reader.read(lines[i].decode())[0]
+
+        headers = np.flatnonzero(~is_data)
+        # block i spans the lines after headers[i] up to the next header
+        block_ends = np.append(headers[1:], len(lengths))
+
+        data = OrderedDict()
+        name = ""
+        # walk the blocks from the bottom up, like _read_fortran
+        for k in range(len(headers) - 1, -1, -1):
+            start, stop = headers[k] + 1, block_ends[k]
+            if stop == start:
+                #two headers in a row means we have hit the top of the data section
+                name = text(headers[k])
+                break
+            data[text(headers[k])] = self._decode(records, lengths, start, stop,
+                                                  self.data_layout, self.data_reader)
         else:
-            out = { 'info':info
-                    , 'index':index
-                    , 'data':data
-                    , 'ylabel':name
-                    , 'filename':filename
-                    , 'title':title
-            }
-            return out
+            raise ValueError("{} has no index section".format(filename))
 
+        # the index block is the one just above the name
+        if k == 0:
+            raise ValueError("{} has no index heading".format(filename))
+        start, stop = headers[k - 1] + 1, headers[k]
+        index = OrderedDict()
+        index[text(headers[k - 1])] = self._decode(records, lengths, start, stop,
+                                                   self.index_layout, self.index_reader)
+        info = [lines[i].decode() for i in range(headers[k - 1])]
+        return info, index, data, name
 
+    @staticmethod
+    def _decode(records, lengths, start, stop, layout, reader):
+        """Decode the numeric records in lines [start, stop) into a flat array."""
+        count, width = layout
+        block = np.ascontiguousarray(records[start:stop, :count * width])
+        fields = block.view('S{}'.format(width)).reshape(stop - start, count)
+        # fields past the end of a line are unwritten, blank fields read as zero
+        nfields = np.minimum(count, -(-lengths[start:stop] // width))
+        values = np.char.strip(fields[np.arange(count)[None, :] < nfields[:, None]])
+        values[values == b''] = b'0.'
+        try:
+            if (np.char.find(values, b'.') < 0).any():
+                raise ValueError("implied decimal point")
+            return values.astype(np.float64)
+        except ValueError:
+            # fall back to the fortran reader for anything numpy can't parse,
+            # e.g. exponents without an 'E' or implied decimal points
+            rows = [[x for x in reader.read(records[i, :lengths[i]].tobytes().decode())
+                     if x is not None] for i in range(start, stop)]
+            return np.hstack(rows).astype(np.float64)
@@ -0,0 +1,136 @@
+"""What to keep of the files a run leaves behind.
+
+A batch leaves every intermediate file in its directory, and a large sweep
+leaves them in every case directory. A RetentionPolicy decides for each
+output file, by the first of its rules whose pattern matches the name,
+whether to keep it, gzip it, convert it to a binary archive (see
+pyauric.archive) or delete it:
+
+    policy = RetentionPolicy([('merge*', 'archive'),
+                              ('*.int', 'compress'),
+                              ('*', 'delete')])
+    sweep = Sweep(auric, cases, '/scratch/sweep', retention=policy)
+
+A sweep applies the policy in the worker as soon as a case has run and
+`collect` has been called on it. Cases that failed are left as they are,
+and so are the cases of a sweep with reuse_workdirs=True, whose directories
+are emptied after every case anyway.
+Every application writes a manifest, .pyauric-retention.json, listing the
+files that are left with their action, size and checksum.
+
+AURICManager.load reads gzipped files and archives in place of the text
+files they were made from.
+"""
+import os
+import json
+import fnmatch
+from collections import OrderedDict
+
+import numpy as np
+
+from .archive import write_archive, suffix as _archive_suffix
+from .batch import file_digest
+from .pool import input_files
+from .scratch import copy_output
+
+manifest_name = '.pyauric-retention.json'
+# the input deck and the batch script AURICManager writes next to it
+protected = input_files + [ 'onerun.sh' ]
+actions = ( 'keep', 'compress', 'archive', 'delete' )
+
+class RetentionPolicy( object ):
+    """Rules for the output files of a run.
+
+    Parameters
+    ----------
+    rules: list of (pattern, action)
+        glob pattern of file names and what to do with the matching files:
+        'keep', 'compress' (gzip, adding .gz), 'archive' (convert to an
+        archive and delete the text file) or 'delete'. The first matching
+        rule applies.
+    default: string
+        action for files no rule matches
+    dtype: [ float64 | float32 ]
+        type of the values in archives
+
+    Input files, the batch script onerun.sh, hidden files and files that
+    are already compressed or archived are always kept.
+    """
+    def __init__( self, rules, default='keep', dtype=np.float64 ):
+        self.rules = [ ( pattern, action ) for pattern, action in rules ]
+        for _, action in self.rules + [ ( None, default ) ]:
+            if action not in actions:
+                raise ValueError( "action must be one of {}, not {!r}".format( actions, action ) )
+        self.default = default
+        self.dtype = dtype
+
+    def action( self, name ):
+        """What the policy does with a file called `name`."""
+        if name in protected or name.startswith( '.' ) or name.endswith( ( '.gz', _archive_suffix ) ):
+            return 'keep'
+        for pattern, action in self.rules:
+            if fnmatch.fnmatch( name, pattern ):
+                return action
+        return self.default
+
+    def apply( self, path, params=None ):
+        """Apply the policy to the files in directory `path` and write the manifest.
+
+        Parameters
+        ----------
+        path: string
+        params: dictionary, optional
+            param.inp values stored in archives. Default is read from
+            param.inp in `path`.
+
+        Returns
+        -------
+        manifest: OrderedDict
+            name of each file left -> dictionary of the action, the file it
+            was made from, its size and its checksum
+        """
+        manifest = OrderedDict()
+        for name in sorted( e.name for e in os.scandir( path ) if e.is_file() ):
+            action = self.action( name )
+            fpath = os.path.join( path, name )
+            if action == 'delete':
+                os.remove( fpath )
+                continue
+            if action == 'compress':
+                name = copy_output( fpath, fpath, compress=True )
+                os.remove( fpath )
+            elif action == 'archive':
+                try:
+                    archive = write_archive( fpath, params=params, dtype=self.dtype )
+                except Exception:
+                    # not an output file the reader understands
+                    action = 'keep'
+                else:
+                    os.remove( fpath )
+                    name = os.path.basename( archive )
+            if name.startswith( '.' ):
+                continue
+            out = os.path.join( path, name )
+            manifest[name] = OrderedDict( [ ( "action", action ),
+                                            ( "source", os.path.basename( fpath ) ),
+                                            ( "size", os.path.getsize( out ) ),
+                                            ( "sha1", file_digest( out ) ) ] )
+        tmp = os.path.join( path, manifest_name + ".tmp" )
+        with open( tmp, 'w' ) as f:
+            json.dump( manifest, f, indent=1 )
+        os.replace( tmp, os.path.join( path, manifest_name ) )
+        return manifest
+
+def read_manifest( path ):
+    """The manifest written by RetentionPolicy.apply in directory `path`, or None."""
+    try:
+        with open( os.path.join( path, manifest_name ) ) as f:
+            return json.load( f, object_pairs_hook=OrderedDict )
+    except FileNotFoundError:
+        return None
+
+def verify_manifest( path ):
+    """Names of the files in the manifest of `path` that are missing or changed."""
+    manifest = read_manifest( path ) or {}
+    return [ name for name, entry in manifest.items()
+             if file_digest( os.path.join( path, name ) ) != entry["sha1"] ]
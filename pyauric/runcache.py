@@ -0,0 +1,191 @@
+"""Persistent, content-addressed cache of AURIC runs.
+
+A run is identified by a hash of its normalized input deck (param.inp,
+view.inp, radtrans.opt, the Lyman options, dbpath.inp, band options,
+use_eflux), the command sequence from assemble_batch_run and the size and
+modification time of the AURIC binaries it uses. Runs with the same key
+produce the same outputs, so the outputs of a finished run are stored under
+its key and copied back instead of running AURIC again. Because the binaries
+and dbpath.inp are part of the key, upgrading AURIC or pointing it at another
+database invalidates old entries automatically.
+
+The cache is a plain directory, so it can live on a shared filesystem and be
+used by a whole team:
+
+    auric.run_cache = RunCache('/shared/auric-run-cache', maxsize=50*2**30)
+    auric.runbatch()    # runs AURIC, stores the outputs
+    auric.runbatch()    # copies the outputs back
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+from .batch import assemble_batch_run, BatchLedger
+
+_deck_files = ['param.inp', 'view.inp', 'radtrans.opt', 'ly_alpha.opt', 'ly_beta.opt', 'dbpath.inp']
+
+def _text( filename ):
+    """Contents of a file with whitespace normalized, or None if it is missing."""
+    try:
+        with open( filename ) as f:
+            return [ " ".join( line.split() ) for line in f if line.strip() ]
+    except FileNotFoundError:
+        return None
+
+def _binary_stamp( name, env ):
+    """Size and modification time of the executable for command `name`."""
+    exe = shutil.which( name, path=env.get( "PATH" ) )
+    if exe is None:
+        return None
+    st = os.stat( exe )
+    return [ st.st_mtime_ns, st.st_size ]
+
+def input_deck( auric ):
+    """Normalized description of everything that determines the outputs of a batch run."""
+    commands = [ c.cmd for c in assemble_batch_run( auric ) ]
+    h, za = auric.view
+    return { "params":sorted( auric.params.items() ),
+             "view":[ float(h), [ float(x) for x in za ] ],
+             "radtrans":sorted( (k, bool(v)) for k, v in ( auric.radtrans_options or {} ).items() ),
+             "ly_alpha":_text( auric.pathto( 'ly_alpha.opt' ) ),
+             "ly_beta":_text( auric.pathto( 'ly_beta.opt' ) ),
+             "dbpath":_text( auric.pathto( 'dbpath.inp' ) ),
+             "band_options":sorted( (k, bool(v)) for k, v in auric.band_options.items() ),
+             "use_eflux":bool( auric.use_eflux ),
+             "commands":commands,
+             "binaries":{ name:_binary_stamp( name, auric.env ) for name in commands } }
+
+class RunCache( object ):
+    """Directory of stored AURIC outputs, keyed by the hash of the input deck.
+
+    Parameters
+    ----------
+    path: string
+        cache directory. It is created if necessary.
+    maxsize: int
+        total size in bytes of the stored outputs. The least recently used
+        runs are evicted past this.
+    """
+    def __init__( self, path, maxsize=10*2**30 ):
+        self.path = os.path.abspath( path )
+        self.maxsize = maxsize
+        os.makedirs( os.path.join( self.path, "runs" ), exist_ok=True )
+
+    def key( self, auric ):
+        """Hash of the input deck of `auric`."""
+        deck = json.dumps( input_deck( auric ), sort_keys=True )
+        return hashlib.sha256( deck.encode() ).hexdigest()
+
+    def _entry( self, key ):
+        return os.path.join( self.path, "runs", key[:2], key )
+
+    def __contains__( self, key ):
+        return os.path.isfile( os.path.join( self._entry( key ), "manifest.json" ) )
+
+    def restore( self, key, path ):
+        """Copy the outputs stored under `key` to directory `path`.
+
+        The stages that made them are recorded in the batch ledger of
+        `path`, so an incremental run doesn't run them again.
+
+        Returns
+        -------
+        hit: bool
+            False if there is no run with this key in the cache
+        """
+        entry = self._entry( key )
+        try:
+            with open( os.path.join( entry, "manifest.json" ) ) as f:
+                manifest = json.load( f )
+            for fname in manifest["files"]:
+                shutil.copyfile( os.path.join( entry, fname ), os.path.join( path, fname ) )
+        except FileNotFoundError:
+            # missing, or evicted by another process while we were copying
+            return False
+        # the manifest's mtime is the last time the entry was used
+        os.utime( os.path.join( entry, "manifest.json" ) )
+        if "stages" in manifest:
+            BatchLedger( path ).record_outputs( manifest["stages"] )
+        return True
+
+    def store( self, key, path, files, stages=None ):
+        """Store `files` from directory `path` under `key`, then evict old runs.
+
+        `stages`, a dictionary of stage name -> its files, is kept with the
+        files to record them in the batch ledger when they are restored."""
+        entry = self._entry( key )
+        if key in self:
+            return
+        os.makedirs( os.path.dirname( entry ), exist_ok=True )
+        # build the entry next to its final place and rename it, so other
+        # processes never see a partial entry
+        tmp = tempfile.mkdtemp( prefix=".tmp-", dir=os.path.dirname( entry ) )
+        try:
+            sizes = {}
+            for fname in files:
+                shutil.copyfile( os.path.join( path, fname ), os.path.join( tmp, fname ) )
+                sizes[fname] = os.path.getsize( os.path.join( tmp, fname ) )
+            with open( os.path.join( tmp, "manifest.json" ), 'w' ) as f:
+                manifest = {"files":sizes, "created":time.time()}
+                if stages is not None:
+                    manifest["stages"] = { name:[ f for f in fnames if f in sizes ]
+                                           for name, fnames in stages.items() }
+                json.dump( manifest, f )
+            os.rename( tmp, entry )
+        except OSError:
+            # another process stored the same run first
+            shutil.rmtree( tmp, ignore_errors=True )
+        self.evict()
+
+    def entries( self ):
+        """(last used, size, key) of every stored run, least recently used first."""
+        out = []
+        runs = os.path.join( self.path, "runs" )
+        for prefix in os.listdir( runs ):
+            for key in os.listdir( os.path.join( runs, prefix ) ):
+                manifest = os.path.join( runs, prefix, key, "manifest.json" )
+                try:
+                    with open( manifest ) as f:
+                        size = sum( json.load( f )["files"].values() )
+                    out.append( ( os.stat( manifest ).st_mtime, size, key ) )
+                except (FileNotFoundError, NotADirectoryError, ValueError):
+                    continue
+        return sorted( out )
+
+    @property
+    def size( self ):
+        return sum( e[1] for e in self.entries() )
+
+    def evict( self ):
+        """Remove the least recently used runs until the cache fits in maxsize."""
+        entries = self.entries()
+        total = sum( e[1] for e in entries )
+        for _, size, key in entries:
+            if total <= self.maxsize:
+                break
+            self.invalidate( key )
+            total -= size
+
+    def invalidate( self, key=None ):
+        """Remove the run stored under `key`, or every run."""
+        if key is None:
+            shutil.rmtree( os.path.join( self.path, "runs" ), ignore_errors=True )
+            os.makedirs( os.path.join( self.path, "runs" ), exist_ok=True )
+        else:
+            shutil.rmtree( self._entry( key ), ignore_errors=True )
+
+def stage_outputs( auric ):
+    """Output files of each stage of the current batch, from the batch ledger."""
+    ledger = BatchLedger( auric.path )
+    out = {}
+    for cmd in assemble_batch_run( auric ):
+        files = ledger.stages.get( cmd.cmd, {} ).get( "outputs", {} )
+        out[cmd.cmd] = sorted( f for f in files if f not in _deck_files and os.path.isfile( auric.pathto( f ) ) )
+    return out
+
+def run_outputs( auric ):
+    """Output files of the stages of the current batch, from the batch ledger."""
+    return sorted( set( f for files in stage_outputs( auric ).values() for f in files ) )
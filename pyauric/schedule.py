@@ -0,0 +1,101 @@
+"""Predicted run times of sweep cases.
+
+The run time of a case depends on which stages its batch runs: daytime
+cases run the whole dayglow sequence where nighttime cases run niteglo,
+radtrans, the Lyman stages and the syn_* bands add their own cost, and most
+stages take longer with more altitudes. A CostModel predicts the run time
+of a case from the same settings assemble_batch_run looks at, so a sweep can
+start the longest cases first and not leave cores idle at the end:
+
+    model = CostModel()
+    model.update(tracer)        # learn stage times from earlier runs
+    sweep = Sweep(auric, cases, root, schedule=model)
+"""
+from collections import OrderedDict
+
+from .batch import batch_stages
+
+# rough run time of each stage in seconds with NALT = 100, used until the
+# stage has been timed
+_default_stage_cost = {'atmos': 0.5, 'ionos': 1.0, 'solar': 2.0, 'colden': 2.0,
+                       'pesource': 2.0, 'peflux': 8.0, 'eflux': 8.0, 'e_impact': 3.0,
+                       'daychem': 2.0, 'mergever': 0.2, 'niteglo': 2.0, 'losden': 2.0,
+                       'radtrans': 20.0, 'losint': 2.0, 'ly_alpha': 5.0, 'ly_beta': 5.0,
+                       'mergeint': 0.2, 'mergesyn': 0.2}
+_default_band_cost = 3.0
+_reference_nalt = 100
+
+# stages whose run time doesn't depend on the number of altitudes
+_fixed_stages = {'mergever', 'mergeint', 'mergesyn'}
+
+class CostModel( object ):
+    """Predicts the run time of a batch from per-stage costs.
+
+    Parameters
+    ----------
+    stage_cost: dictionary, optional
+        stage name -> seconds with NALT = 100, overriding the defaults
+
+    Attributes
+    ----------
+    stage_cost: dictionary
+        current estimate of each stage's cost
+    samples: dictionary
+        stage name -> number of timings the estimate is based on
+    """
+    def __init__( self, stage_cost=None ):
+        self.stage_cost = dict( _default_stage_cost )
+        self.stage_cost.update( stage_cost or {} )
+        self.samples = {}
+
+    @staticmethod
+    def _scale( stage, nalt ):
+        if stage in _fixed_stages or not nalt:
+            return 1.0
+        return float( nalt ) / _reference_nalt
+
+    def cost( self, stage, nalt=_reference_nalt ):
+        """Predicted seconds for one run of `stage`."""
+        default = _default_band_cost if stage.startswith( 'syn_' ) else 1.0
+        return self.stage_cost.get( stage, default ) * self._scale( stage, nalt )
+
+    def predict( self, auric, params=None ):
+        """Predicted seconds for the batch of `auric` with `params` changed."""
+        p = dict( auric.params, **( params or {} ) )
+        try:
+            stages = batch_stages( auric, params )
+        except Exception:
+            # no valid SZA, the case will fail straight away
+            return 0.0
+        return sum( self.cost( stage, p.get( 'NALT' ) ) for stage in stages )
+
+    def observe( self, stage, wall_time, nalt=None ):
+        """Refine the cost of `stage` with one timing of it."""
+        n = self.samples.get( stage, 0 )
+        seconds = wall_time / self._scale( stage, nalt )
+        if n == 0:
+            self.stage_cost[stage] = seconds
+        else:
+            self.stage_cost[stage] += ( seconds - self.stage_cost[stage] ) / ( n + 1 )
+        self.samples[stage] = n + 1
+
+    def update( self, tracer ):
+        """Refine the stage costs with the successful runs recorded by a Tracer.
+
+        A Sweep adds the timings of cases run in worker processes to the
+        tracer of its base manager, so that tracer can be used here.
+        """
+        for rec in tracer.records:
+            if rec["returncode"] == 0 and not rec["timed_out"]:
+                self.observe( rec["stage"], rec["wall_time"], rec.get( "nalt" ) )
+        return self
+
+    def order( self, auric, cases ):
+        """Indices of `cases` (param.inp dictionaries), most expensive first."""
+        costs = [ self.predict( auric, case ) for case in cases ]
+        return sorted( range( len(cases) ), key=lambda i: -costs[i] )
+
+    def summary( self ):
+        """Stage costs and sample counts, most expensive first."""
+        return OrderedDict( (stage, (cost, self.samples.get( stage, 0 )))
+                            for stage, cost in sorted( self.stage_cost.items(), key=lambda kv: -kv[1] ) )
@@ -0,0 +1,215 @@
+"""Run batches in memory and keep only the final outputs.
+
+Every stage of a batch writes files that later stages read back. On a
+network filesystem that I/O can take longer than the stages themselves.
+With a Scratch, runbatch clones the input deck into a directory on a
+memory-backed filesystem (/dev/shm by default), runs the batch there,
+copies the outputs that match `keep` back to the manager's directory and
+deletes the rest:
+
+    auric.scratch = Scratch(keep=['mergever.*', 'mergeint.*'], compress=True)
+    auric.runbatch()    # leaves mergever.ver.gz and mergeint.int.gz in auric.path
+
+Clones of the manager, and so the cases of a sweep, use the same Scratch.
+
+Of the ways to read outputs, only AURICManager.load reads the gzipped files
+that compress=True leaves; retrieve, index and pyauric.stack need the plain
+text files, so don't compress outputs that are read with them.
+
+A batch only runs in memory if the scratch filesystem and the memory
+available both have room for it and `reserve` bytes to spare. The room a
+batch needs is the most any earlier batch used, or `estimate` before the
+first one. Otherwise, or if the scratch filesystem fills up during the run
+and a stage fails, the batch runs in the manager's directory as usual.
+"""
+import os
+import gzip
+import shutil
+import fnmatch
+import tempfile
+
+from .batch import run_batch, run_batch_async
+from .pool import clone_settings, input_files
+
+_default_root = "/dev/shm" if os.path.isdir( "/dev/shm" ) else tempfile.gettempdir()
+
+def available_memory():
+    """Bytes of memory available to new processes, or None if unknown."""
+    try:
+        with open( "/proc/meminfo" ) as f:
+            for line in f:
+                if line.startswith( "MemAvailable:" ):
+                    return int( line.split()[1] ) * 1024
+    except OSError:
+        pass
+    return None
+
+def free_space( path ):
+    """Bytes free for unprivileged users on the filesystem of `path`."""
+    st = os.statvfs( path )
+    return st.f_bavail * st.f_frsize
+
+def _usage( path ):
+    return sum( e.stat().st_size for e in os.scandir( path ) if e.is_file( follow_symlinks=False ) )
+
+def copy_output( src, dst, compress=False ):
+    """Copy `src` to `dst`, or gzip it to `dst`.gz, with a write-and-rename.
+
+    The copy keeps the modification time of `src`, so `src` and `dst` can
+    be the same file when compressing. Returns the name written.
+    """
+    if compress:
+        dst += ".gz"
+    tmp = os.path.join( os.path.dirname( dst ), ".{}.tmp".format( os.path.basename( dst ) ) )
+    try:
+        if compress:
+            with open( src, 'rb' ) as s, gzip.open( tmp, 'wb' ) as d:
+                shutil.copyfileobj( s, d, 2**20 )
+            shutil.copystat( src, tmp )
+        else:
+            shutil.copy2( src, tmp )
+        os.replace( tmp, dst )
+    finally:
+        if os.path.exists( tmp ):
+            os.remove( tmp )
+    return os.path.basename( dst )
+
+class Scratch( object ):
+    """Where and how to run batches in memory.
+
+    Parameters
+    ----------
+    root: string
+        directory on a memory-backed filesystem for the scratch directories
+    keep: list of strings
+        glob patterns of the output files to copy back. Default is the
+        merged outputs.
+    compress: bool
+        gzip the files that are copied back, adding .gz to their names.
+        Only AURICManager.load can read them.
+    estimate: int
+        bytes a batch is assumed to need until one has been run
+    reserve: int
+        bytes of memory and scratch space to leave free
+
+    Attributes
+    ----------
+    peak: int
+        most bytes a batch has left in its scratch directory
+    last: [ 'memory' | 'disk' | None ]
+        where the last batch ran
+    persisted: list of strings
+        files the last batch run in memory copied back
+    """
+    def __init__( self, root=_default_root, keep=( 'merge*', ), compress=False, estimate=256*2**20,
+                  reserve=512*2**20 ):
+        self.root = root
+        self.keep = list( keep )
+        self.compress = compress
+        self.estimate = estimate
+        self.reserve = reserve
+        self.peak = 0
+        self.last = None
+        self.persisted = []
+
+    def fits( self ):
+        """Whether there is room to run a batch in memory now."""
+        need = max( self.peak, self.estimate ) + self.reserve
+        memory = available_memory()
+        try:
+            os.makedirs( self.root, exist_ok=True )
+            free = free_space( self.root )
+        except OSError:
+            return False
+        return free >= need and ( memory is None or memory >= need )
+
+    def _full( self ):
+        try:
+            return free_space( self.root ) < self.reserve
+        except OSError:
+            return True
+
+    def kept( self, path ):
+        """Names of the files in `path` that are copied back."""
+        return sorted( e.name for e in os.scandir( path )
+                       if e.is_file() and e.name not in input_files
+                       and any( fnmatch.fnmatch( e.name, p ) for p in self.keep ) )
+
+    def persist( self, src, dst ):
+        """Copy the files to keep from directory `src` to `dst`. Returns the names written."""
+        written = []
+        for name in self.kept( src ):
+            written.append( copy_output( os.path.join( src, name ), os.path.join( dst, name ), self.compress ) )
+            # don't leave the other form of the file behind, out of date
+            other = os.path.join( dst, name if self.compress else name + ".gz" )
+            if os.path.exists( other ):
+                os.remove( other )
+        return written
+
+    def _enter( self, auric ):
+        path = tempfile.mkdtemp( prefix="pyauric-", dir=self.root )
+        return auric.clone( path, **clone_settings( auric ) )
+
+    def _leave( self, auric, work, codes, finished ):
+        """Hand the finished scratch run to `finished`, then copy back the files to keep.
+
+        Returns False if the run failed because the scratch filesystem was full."""
+        self.peak = max( self.peak, _usage( work.path ) )
+        if any( c not in (0, None) for c in codes ) and self._full():
+            return False
+        if finished is not None:
+            finished( work, codes )
+        self.persisted = self.persist( work.path, auric.path )
+        self.last = 'memory'
+        return True
+
+    def _in_place( self, auric, codes, finished ):
+        if finished is not None:
+            finished( auric, codes )
+        self.last = 'disk'
+        return codes
+
+    def run( self, auric, concurrency=1, timeout=None, finished=None, incremental=False ):
+        """Run the batch of `auric`, in memory if there is room.
+
+        Parameters
+        ----------
+        auric: AURICManager
+        concurrency, timeout:
+            see run_batch
+        finished: callable, optional
+            function of (manager, codes) called before the scratch
+            directory is removed, with the manager of the directory the
+            batch ran in
+        incremental: bool
+            passed to run_batch if the batch runs in place. A batch in
+            memory always runs every stage.
+
+        Returns
+        -------
+        codes: list
+            return code of each command
+        """
+        if self.fits():
+            work = self._enter( auric )
+            try:
+                codes = list( run_batch( work, False, concurrency, timeout ).values() )
+                if self._leave( auric, work, codes, finished ):
+                    return codes
+            finally:
+                shutil.rmtree( work.path, ignore_errors=True )
+        codes = list( run_batch( auric, incremental, concurrency, timeout ).values() )
+        return self._in_place( auric, codes, finished )
+
+    async def run_async( self, auric, concurrency=1, timeout=None, finished=None, incremental=False ):
+        """asyncio version of run."""
+        if self.fits():
+            work = self._enter( auric )
+            try:
+                codes = list( ( await run_batch_async( work, False, concurrency, timeout ) ).values() )
+                if self._leave( auric, work, codes, finished ):
+                    return codes
+            finally:
+                shutil.rmtree( work.path, ignore_errors=True )
+        codes = list( ( await run_batch_async( auric, incremental, concurrency, timeout ) ).values() )
+        return self._in_place( auric, codes, finished )
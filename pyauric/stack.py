@@ -0,0 +1,172 @@
+"""Outputs of a whole sweep in one array.
+
+stack_sweep reads the same output file from every case of a sweep into a
+single array with one dimension per swept parameter, then altitude or
+zenith angle, then feature:
+
+    arr = sweep.stack('mergeint.int', ['1304 A (initial)', '1356 A (initial)'])
+    arr.dims                # ('GLAT', 'UTSEC', 'ZA', 'feature')
+    arr.data[2, 0, :, 1]    # 1356 intensities of the third latitude at the first time
+
+Pass `filename` to build the array in a .npy file instead of in memory. The
+coordinates are written next to it, and open_stack memory-maps it again
+later, so very large sweeps never have to fit in RAM.
+"""
+import os
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from .manager import AURICFileIndex
+
+class SweepArray( object ):
+    """An array with named dimensions and coordinates.
+
+    Attributes
+    ----------
+    data: ndarray or memmap
+    dims: tuple of strings
+        name of each dimension of `data`
+    coords: OrderedDict
+        dimension name -> coordinate values. Sweeps that are not a grid
+        have a 'case' dimension, and the value of each parameter in each
+        case is also stored here under the parameter's name.
+    filename: string or None
+        .npy file holding `data`, if it is memory-mapped
+    """
+    def __init__( self, data, dims, coords, filename=None ):
+        self.data = data
+        self.dims = tuple( dims )
+        self.coords = coords
+        self.filename = filename
+
+    @property
+    def shape( self ):
+        return self.data.shape
+
+    def axis( self, dim ):
+        """Position of dimension `dim`."""
+        return self.dims.index( dim )
+
+    def feature( self, name ):
+        """The values of feature `name`, with the feature dimension removed."""
+        return self.data[..., self.coords["feature"].index( name )]
+
+    def _metadata( self ):
+        coords = OrderedDict( (k, np.asarray(v).tolist() if k != "feature" else list(v))
+                              for k, v in self.coords.items() )
+        return { "dims":list( self.dims ), "coords":coords }
+
+    def save( self, filename ):
+        """Write the array to `filename` (.npy) and its coordinates to `filename`.json."""
+        np.save( filename, self.data )
+        _write_metadata( filename, self._metadata() )
+
+def read_output( filename, features=None ):
+    """One output file as a SweepArray with dimensions (ALT or ZA, 'feature')."""
+    index = AURICFileIndex( filename )
+    features = index.features if features is None else list( features )
+    data = index.read( features )
+    axis = "ZA" if index.sections["ZA"] else "ALT"
+    values = np.empty( ( len( data[axis] ), len(features) ) )
+    for j, feature in enumerate( features ):
+        values[:, j] = data["profiles"][feature]
+    coords = OrderedDict( [ (axis, np.asarray( data[axis] )), ("feature", features) ] )
+    return SweepArray( values, ( axis, "feature" ), coords )
+
+def _write_metadata( filename, metadata ):
+    with open( filename + ".json", 'w' ) as f:
+        json.dump( metadata, f, indent=1 )
+
+def open_stack( filename, mmap_mode='r' ):
+    """Open an array written by stack_sweep or SweepArray.save.
+
+    Parameters
+    ----------
+    filename: string
+        the .npy file
+    mmap_mode: [ 'r' | 'r+' | 'c' | None ]
+        passed to numpy.load. None reads the whole array into memory.
+    """
+    with open( filename + ".json" ) as f:
+        metadata = json.load( f, object_pairs_hook=OrderedDict )
+    data = np.load( filename, mmap_mode=mmap_mode )
+    coords = OrderedDict( (k, v if k == "feature" else np.asarray(v))
+                          for k, v in metadata["coords"].items() )
+    return SweepArray( data, metadata["dims"], coords, filename if mmap_mode else None )
+
+def stack_sweep( sweep, fname, features=None, filename=None, results=None, dtype=float ):
+    """Read output file `fname` of every case of `sweep` into one SweepArray.
+
+    Parameters
+    ----------
+    sweep: Sweep
+    fname: string
+        AURIC output file, e.g. 'mergever.ver' or 'mergeint.int'
+    features: list of strings, optional
+        profiles to read. Default is every profile in the first case.
+    filename: string, optional
+        build the array in this .npy file, memory-mapped
+    results: list of CaseResult, optional
+        from Sweep.run. Only cases that are done (or were skipped as done
+        when the sweep resumed) are stacked; the others are left out.
+    dtype: numpy dtype
+
+    Returns
+    -------
+    arr: SweepArray
+        missing cases and features are NaN
+    """
+    paths = [ sweep.path(i) for i in range( len(sweep) ) ]
+    ok = [ True ] * len(paths)
+    if results is not None:
+        for r in results:
+            paths[r.index] = r.path
+            ok[r.index] = r.status in ( "done", "skipped" )
+    files = [ os.path.join( p, fname ) if good else None for p, good in zip( paths, ok ) ]
+    first = next( ( f for f in files if f is not None and os.path.isfile( f ) ), None )
+    if first is None:
+        raise FileNotFoundError( "no case of the sweep has {}".format( fname ) )
+    index = AURICFileIndex( first )
+    if features is None:
+        features = index.features
+    axis = "ZA" if index.sections["ZA"] else "ALT"
+    values = np.asarray( index.read( [] )[axis] )
+
+    coords = OrderedDict()
+    if sweep.axes is not None:
+        for k, v in sweep.axes.items():
+            coords[k] = np.asarray( v )
+        grid = tuple( len(v) for v in sweep.axes.values() )
+    else:
+        coords["case"] = np.arange( len(sweep) )
+        for k in OrderedDict.fromkeys( k for case in sweep.cases for k in case ):
+            coords[k] = np.asarray( [ case.get( k, np.nan ) for case in sweep.cases ] )
+        grid = ( len(sweep), )
+    dims = list( sweep.axes or ["case"] ) + [ axis, "feature" ]
+    coords[axis] = values
+    coords["feature"] = list( features )
+    shape = grid + ( len(values), len(features) )
+
+    if filename is None:
+        data = np.full( shape, np.nan, dtype=dtype )
+    else:
+        data = np.lib.format.open_memmap( filename, mode='w+', dtype=dtype, shape=shape )
+        data[...] = np.nan
+    for i, f in enumerate( files ):
+        if f is None or not os.path.isfile( f ):
+            continue
+        case = AURICFileIndex( f )
+        out = data[ np.unravel_index( i, grid ) ]
+        read = case.read( [ x for x in features if x in case.profiles ] )
+        if len( read[axis] ) != len(values):
+            raise ValueError( "{} has {} {} values, expected {}".format( f, len( read[axis] ), axis, len(values) ) )
+        for j, feature in enumerate( features ):
+            if feature in read["profiles"]:
+                out[:, j] = read["profiles"][feature]
+    arr = SweepArray( data, dims, coords, filename )
+    if filename is not None:
+        data.flush()
+        _write_metadata( filename, arr._metadata() )
+    return arr
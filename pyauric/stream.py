@@ -0,0 +1,158 @@
+"""Stream the profiles of many AURIC output files.
+
+iter_profiles walks a directory tree or the cases of a sweep and yields one
+profile at a time. Only the files being read ahead are held in memory, so a
+scan over thousands of runs uses as much memory as a scan over a few:
+
+    for rec in iter_profiles('/scratch/runs', features=['1356 A (initial)']):
+        peak[rec.run] = rec.values.max()
+
+Files are read on a background thread, `prefetch` files ahead of the one
+being consumed. Output files with a current archive (see pyauric.archive)
+are memory-mapped instead of parsed.
+"""
+import os
+import queue
+import fnmatch
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from .archive import archive_name, read_archive
+from .manager import AURICFileIndex
+
+ProfileRecord = namedtuple("ProfileRecord", ["run", "feature", "index", "values", "file"])
+ProfileRecord.__doc__ = """One profile of an AURIC output file.
+
+run: run identifier (directory relative to the root, or sweep case index)
+feature: profile name
+index: altitudes or zenith angles
+values: the profile
+file: path to the output file
+"""
+
+_default_patterns = ( '*.ver', '*.int' )
+
+def find_outputs( root, patterns=_default_patterns ):
+    """Yield (run, filename) for the files in the tree under `root` that match `patterns`.
+
+    The run is the directory of the file relative to `root`. Directories
+    and files are visited in sorted order.
+    """
+    for dirpath, dirnames, filenames in os.walk( root ):
+        dirnames.sort()
+        run = os.path.relpath( dirpath, root )
+        for fname in sorted( filenames ):
+            if any( fnmatch.fnmatch( fname, p ) for p in patterns ):
+                yield run, os.path.join( dirpath, fname )
+
+def sweep_outputs( sweep, patterns=_default_patterns ):
+    """Yield (case index, filename) for the output files of every case of `sweep`."""
+    for i in range( len(sweep) ):
+        path = sweep.path(i)
+        if not os.path.isdir( path ):
+            continue
+        for fname in sorted( os.listdir( path ) ):
+            if any( fnmatch.fnmatch( fname, p ) for p in patterns ):
+                yield i, os.path.join( path, fname )
+
+def _wanted( features, names ):
+    if features is None:
+        return list( names )
+    if callable( features ):
+        return [ n for n in names if features( n ) ]
+    return [ n for n in names if n in features ]
+
+def read_profiles( run, filename, features=None ):
+    """The ProfileRecords of one output file.
+
+    Parameters
+    ----------
+    run: anything
+        run identifier to put in the records
+    filename: string
+    features: list of strings or callable, optional
+        names of the profiles to read, or a function of the name that is
+        True for the profiles to read. Default is all of them.
+    """
+    apath = archive_name( filename )
+    if os.path.isfile( apath ):
+        arc = read_archive( apath )
+        if arc.is_current( filename ):
+            return [ ProfileRecord( run, name, arc.index, arc.profile( name ), filename )
+                     for name in _wanted( features, arc.features ) ]
+    index = AURICFileIndex( filename )
+    data = index.read( _wanted( features, index.features ) )
+    axis = np.asarray( data["ZA"] if index.sections["ZA"] else data["ALT"] )
+    return [ ProfileRecord( run, name, axis, np.asarray( values ), filename )
+             for name, values in data["profiles"].items() ]
+
+def iter_profiles( source, features=None, patterns=_default_patterns, prefetch=2 ):
+    """Yield a ProfileRecord for every profile of many output files.
+
+    Parameters
+    ----------
+    source: string, Sweep or iterable of (run, filename)
+        a directory tree to walk (see find_outputs), a sweep (see
+        sweep_outputs) or the files to read
+    features: list of strings or callable, optional
+        profiles to yield (see read_profiles). Default is all of them.
+    patterns: tuple of strings
+        glob patterns of the output file names, for directories and sweeps
+    prefetch: int
+        number of files read ahead on a background thread. 0 reads each
+        file when it is needed.
+
+    Yields
+    ------
+    record: ProfileRecord
+    """
+    if isinstance( source, str ):
+        files = find_outputs( source, patterns )
+    elif hasattr( source, "cases" ):
+        files = sweep_outputs( source, patterns )
+    else:
+        files = source
+    if prefetch <= 0:
+        for run, filename in files:
+            yield from read_profiles( run, filename, features )
+        return
+
+    ahead = queue.Queue( maxsize=prefetch )
+    stop = threading.Event()
+    done = object()
+
+    def put( item ):
+        while not stop.is_set():
+            try:
+                ahead.put( item, timeout=0.1 )
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for run, filename in files:
+                if not put( read_profiles( run, filename, features ) ):
+                    return
+        except BaseException as err:
+            put( err )
+        else:
+            put( done )
+
+    thread = threading.Thread( target=reader, name="pyauric-prefetch", daemon=True )
+    thread.start()
+    try:
+        while True:
+            item = ahead.get()
+            if item is done:
+                break
+            if isinstance( item, BaseException ):
+                raise item
+            yield from item
+    finally:
+        # stop the reader if the consumer quits early
+        stop.set()
+        thread.join()
@@ -0,0 +1,438 @@
+"""Parameter sweeps.
+
+AURIC commands have side effects on their working directory, so every case
+of a sweep runs in its own clone of a base AURICManager. The cases run in a
+pool of worker processes and the results come back in the order of the cases.
+With reuse_workdirs=True each worker process gets one directory from a
+WorkdirPool instead, which is reset after every case and removed at the end.
+
+Finished cases are recorded in a journal, so a sweep that was interrupted
+can be continued with run(resume=True).
+
+Example
+-------
+from pyauric.sweep import Sweep
+sweep = Sweep(auric, {'GLAT': [0, 30, 60], 'UTSEC': [0, 43200]}, '/scratch/glat-ut')
+results = sweep.run()
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import itertools
+import traceback
+import multiprocessing
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .batch import file_digest
+from .pool import WorkdirPool, clone_settings, input_files
+from .stack import stack_sweep
+from .geometry import plan_sweep, regime
+
+_journal_name = '.pyauric-sweep.jsonl'
+
+CaseResult = namedtuple("CaseResult", ["index", "params", "path", "codes", "value", "error", "status"],
+                        defaults=[None])
+CaseResult.__doc__ = """Outcome of one case of a sweep.
+
+index: position of the case in the sweep
+params: param.inp values set for the case
+path: working directory of the case
+codes: return codes of the batch commands
+value: what `collect` returned for the case, or None
+error: description of the exception raised by the case, or None
+status: 'done', 'failed' (and run again), 'quarantined' (failed too many
+    times), 'skipped' (done in an earlier run that was resumed) or
+    'invalid' (not run because AURIC can't use its SZA)
+"""
+
+def case_key( params, geoparm=None ):
+    """Hash that identifies a case by its param.inp values."""
+    text = json.dumps( [ sorted( (k, float(v)) for k, v in params.items() ), geoparm ] )
+    return hashlib.sha1( text.encode() ).hexdigest()
+
+class SweepJournal( object ):
+    """Append-only record of the runs of the cases of a sweep.
+
+    One JSON object per line, written when a case finishes: the case
+    index, its key (see case_key), working directory, status ('done',
+    'failed' or 'invalid'), return codes, error, start time, wall time and the size and
+    digest of each output file.
+
+    Parameters
+    ----------
+    filename: string
+    resume: bool
+        keep the entries already in the file. Otherwise it is emptied.
+    """
+    def __init__( self, filename, resume=True ):
+        self.filename = filename
+        self.entries = []
+        if not resume:
+            open( filename, 'w' ).close()
+            return
+        try:
+            with open( filename ) as f:
+                for line in f:
+                    try:
+                        self.entries.append( json.loads( line ) )
+                    except ValueError:
+                        # a line cut short when the sweep was killed
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def append( self, entry ):
+        with open( self.filename, 'a' ) as f:
+            f.write( json.dumps( entry ) + "\n" )
+            f.flush()
+            os.fsync( f.fileno() )
+        self.entries.append( entry )
+
+    def last( self, key ):
+        """The latest entry of the case with `key`, or None."""
+        for entry in reversed( self.entries ):
+            if entry["key"] == key:
+                return entry
+        return None
+
+    def failures( self, key ):
+        """Number of failed runs of the case with `key`."""
+        return sum( 1 for e in self.entries if e["key"] == key and e["status"] == "failed" )
+
+def param_grid( axes ):
+    """Every combination of the values in `axes`, as a list of param.inp dictionaries.
+
+    Parameters
+    ----------
+    axes: mapping
+        parameter name -> sequence of values. The last axis varies fastest.
+
+    Returns
+    -------
+    cases: list of dictionaries
+    """
+    names = list( axes )
+    return [ OrderedDict( zip( names, values ) )
+             for values in itertools.product( *( axes[k] for k in names ) ) ]
+
+class Sweep( object ):
+    """A set of AURIC runs that differ only in param.inp.
+
+    Parameters
+    ----------
+    auric: AURICManager
+        base manager. Its input files are copied to every case.
+    cases: list of dictionaries or mapping of axes
+        param.inp values for each case, or parameter name -> values to
+        sweep over every combination of them (see param_grid).
+    root: string
+        directory in which the case directories are created
+    processes: int, optional
+        number of worker processes. Default is the number of cores.
+    geoparm: [None | bool]
+        if not None, run geoparm after setting the parameters of each case,
+        passing this as `compute_F107_and_Ap`.
+    reuse_workdirs: bool
+        run the cases in a pool of one directory per process instead of a
+        directory per case. The outputs of a case are removed when the next
+        case starts, so use `collect` to keep what you need.
+    retries: int
+        number of times a failing case is run again before it is
+        quarantined, in this run and in resumed runs
+    schedule: CostModel, optional
+        start the cases with the longest predicted run time first, so the
+        last cases to finish are short ones. Default is to start the cases
+        that run the same commands together, in the order of the cases.
+    reject_invalid: bool
+        don't run cases whose SZA AURIC can't use (see plan). They get the
+        status 'invalid'. So do cases that geoparm puts outside the
+        ranges AURIC accepts, which are not run again.
+    retention: RetentionPolicy, optional
+        applied to the directory of each case that succeeds, in the worker,
+        after `collect`. Not used with reuse_workdirs=True, where the
+        directory is reset after `collect` anyway.
+
+    Attributes
+    ----------
+    axes: OrderedDict or None
+        the swept axes, if the cases are a grid
+    cases: list of dictionaries
+    """
+    def __init__( self, auric, cases, root, processes=None, geoparm=None, reuse_workdirs=False, retries=2, schedule=None,
+                  reject_invalid=True, retention=None ):
+        self.auric = auric
+        if isinstance( cases, Mapping ):
+            self.axes = OrderedDict( (k, list(v)) for k, v in cases.items() )
+            self.cases = param_grid( self.axes )
+        else:
+            self.axes = None
+            self.cases = [ OrderedDict( case ) for case in cases ]
+        self.root = os.path.abspath( root )
+        self.processes = processes or os.cpu_count() or 1
+        self.geoparm = geoparm
+        self.reuse_workdirs = reuse_workdirs
+        self.retries = retries
+        self.schedule = schedule
+        self.reject_invalid = reject_invalid
+        self.retention = retention
+
+    def __len__( self ):
+        return len( self.cases )
+
+    def path( self, i ):
+        """Working directory of case `i`."""
+        width = len( str( max( len(self.cases) - 1, 0 ) ) )
+        return os.path.join( self.root, "case-{:0{}d}".format( i, width ) )
+
+    def run( self, collect=None, resume=False ):
+        """Run every case.
+
+        Each finished case is recorded in a journal in `root` (see
+        SweepJournal). A case that fails is run again until it has run
+        `retries` + 1 times, then it is quarantined.
+
+        Parameters
+        ----------
+        collect: callable, optional
+            function of the case's AURICManager, called in the worker after
+            the run. Its return value is stored in CaseResult.value. It
+            must be picklable (e.g. a module-level function) if processes > 1.
+        resume: bool
+            continue the sweep recorded in the journal: cases that finished
+            and whose outputs are unchanged are skipped (`collect` is called
+            on them in this process, unless the sweep reuses workdirs), and
+            cases that already failed too often stay quarantined, and
+            cases geoparm found invalid stay invalid. Otherwise
+            the journal is started again, and the outputs left in the case
+            directories by earlier runs are removed before each case runs.
+
+        Returns
+        -------
+        results: list of CaseResult, in the same order as the cases
+        """
+        os.makedirs( self.root, exist_ok=True )
+        journal = SweepJournal( os.path.join( self.root, _journal_name ), resume )
+        plan = self.plan()
+        results = [ None ] * len( self.cases )
+        pending = []
+        for i, case in enumerate( self.cases ):
+            if self.reject_invalid and not plan.valid[i]:
+                results[i] = CaseResult( i, case, None, [], None, _sza_error( plan.sza[i] ), "invalid" )
+                continue
+            results[i] = self._resume( journal, i, case, collect )
+            if results[i] is None:
+                pending.append( i )
+        while pending:
+            retry = []
+            for result, record in self._execute( pending, collect, plan, not resume ):
+                self._merge_trace( record )
+                key = case_key( result.params, self.geoparm )
+                # geoparm found an SZA AURIC can't use: running it again would only run geoparm again
+                invalid = result.status == "invalid"
+                failed = _failed( result ) and not invalid
+                status = "invalid" if invalid else "failed" if failed else "done"
+                journal.append( OrderedDict( [ ("case", result.index),
+                                               ("key", key),
+                                               ("path", result.path),
+                                               ("status", status),
+                                               ("codes", result.codes),
+                                               ("error", result.error) ] + list( record.items() ) ) )
+                if not failed:
+                    result = result._replace( status=status )
+                elif journal.failures( key ) <= self.retries:
+                    retry.append( result.index )
+                    result = result._replace( status="failed" )
+                else:
+                    result = result._replace( status="quarantined" )
+                results[result.index] = result
+            pending = sorted( retry )
+        return results
+
+    def _merge_trace( self, record ):
+        """Add the stage timings of a case run in a worker process to the tracer of the base manager.
+
+        A worker times the stages with its own copy of the tracer. Cases run
+        in this process use the base manager's tracer itself."""
+        pid, trace = record.pop( "trace" )
+        if pid != os.getpid() and self.auric.tracer is not None:
+            self.auric.tracer.extend( trace )
+
+    def _resume( self, journal, index, params, collect ):
+        """CaseResult of a case the journal says needs no run, or None."""
+        key = case_key( params, self.geoparm )
+        entry = journal.last( key )
+        if entry is None:
+            return None
+        if entry["status"] == "done":
+            if not self.reuse_workdirs and not _verify( entry["path"], entry["outputs"] ):
+                return None
+            value = None
+            if collect is not None and not self.reuse_workdirs:
+                value = collect( self.auric.__class__( entry["path"], **clone_settings( self.auric ) ) )
+            return CaseResult( index, params, entry["path"], entry["codes"], value, None, "skipped" )
+        if entry["status"] == "invalid":
+            return CaseResult( index, params, entry["path"], [], None, entry["error"], "invalid" )
+        if journal.failures( key ) > self.retries:
+            return CaseResult( index, params, entry["path"], entry["codes"], None, entry["error"], "quarantined" )
+        return None
+
+    def plan( self, margin=1.0 ):
+        """SZA, regime and command sequence of every case, worked out without running anything.
+
+        If geoparm computes the SZA of the cases it is estimated from their
+        date, time and position, and only cases more than `margin` degrees
+        outside the ranges AURIC accepts are invalid. See plan_sweep.
+        """
+        return plan_sweep( self.auric, self.cases, self.geoparm is not None, margin )
+
+    def _execute( self, indices, collect, plan, clear=True ):
+        """Run the cases in `indices`. Yields (CaseResult, journal record) as they finish.
+
+        With `clear`, the outputs of earlier runs are removed from the case
+        directories first."""
+        processes = max( min( self.processes, len(indices) ), 1 )
+        if self.schedule is not None:
+            planned = [ plan.params( i, self.cases[i] ) for i in indices ]
+            indices = [ indices[k] for k in self.schedule.order( self.auric, planned ) ]
+        else:
+            group = { i:k for k, members in enumerate( plan.groups.values() ) for i in members }
+            indices = sorted( indices, key=lambda i: ( group.get( i, len(group) ), i ) )
+        if not self.reuse_workdirs:
+            jobs = [ ( self.auric, self.path(i), i, self.cases[i], self.geoparm, collect, self.retention, clear )
+                     for i in indices ]
+            if processes == 1:
+                yield from ( _run_case( *job ) for job in jobs )
+                return
+            with ProcessPoolExecutor( max_workers=processes ) as workers:
+                yield from _as_completed( workers, _run_case, jobs )
+            return
+        with WorkdirPool( self.auric, os.path.join( self.root, "pool" ), processes ) as pool:
+            # the slot is reset after collect, so a retention policy has nothing to keep
+            jobs = [ ( pool, i, self.cases[i], self.geoparm, collect ) for i in indices ]
+            if processes == 1:
+                yield from ( _run_in_slot( pool, pool.slots[0], *job[1:] ) for job in jobs )
+                return
+            slots = multiprocessing.Queue()
+            for slot in pool.slots:
+                slots.put( slot )
+            with ProcessPoolExecutor( max_workers=processes, initializer=_take_slot, initargs=(slots,) ) as workers:
+                yield from _as_completed( workers, _run_in_worker_slot, jobs )
+
+    def stack( self, fname, features=None, filename=None, results=None ):
+        """Read output file `fname` of every case into one array. See stack_sweep."""
+        return stack_sweep( self, fname, features, filename, results )
+
+_worker_slot = None     # pool directory owned by this worker process
+
+def _take_slot( slots ):
+    global _worker_slot
+    _worker_slot = slots.get()
+
+def _run_in_worker_slot( pool, index, params, geoparm, collect ):
+    return _run_in_slot( pool, _worker_slot, index, params, geoparm, collect )
+
+def _run_in_slot( pool, slot, index, params, geoparm, collect ):
+    """Run a case in pool directory `slot`, then reset it."""
+    try:
+        return _run( pool.manager( slot ), index, params, geoparm, collect )
+    finally:
+        pool.reset( slot )
+
+def _run_case( auric, path, index, params, geoparm, collect, retention=None, clear=True ):
+    """Clone `auric` into `path`, set `params` and run the batch.
+
+    With `clear`, whatever an earlier run left in `path` is removed first,
+    so a stage that fails can't leave that run's outputs to be read."""
+    start = time.time()
+    try:
+        if clear:
+            _clear_outputs( path )
+        case = auric.clone( path, **clone_settings( auric ) )
+    except Exception:
+        return CaseResult( index, params, path, [], None, traceback.format_exc() ), _record( start, {} )
+    return _run( case, index, params, geoparm, collect, retention )
+
+def _run( case, index, params, geoparm, collect, retention=None ):
+    """Run a case in `case`. Returns the CaseResult and a record for the journal."""
+    start = time.time()
+    tracer = case.tracer
+    first = len( tracer.records ) if tracer is not None else 0
+    codes, value, error = [], None, None
+    try:
+        case.set_params( params )
+        if geoparm is not None:
+            case.run_geoparm( geoparm )
+            # the planned SZA is an estimate, geoparm may still put the case in twilight
+            sza = case.params['SZA']
+            if regime( sza ) == 'twilight':
+                result = CaseResult( index, params, case.path, [], None, _sza_error( sza ), "invalid" )
+                return result, _record( start, {}, tracer, first )
+        codes = case.runbatch()
+        # the outputs of a failed run are incomplete, and may be left from an earlier run
+        ok = all( c in (0, None) for c in codes )
+        if collect is not None and ok:
+            value = collect( case )
+        if retention is not None and ok:
+            retention.apply( case.path, case.params )
+    except Exception:
+        error = traceback.format_exc()
+    result = CaseResult( index, params, case.path, codes, value, error )
+    return result, _record( start, {} if _failed( result ) else _checksums( case.path ), tracer, first )
+
+def _record( start, outputs, tracer=None, first=0 ):
+    """Journal record of a case that started at `start`.
+
+    It also carries the records `tracer` took from `first` on, with the id
+    of this process (see Sweep._merge_trace)."""
+    trace = tracer.records[first:] if tracer is not None else []
+    return { "start":start, "wall_time":time.time() - start, "outputs":outputs, "trace":( os.getpid(), trace ) }
+
+def _as_completed( workers, fn, jobs ):
+    futures = [ workers.submit( fn, *job ) for job in jobs ]
+    for future in as_completed( futures ):
+        yield future.result()
+
+def _sza_error( sza ):
+    return "SZA is {:.2f}. AURIC needs 0<SZA<90 or 110<SZA<180.".format( sza )
+
+def _failed( result ):
+    return result.error is not None or any( c not in (0, None) for c in result.codes )
+
+def _clear_outputs( path ):
+    """Remove everything but the input files from case directory `path`, if it exists."""
+    try:
+        entries = list( os.scandir( path ) )
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.name in input_files:
+            continue
+        if entry.is_dir( follow_symlinks=False ):
+            shutil.rmtree( entry.path )
+        else:
+            os.remove( entry.path )
+
+def _checksums( path ):
+    """Size and digest of the output files in `path`."""
+    out = {}
+    for entry in os.scandir( path ):
+        if entry.is_file() and entry.name not in input_files and not entry.name.startswith( '.' ):
+            out[entry.name] = [ entry.stat().st_size, file_digest( entry.path ) ]
+    return out
+
+def _verify( path, outputs ):
+    """Whether the files in `path` match `outputs` from _checksums."""
+    for fname, (size, digest) in outputs.items():
+        fpath = os.path.join( path, fname )
+        try:
+            if os.path.getsize( fpath ) != size:
+                return False
+        except FileNotFoundError:
+            return False
+        if file_digest( fpath ) != digest:
+            return False
+    return True
@@ -0,0 +1,93 @@
+"""Synthetic AURIC files.
+
+Writes input and output files in the formats AURIC uses, with made-up
+numbers, so the parsers and the runner can be exercised and benchmarked
+without an AURIC installation.
+
+Example
+-------
+from pyauric.synthetic import make_run_dir
+make_run_dir('/tmp/fake-run', nalt=500, nza=37, nfeatures=100)
+"""
+import os
+import numpy as np
+
+from . import _param_format
+from .manager import write_view, write_radtrans_options, parse_params, modify_params, write_params
+
+_named_features = ['1304 A (initial)', '1356 A (initial)', '6300 A (initial)',
+                   'O+e 832 A (initial)', 'O+e 833 A (initial)', 'O+e 834 A (initial)',
+                   'O+hv 832 A (initial)', 'O+hv 833 A (initial)', 'O+hv 834 A (initial)',
+                   'N2 LBH (total)', 'N2 VK (total)', '[O I] 5577 A']
+
+def feature_names( n ):
+    """`n` distinct feature headings, starting with some real AURIC ones."""
+    names = _named_features[:n]
+    wavelength = 1000
+    while len(names) < n:
+        name = "{} A (initial)".format( wavelength )
+        if name not in names:
+            names.append( name )
+        wavelength += 1
+    return names
+
+def _write_block( f, values, fmt, per_line=6 ):
+    for i in range( 0, len(values), per_line ):
+        f.write( "".join( fmt.format(x) for x in values[i:i+per_line] ) + "\n" )
+
+def _write_output( filename, first, index_heading, index, name, features, rng ):
+    with open( filename, 'w' ) as f:
+        f.write( first )
+        f.write( index_heading + "\n" )
+        _write_block( f, index, "{:12.2f}" )
+        f.write( name + "\n" )
+        for feature in features:
+            f.write( feature + "\n" )
+            _write_block( f, rng.lognormal( 0, 2, len(index) ) * 10.0**rng.randint( -5, 8 ), "{:12.3E}" )
+
+def write_ver( filename, nalt=100, nfeatures=20, seed=0 ):
+    """Write a volume emission rate (.ver) file with `nfeatures` altitude profiles."""
+    rng = np.random.RandomState( seed )
+    _write_output( filename, "{:5d}{:5d}\n".format( nalt, nfeatures ),
+                   "Altitudes (km)", np.linspace( 80, 1000, nalt ),
+                   "Volume emission rates (ph/cm3/s)", feature_names( nfeatures ), rng )
+
+def write_int( filename, nza=19, nfeatures=20, zobs=300.0, seed=0 ):
+    """Write a line-of-sight intensity (.int) file with `nfeatures` zenith angle profiles."""
+    rng = np.random.RandomState( seed )
+    _write_output( filename, "{:5d}{:5d}\nZOBS = {:7.3f} km\n".format( nza, nfeatures, zobs ),
+                   "Zenith Angles (deg)", np.linspace( 90, 180, nza ),
+                   "Intensities (R)", feature_names( nfeatures ), rng )
+
+def write_syn( filename, nwave=1000, nza=19, seed=0 ):
+    """Write a synthetic spectrum (.syn) file with one spectrum per zenith angle."""
+    rng = np.random.RandomState( seed )
+    columns = [ "ZA {:6.2f} deg".format( za ) for za in np.linspace( 90, 180, nza ) ]
+    _write_output( filename, "{:5d}{:5d}\n".format( nwave, nza ),
+                   "Wavelengths (A)", np.linspace( 1000, 2000, nwave ),
+                   "Synthetic spectra (R/A)", columns, rng )
+
+def write_param( filename, nalt=100, params={} ):
+    """Write param.inp with `nalt` altitudes and any other `params` changed."""
+    with open( filename, 'w' ) as f:
+        f.write( _param_format + "\n" )
+    data = parse_params( filename )
+    modify_params( data, dict( params, NALT=nalt ) )
+    write_params( filename, data )
+
+def make_run_dir( path, nalt=100, nza=19, nfeatures=20, nwave=1000, seed=0 ):
+    """Write a complete set of inputs and outputs to directory `path`.
+
+    Writes param.inp, view.inp, radtrans.opt, dbpath.inp, atmos.ver,
+    losint.int and syn.syn. The directory is created if necessary.
+    """
+    os.makedirs( path, exist_ok=True )
+    write_param( os.path.join( path, "param.inp" ), nalt )
+    write_view( os.path.join( path, "view.inp" ), 300.0, np.linspace( 90, 180, nza ) )
+    write_radtrans_options( os.path.join( path, "radtrans.opt" ), {'1304':'ON', '1356':'ON'} )
+    with open( os.path.join( path, "dbpath.inp" ), 'w' ) as f:
+        f.write( os.path.join( path, "database" ) + "\n" )
+    write_ver( os.path.join( path, "atmos.ver" ), nalt, nfeatures, seed )
+    write_int( os.path.join( path, "losint.int" ), nza, nfeatures, seed=seed )
+    write_syn( os.path.join( path, "syn.syn" ), nwave, nza, seed )
+    return path
@@ -0,0 +1,128 @@
+"""Timing records of AURIC commands.
+
+Attach a Tracer to a manager to record the wall time, CPU time, peak memory,
+return code and output file sizes of every command it runs:
+
+    tracer = Tracer()
+    auric.tracer = tracer
+    auric.runbatch()
+    tracer.write_jsonl('trace.jsonl')
+    tracer.write_chrome_trace('trace.json')   # open in chrome://tracing or Perfetto
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+
+class Tracer( object ):
+    """Collects one record per command run.
+
+    Attributes
+    ----------
+    records: list of dictionaries
+        'stage', 'cmd', 'path', 'start' (seconds since the epoch),
+        'wall_time', 'cpu_time' (seconds), 'max_rss' (bytes), 'returncode',
+        'timed_out', 'outputs' (file name -> size in bytes of the files
+        the stage wrote, batch stages only) and 'nalt' (NALT of the run)
+    """
+    def __init__( self ):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __getstate__( self ):
+        return { "records":self.records }
+
+    def __setstate__( self, state ):
+        self.__init__()
+        self.records = state["records"]
+
+    def record( self, result, path=None, stage=None, outputs=None, nalt=None ):
+        """Add a record for a CommandResult.
+
+        Parameters
+        ----------
+        result: CommandResult
+        path: string, optional
+            working directory of the command
+        stage: string, optional
+            name of the stage. Default is the command name.
+        outputs: dictionary, optional
+            file name -> size of the files the command wrote
+        nalt: int, optional
+            number of altitudes of the run, for CostModel
+        """
+        cmd = result.cmd if isinstance( result.cmd, str ) else " ".join( result.cmd )
+        rec = OrderedDict( [ ("stage", stage or cmd.split()[0]),
+                             ("cmd", cmd),
+                             ("path", path),
+                             ("start", result.start),
+                             ("wall_time", result.wall_time),
+                             ("cpu_time", result.cpu_time),
+                             ("max_rss", result.max_rss),
+                             ("returncode", result.returncode),
+                             ("timed_out", result.timed_out),
+                             ("outputs", dict( outputs or {} )),
+                             ("nalt", nalt) ] )
+        with self._lock:
+            self.records.append( rec )
+        return rec
+
+    def extend( self, records ):
+        """Add records taken by another tracer, e.g. a copy of this one in a worker process."""
+        with self._lock:
+            self.records.extend( records )
+
+    def summary( self ):
+        """Total wall time, CPU time and count of each stage, slowest first."""
+        totals = OrderedDict()
+        for rec in self.records:
+            t = totals.setdefault( rec["stage"], {"count":0, "wall_time":0.0, "cpu_time":0.0} )
+            t["count"] += 1
+            t["wall_time"] += rec["wall_time"]
+            t["cpu_time"] += rec["cpu_time"] or 0.0
+        return OrderedDict( sorted( totals.items(), key=lambda kv: -kv[1]["wall_time"] ) )
+
+    def write_jsonl( self, filename ):
+        """Append the records to `filename`, one JSON object per line."""
+        with open( filename, 'a' ) as f:
+            for rec in self.records:
+                f.write( json.dumps( rec ) + "\n" )
+
+    @classmethod
+    def read_jsonl( cls, filename ):
+        """Make a Tracer from records written by write_jsonl."""
+        tracer = cls()
+        with open( filename ) as f:
+            tracer.records = [ json.loads( line, object_pairs_hook=OrderedDict ) for line in f if line.strip() ]
+        return tracer
+
+    def write_chrome_trace( self, filename ):
+        """Write the records in the Chrome trace event format.
+
+        Each working directory is a process and commands that overlap in
+        time are put on separate threads.
+        """
+        events = []
+        pids = OrderedDict()
+        lanes = {}              # pid -> end time of the last event on each lane
+        for rec in sorted( self.records, key=lambda r: r["start"] ):
+            path = rec["path"] or ""
+            if path not in pids:
+                pids[path] = len(pids) + 1
+                lanes[pids[path]] = []
+                events.append( {"name":"process_name", "ph":"M", "pid":pids[path],
+                                "args":{"name":os.path.basename( path ) or path}} )
+            pid = pids[path]
+            start, end = rec["start"], rec["start"] + rec["wall_time"]
+            for tid, busy in enumerate( lanes[pid] ):
+                if busy <= start:
+                    lanes[pid][tid] = end
+                    break
+            else:
+                tid = len( lanes[pid] )
+                lanes[pid].append( end )
+            args = {k:rec[k] for k in ("cmd", "cpu_time", "max_rss", "returncode", "timed_out", "outputs")}
+            events.append( {"name":rec["stage"], "ph":"X", "pid":pid, "tid":tid,
+                            "ts":start * 1e6, "dur":rec["wall_time"] * 1e6, "args":args} )
+        with open( filename, 'w' ) as f:
+            json.dump( {"traceEvents":events, "displayTimeUnit":"ms"}, f )
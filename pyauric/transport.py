@@ -0,0 +1,197 @@
+"""Send parsed outputs from worker processes through shared memory.
+
+Returning DataFrames from sweep workers pickles every value in the worker
+and unpickles it again in the parent. Instead, a worker can parse an output
+file into a shared memory block and return a small SharedBlock describing
+it; the parent attaches the block and reads the values in place:
+
+    results = sweep.run(collect=SharedOutput('mergeint.int'))
+    for r in results:
+        with attach(r.value) as out:
+            peak = out.profile('1356 A (initial)').max()
+
+A block stays in memory until it is released, so attach and release every
+block you get back. Views into a block must not be used after it is
+released. A block belongs to the process that last received its
+SharedBlock; one it never releases is removed when that process exits.
+"""
+import os
+from collections import OrderedDict, namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+try:
+    import pandas as pd
+except ImportError as err:
+    _has_pandas=False
+else:
+    _has_pandas=True
+
+from .reader import auric_file_reader
+
+def _tracker_name( name ):
+    # the resource tracker knows POSIX blocks by their name with a leading slash
+    return name if name.startswith( '/' ) else '/' + name
+
+def _track( name ):
+    if os.name == 'posix':
+        resource_tracker.register( _tracker_name( name ), "shared_memory" )
+
+def _untrack( name ):
+    if os.name == 'posix':
+        resource_tracker.unregister( _tracker_name( name ), "shared_memory" )
+
+class SharedBlock( namedtuple( "SharedBlock", ["name", "shape", "dtype", "index", "features", "ylabel",
+                                               "filename"] ) ):
+    """Description of a parsed output file in shared memory.
+
+    name: name of the shared memory block
+    shape: (1 + number of features, length) of the array in the block
+    dtype: numpy dtype string
+    index: heading of the index (ALT or ZA), which is row 0 of the array
+    features: names of the other rows
+    ylabel: heading of the data section
+    filename: the output file
+
+    Pickling a SharedBlock, e.g. to return it from a worker process, hands
+    the block over to the process that unpickles it: the block is removed
+    when that process exits, unless it was released before.
+    """
+    __slots__ = ()
+
+    def __reduce__( self ):
+        _untrack( self.name )
+        return ( _claim, tuple( self ) )
+
+def _claim( *fields ):
+    block = SharedBlock( *fields )
+    _track( block.name )
+    return block
+
+def share( out, features=None, dtype=np.float64 ):
+    """Copy a dictionary from auric_file_reader.read into a new shared memory block.
+
+    Parameters
+    ----------
+    out: dictionary
+        as returned by auric_file_reader.read(..., returnDataFrame=False)
+    features: list of strings, optional
+        columns to copy. Default is all of them.
+    dtype: numpy dtype
+
+    Returns
+    -------
+    block: SharedBlock
+        the block is removed when this process exits, unless the
+        SharedBlock is sent to another process first
+    """
+    (heading, index), = out['index'].items()
+    features = list( out['data'] ) if features is None else list( features )
+    dtype = np.dtype( dtype )
+    shape = ( 1 + len(features), len(index) )
+    shm = shared_memory.SharedMemory( create=True, size=max( int( np.prod( shape ) ) * dtype.itemsize, 1 ) )
+    try:
+        arr = np.ndarray( shape, dtype=dtype, buffer=shm.buf )
+        arr[0] = index
+        for i, feature in enumerate( features ):
+            arr[i + 1] = out['data'][feature]
+        del arr
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedBlock( shm.name, shape, dtype.str, heading, features, out['ylabel'], out['filename'] )
+
+class SharedOutput( object ):
+    """A Sweep `collect` function that returns an output file as a SharedBlock.
+
+    Parameters
+    ----------
+    fname: string
+        AURIC output file to read from each case
+    features: list of strings, optional
+        profiles to keep. Default is all of them.
+    dtype: numpy dtype
+    """
+    def __init__( self, fname, features=None, dtype=np.float64 ):
+        self.fname = fname
+        self.features = features
+        self.dtype = dtype
+
+    def __call__( self, auric ):
+        # parsed straight from the file: the worker's parse cache would only
+        # hold a second copy of what goes into the block
+        fpath = auric.pathto( self.fname )
+        if not os.path.isfile( fpath ) and os.path.isfile( fpath + '.gz' ):
+            fpath += '.gz'
+        out = auric_file_reader().read( fpath, returnDataFrame=False, engine='numpy' )
+        return share( out, self.features, self.dtype )
+
+class SharedArray( object ):
+    """An attached SharedBlock. Use it as a context manager, or call release.
+
+    Attributes
+    ----------
+    block: SharedBlock
+    data: ndarray
+        view of the block: the index in row 0, then one row per feature
+    """
+    def __init__( self, block ):
+        self.block = block
+        self._shm = shared_memory.SharedMemory( name=block.name )
+        self.data = np.ndarray( block.shape, dtype=block.dtype, buffer=self._shm.buf )
+        self._rows = { name:i + 1 for i, name in enumerate( block.features ) }
+
+    @property
+    def features( self ):
+        return list( self.block.features )
+
+    @property
+    def index( self ):
+        return self.data[0]
+
+    def profile( self, feature ):
+        """Values of `feature`, as a view into the block."""
+        return self.data[self._rows[feature]]
+
+    def read( self, returnDataFrame=True ):
+        """The block as auric_file_reader.read would return it, without copying the values."""
+        b = self.block
+        if returnDataFrame and _has_pandas:
+            df = pd.DataFrame( self.data[1:].T, index=pd.Index( self.index, name=b.index ),
+                               columns=b.features, copy=False )
+            df.ylabel = b.ylabel
+            df.filename = b.filename
+            return df
+        return { 'index':OrderedDict( [ (b.index, self.index) ] ),
+                 'data':OrderedDict( (name, self.profile( name )) for name in b.features ),
+                 'ylabel':b.ylabel,
+                 'filename':b.filename }
+
+    @property
+    def released( self ):
+        return self._shm is None
+
+    def release( self ):
+        """Free the block. Views of it must not be used afterwards."""
+        if self._shm is None:
+            return
+        shm, self._shm, self.data = self._shm, None, None
+        shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            # views of the block are still alive. The memory is freed when
+            # the last of them is, since the block has no name any more.
+            pass
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.release()
+
+def attach( block ):
+    """Attach a SharedBlock made by share in another process."""
+    return SharedArray( block )
@@ -0,0 +1,57 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+
+from pyauric.archive import write_archive, read_archive, archive_name
+from pyauric.manager import AURICManager
+from pyauric.reader import auric_file_reader
+from pyauric.synthetic import make_run_dir, write_ver
+
+
+class Archive(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.path = make_run_dir(self.tempdir.name, nalt=30, nza=7, nfeatures=5)
+        self.reader = auric_file_reader()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testRoundTrip(self):
+        for fname in ("atmos.ver", "losint.int"):
+            filename = os.path.join(self.path, fname)
+            arc = read_archive(write_archive(filename))
+            pd.testing.assert_frame_equal(arc.read(), self.reader.read(filename))
+            expected = self.reader.read(filename, returnDataFrame=False)
+            got = arc.read(returnDataFrame=False)
+            self.assertEqual(got["info"], expected["info"])
+            self.assertEqual(got["ylabel"], expected["ylabel"])
+        self.assertEqual(arc.params["NALT"], 30)
+
+    def testViews(self):
+        filename = os.path.join(self.path, "atmos.ver")
+        arc = read_archive(write_archive(filename, dtype=np.float32))
+        profile = arc.profile(arc.features[2])
+        self.assertEqual(profile.dtype, np.float32)
+        self.assertIsInstance(profile.base, np.memmap)
+        np.testing.assert_allclose(profile, self.reader.read(filename)[arc.features[2]], rtol=1e-6)
+
+    def testLoad(self):
+        auric = AURICManager(self.path)
+        expected = auric.load("atmos.ver")
+        apath = auric.archive("atmos.ver")
+        self.assertEqual(apath, archive_name(auric.pathto("atmos.ver")))
+        pd.testing.assert_frame_equal(auric.load("atmos.ver"), expected)
+        # the archive is used when the text file is gone...
+        os.remove(auric.pathto("atmos.ver"))
+        pd.testing.assert_frame_equal(auric.load("atmos.ver"), expected)
+        # ...but not when it is newer than the archive
+        write_ver(auric.pathto("atmos.ver"), 30, 5, seed=1)
+        self.assertFalse(np.allclose(auric.load("atmos.ver").values, expected.values))
+
+
+if __name__ == "__main__":
+    unittest.main()
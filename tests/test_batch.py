@@ -0,0 +1,217 @@
+import os
+import json
+import stat
+import time
+import asyncio
+import unittest
+from tempfile import TemporaryDirectory
+
+from pyauric.manager import AURICManager, write_radtrans_options
+from pyauric.batch import stage_graph, airglow_sequence, BatchLedger
+from pyauric.trace import Tracer
+from tests.test_sweep import make_auric_dir
+
+
+def make_fake_bin(path, names, script="cat param.inp view.inp > {name}.out"):
+    """Write stand-in executables that each write <name>.out."""
+    for name in names:
+        exe = os.path.join(path, name)
+        with open(exe, "w") as f:
+            f.write("#!/bin/sh\n" + script.format(name=name) + "\n")
+        os.chmod(exe, os.stat(exe).st_mode | stat.S_IEXEC)
+
+
+class Graph(unittest.TestCase):
+    def testNightglow(self):
+        names = list(airglow_sequence(False, True, True, False, {"o2_atm": True}, False))
+        graph = stage_graph(names)
+        self.assertEqual(list(graph), names)
+        self.assertEqual(graph["losint"], ["losden", "niteglo", "radtrans"])
+        self.assertEqual(graph["mergeint"], ["losint", "ly_alpha"])
+        self.assertEqual(graph["mergesyn"], ["mergeint", "syn_atm"])
+
+    def testNoBands(self):
+        names = list(airglow_sequence(True, True, True, False, {"n2_lbh": False}, False))
+        graph = stage_graph(names)
+        self.assertEqual(names[-1], "mergesyn")
+        self.assertEqual(graph["mergesyn"], ["mergeint"])
+        self.assertEqual(graph["solar"], [])
+
+
+class Incremental(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        work = os.path.join(self.tempdir.name, "work")
+        bindir = os.path.join(self.tempdir.name, "bin")
+        os.mkdir(work)
+        os.mkdir(bindir)
+        make_auric_dir(work)
+        write_radtrans_options(os.path.join(work, "radtrans.opt"), {})
+        self.auric = AURICManager(work)
+        make_fake_bin(bindir, [c.cmd for c in self.auric.batch])
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env["PATH"]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testSkipUnchanged(self):
+        names = [c.cmd for c in self.auric.batch]
+        self.assertEqual(self.auric.runbatch(incremental=True), [0] * len(names))
+        self.assertEqual(self.auric.runbatch(incremental=True), [None] * len(names))
+
+    def testTimeout(self):
+        make_fake_bin(os.path.join(self.tempdir.name, "bin"), ["atmos"], "sleep 30")
+        start = time.monotonic()
+        codes = self.auric.runbatch(timeout=0.5)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertNotEqual(codes[0], 0)
+
+    def testPlainRunNotHashed(self):
+        names = [c.cmd for c in self.auric.batch]
+        self.auric.runbatch()
+        atmos = BatchLedger(self.auric.path).stages["atmos"]
+        self.assertIsNone(atmos["outputs"]["atmos.out"][2])
+        self.assertIsNone(atmos["inputs"]["param.inp"][2])
+        # the stamps are enough to skip the stages
+        with self.assertLogs("pyauric.batch", "INFO") as logs:
+            self.assertEqual(self.auric.runbatch(incremental=True), [None] * len(names))
+        self.assertIn("skipped unchanged stages: atmos", logs.output[0])
+
+    def testViewChanged(self):
+        names = [c.cmd for c in self.auric.batch]
+        self.auric.runbatch()
+        self.auric.write("view.inp", options={"ZOBS": 500.0})
+        codes = dict(zip(names, self.auric.runbatch(incremental=True)))
+        self.assertIsNone(codes["atmos"])
+        self.assertIsNone(codes["mergever"])
+        self.assertEqual(codes["losden"], 0)
+        self.assertEqual(codes["mergeint"], 0)
+
+    def testTrace(self):
+        tracer = self.auric.tracer = Tracer()
+        self.auric.runbatch()
+        names = [c.cmd for c in self.auric.batch]
+        self.assertEqual([r["stage"] for r in tracer.records], names)
+        atmos = tracer.records[0]
+        self.assertEqual(atmos["returncode"], 0)
+        self.assertEqual(list(atmos["outputs"]), ["atmos.out"])
+        self.assertGreater(atmos["outputs"]["atmos.out"], 0)
+        self.assertIsNotNone(atmos["cpu_time"])
+        filename = os.path.join(self.tempdir.name, "trace.json")
+        tracer.write_chrome_trace(filename)
+        with open(filename) as f:
+            events = [e for e in json.load(f)["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(len(events), len(names))
+        filename = os.path.join(self.tempdir.name, "trace.jsonl")
+        tracer.write_jsonl(filename)
+        self.assertEqual(Tracer.read_jsonl(filename).records, tracer.records)
+
+    def testOutputRemoved(self):
+        self.auric.runbatch()
+        os.remove(self.auric.pathto("atmos.out"))
+        codes = dict(zip([c.cmd for c in self.auric.batch], self.auric.runbatch(incremental=True)))
+        self.assertEqual(codes["atmos"], 0)
+        self.assertEqual(codes["ionos"], 0)
+        self.assertIsNone(codes["solar"])
+
+    def testVolumeEmissionChanged(self):
+        self.auric.runbatch()
+        os.remove(self.auric.pathto("mergever.out"))
+        codes = dict(zip([c.cmd for c in self.auric.batch], self.auric.runbatch(incremental=True)))
+        self.assertEqual(codes["mergever"], 0)
+        # the line-of-sight stages read the volume emission rates
+        self.assertEqual(codes["losden"], 0)
+        self.assertEqual(codes["losint"], 0)
+        self.assertIsNone(codes["daychem"])
+
+    def rerun(self):
+        """Run the batch incrementally, making stand-ins for commands it didn't have before."""
+        names = [c.cmd for c in self.auric.batch]
+        make_fake_bin(os.path.join(self.tempdir.name, "bin"), names)
+        return dict(zip(names, self.auric.runbatch(incremental=True)))
+
+    def testRadtransOff(self):
+        self.auric.write("radtrans.opt", options={"1304": "ON"})
+        self.assertEqual(self.rerun()["radtrans"], 0)
+        self.auric.write("radtrans.opt", options={})
+        codes = self.rerun()
+        self.assertNotIn("radtrans", codes)
+        self.assertIsNone(codes["losden"])
+        self.assertEqual(codes["losint"], 0)
+        self.assertEqual(codes["mergeint"], 0)
+
+    def testEfluxSwitchedBack(self):
+        self.rerun()
+        self.auric.use_eflux = True
+        codes = self.rerun()
+        self.assertEqual(codes["eflux"], 0)
+        self.assertEqual(codes["e_impact"], 0)
+        self.auric.use_eflux = False
+        codes = self.rerun()
+        self.assertIsNone(codes["pesource"])
+        self.assertEqual(codes["peflux"], 0)
+        self.assertEqual(codes["e_impact"], 0)
+        self.assertEqual(codes["mergever"], 0)
+
+    def testBandSwitchedOff(self):
+        self.auric.band_options.update(n2_lbh=True, n2_vk=True)
+        self.rerun()
+        self.auric.band_options["n2_vk"] = False
+        codes = self.rerun()
+        self.assertNotIn("syn_vk", codes)
+        self.assertIsNone(codes["syn_lbh"])
+        self.assertEqual(codes["mergesyn"], 0)
+        # switching it back on runs it again, and mergesyn after it
+        self.auric.band_options["n2_vk"] = True
+        codes = self.rerun()
+        self.assertEqual(codes["syn_vk"], 0)
+        self.assertEqual(codes["mergesyn"], 0)
+
+
+class Concurrent(unittest.TestCase):
+    bands = ["n2_lbh", "n2_vk", "n2_1pg"]
+
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        work = os.path.join(self.tempdir.name, "work")
+        bindir = os.path.join(self.tempdir.name, "bin")
+        os.mkdir(work)
+        os.mkdir(bindir)
+        make_auric_dir(work)
+        write_radtrans_options(os.path.join(work, "radtrans.opt"), {})
+        self.auric = AURICManager(work, band_options={b: True for b in self.bands})
+        names = [c.cmd for c in self.auric.batch]
+        make_fake_bin(bindir, names)
+        # each syn_* command notes which of them had started while it ran
+        make_fake_bin(bindir, [n for n in names if n.startswith("syn_")],
+                      "touch {name}.start; sleep 0.5; ls *.start > {name}.seen")
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env["PATH"]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def seen(self, name):
+        with open(self.auric.pathto(name + ".seen")) as f:
+            return f.read().split()
+
+    def testSynthetic(self):
+        codes = self.auric.runbatch(concurrency=3)
+        self.assertEqual(codes, [0] * len(codes))
+        self.assertEqual(len(self.seen("syn_lbh")), 3)
+
+    def testAsync(self):
+        codes = asyncio.run(self.auric.runbatch_async(concurrency=3, timeout=30))
+        # the arguments are in the same order as runbatch's
+        self.assertEqual(asyncio.run(self.auric.runbatch_async(30, True, 3)), [None] * len(codes))
+        self.assertEqual(codes, [0] * len(codes))
+        self.assertEqual(len(self.seen("syn_lbh")), 3)
+        self.assertEqual(asyncio.run(self.auric.customrun_async(["atmos"])), [0])
+
+    def testSerial(self):
+        self.auric.runbatch()
+        self.assertEqual(self.seen("syn_lbh"), ["syn_lbh.start"])
+        self.assertEqual(self.auric.runbatch(incremental=True, concurrency=3), [None] * len(self.auric.batch))
+
+
+if __name__ == "__main__":
+    unittest.main()
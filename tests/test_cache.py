@@ -0,0 +1,62 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.cache import ParseCache
+
+
+class LRU(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tempdir.name, "{}.txt".format(i))
+            with open(path, "w") as f:
+                f.write(str(i))
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def parse(self, path):
+        return lambda: np.zeros(100)
+
+    def testHitsAndMisses(self):
+        cache = ParseCache()
+        for _ in range(3):
+            cache.get(("x", self.paths[0]), [self.paths[0]], self.parse(self.paths[0]))
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 800))
+
+    def testEviction(self):
+        cache = ParseCache(maxsize=1600)
+        for path in self.paths:
+            cache.get(path, [path], self.parse(path))
+        # the least recently used entry is gone
+        cache.get(self.paths[0], [self.paths[0]], self.parse(self.paths[0]))
+        self.assertEqual(cache.misses, 4)
+        self.assertEqual(cache.info().currsize, 1600)
+
+    def testChangedFile(self):
+        cache = ParseCache()
+        path = self.paths[0]
+        cache.get(path, [path], self.parse(path))
+        with open(path, "w") as f:
+            f.write("changed")
+        cache.get(path, [path], self.parse(path))
+        self.assertEqual(cache.misses, 2)
+
+    def testInvalidate(self):
+        cache = ParseCache()
+        for path in self.paths:
+            cache.get(path, [path], self.parse(path))
+        cache.invalidate(self.paths[1])
+        self.assertEqual(cache.info().currsize, 1600)
+        cache.invalidate()
+        self.assertEqual(cache.info().currsize, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import time
+import asyncio
+import unittest
+
+from pyauric.command import Command, InputCommand, discard
+
+
+class Streaming(unittest.TestCase):
+    env = {"PATH": os.getenv("PATH")}
+
+    def testChattyCommand(self):
+        # more output than a pipe buffer holds
+        cmd = Command(["sh", "-c", "echo start >&2; seq 200000"], env=self.env, cwd=".", sinks=[discard], tail=3)
+        result = cmd.execute(timeout=30)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(len(result.tail), 3)
+        self.assertEqual(result.tail[-1], ("stdout", "200000"))
+
+    def testSinks(self):
+        lines = []
+        cmd = Command(["sh", "-c", "echo a; echo b"], env=self.env, cwd=".",
+                      sinks=[lambda stream, line: lines.append(line)])
+        self.assertEqual(cmd.run(), 0)
+        self.assertEqual(lines, ["a", "b"])
+
+    def testResourceUsage(self):
+        cmd = Command(["sh", "-c", "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done"], env=self.env, cwd=".")
+        result = cmd.execute()
+        self.assertGreater(result.cpu_time, 0)
+        self.assertGreater(result.max_rss, 0)
+
+    def testTimeout(self):
+        # the background sleep is in the same process group and is killed too
+        cmd = Command(["sh", "-c", "sleep 30 & sleep 30"], env=self.env, cwd=".", sinks=[discard])
+        result = cmd.execute(timeout=0.2)
+        self.assertTrue(result.timed_out)
+        self.assertLess(result.wall_time, 10)
+        self.assertNotEqual(result.returncode, 0)
+
+    def testTimeoutAfterExit(self):
+        # the command exits straight away but a child keeps its output open
+        cmd = Command(["sh", "-c", "sleep 8 & echo started"], env=self.env, cwd=".", sinks=[discard])
+        result = cmd.execute(timeout=1)
+        self.assertTrue(result.timed_out)
+        self.assertLess(result.wall_time, 5)
+        self.assertEqual(result.returncode, 0)
+
+    def testInput(self):
+        lines = []
+        cmd = InputCommand(["cat"], env=self.env, cwd=".", sinks=[lambda stream, line: lines.append(line)])
+        self.assertEqual(cmd.run(b"Y\n"), 0)
+        self.assertEqual(lines, ["Y"])
+
+
+class Async(unittest.TestCase):
+    env = {"PATH": os.getenv("PATH")}
+
+    def testExecute(self):
+        cmd = Command(["sh", "-c", "seq 100000; echo err >&2"], env=self.env, cwd=".", sinks=[discard], tail=2)
+        result = asyncio.run(cmd.execute_async())
+        self.assertEqual(result.returncode, 0)
+        self.assertIn(("stdout", "100000"), result.tail)
+
+    def testInputAndTimeout(self):
+        lines = []
+        cmd = InputCommand(["cat"], env=self.env, cwd=".", sinks=[lambda stream, line: lines.append(line)])
+        self.assertEqual(asyncio.run(cmd.run_async(b"N\n", timeout=10)), 0)
+        self.assertEqual(lines, ["N"])
+        cmd = Command(["sleep", "30"], env=self.env, cwd=".", sinks=[discard])
+        self.assertTrue(asyncio.run(cmd.execute_async(timeout=0.2)).timed_out)
+
+    def testCancel(self):
+        cmd = Command(["sh", "-c", "sleep 30 & sleep 30"], env=self.env, cwd=".", sinks=[discard])
+
+        async def abandon():
+            task = asyncio.ensure_future(cmd.execute_async())
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        start = time.monotonic()
+        asyncio.run(abandon())
+        self.assertLess(time.monotonic() - start, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
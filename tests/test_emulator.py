@@ -0,0 +1,135 @@
+import os
+import unittest
+from collections import OrderedDict
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.emulator import Emulator
+from pyauric.manager import AURICManager
+from pyauric.stack import SweepArray
+from tests.test_batch import make_fake_bin
+from tests.test_sweep import make_auric_dir
+
+_stages = ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact", "daychem", "mergever",
+           "losden", "losint", "mergesyn"]
+
+# writes a .int file with one feature, GLAT + zenith angle, at the zenith angles in view.inp
+_mergeint = r"""glat=$(awk '$1 == "GLAT" {print $3}' param.inp)
+awk -v glat=$glat 'NR == 1 {next} {za[NR - 1] = $1; n = NR - 1}
+END {printf "%5d%5d\nZOBS = %7.3f km\nZenith Angles (deg)\n", n, 1, 300
+     for (i = 1; i <= n; i++) printf "%12.2f\n", za[i]
+     printf "Intensities (R)\n1304 A (initial)\n"
+     for (i = 1; i <= n; i++) printf "%12.3E\n", glat + za[i]}' view.inp > mergeint.int"""
+
+
+def make_array(f, glat, utsec, za=(90.0, 135.0, 180.0), features=("a", "b")):
+    """SweepArray of f(glat, utsec, za) on a grid, with two features: f and 2 f."""
+    g, u, z = np.meshgrid(glat, utsec, za, indexing="ij")
+    values = f(g, u, z)
+    data = np.stack([values, 2 * values], axis=-1)
+    coords = OrderedDict([("GLAT", np.asarray(glat)), ("UTSEC", np.asarray(utsec)),
+                          ("ZA", np.asarray(za)), ("feature", list(features))])
+    return SweepArray(data, ("GLAT", "UTSEC", "ZA", "feature"), coords)
+
+
+class Interpolate(unittest.TestCase):
+    def testLinear(self):
+        f = lambda g, u, z: 3 * g - 0.01 * u + z
+        emu = Emulator(make_array(f, [0, 10, 30, 60], [0, 1000, 5000]))
+        glat, utsec = np.array([5.0, 42.0, 60.0]), np.array([500.0, 4000.0, 0.0])
+        res = emu.query({"GLAT": glat, "UTSEC": utsec})
+        self.assertEqual(res.values.shape, (3, 3, 2))
+        expected = f(glat[:, None], utsec[:, None], np.array([90.0, 135.0, 180.0]))
+        np.testing.assert_allclose(res.values[..., 0], expected)
+        np.testing.assert_allclose(res.values[..., 1], 2 * expected)
+        self.assertTrue(res.trusted.all())
+        self.assertEqual(list(res.distance), [0, 0, 0])
+        self.assertEqual(list(res.source), ["emulator"] * 3)
+
+    def testCubic(self):
+        f = lambda g, u, z: np.sin(np.radians(g)) * np.cos(u / 3000.0) + 0 * z
+        glat = np.linspace(0, 90, 10)
+        utsec = np.linspace(0, 9000, 10)
+        q = {"GLAT": np.linspace(15, 75, 20), "UTSEC": np.linspace(7500, 1500, 20)}
+        expected = f(q["GLAT"], q["UTSEC"], 0)
+        linear = Emulator(make_array(f, glat, utsec)).query(q, ["a"]).values[:, 0, 0]
+        cubic = Emulator(make_array(f, glat, utsec), method="cubic").query(q, ["a"]).values[:, 0, 0]
+        self.assertLess(np.abs(cubic - expected).max(), 1e-3)
+        self.assertLess(np.abs(cubic - expected).max(), np.abs(linear - expected).max() / 10)
+        # a spline goes through the grid points
+        on_grid = Emulator(make_array(f, glat, utsec), method="cubic").query({"GLAT": glat, "UTSEC": utsec[3]})
+        np.testing.assert_allclose(on_grid.values[:, 0, 0], f(glat, utsec[3], 0), atol=1e-12)
+
+    def testUnsortedAxis(self):
+        f = lambda g, u, z: g + u + z
+        emu = Emulator(make_array(f, [30, 0, 10], [100]))
+        res = emu.query([{"GLAT": 20, "UTSEC": 100}])
+        np.testing.assert_allclose(res.values[0, :, 0], f(20, 100, np.array([90.0, 135.0, 180.0])))
+
+    def testDistance(self):
+        emu = Emulator(make_array(lambda g, u, z: g + z, [0, 10, 20], [100]), max_distance=0.5)
+        res = emu.query({"GLAT": [-4, 23, 40, 5], "UTSEC": [100, 100, 100, 200]})
+        np.testing.assert_allclose(res.distance[:3], [0.4, 0.3, 2.0])
+        self.assertEqual(res.distance[3], np.inf)
+        self.assertEqual(list(res.trusted), [True, True, False, False])
+        # outside the grid the edge value is used
+        np.testing.assert_allclose(res.values[2, :, 0], 20 + np.array([90.0, 135.0, 180.0]))
+
+    def testRetrieve(self):
+        emu = Emulator(make_array(lambda g, u, z: g + u + z, [0, 10], [0, 10]))
+        out = emu.retrieve({"GLAT": 5, "UTSEC": 5}, ["b"])
+        self.assertEqual(list(out), ["ZA", "b"])
+        np.testing.assert_allclose(out["b"], 2 * (10 + np.array([90.0, 135.0, 180.0])))
+
+    def testErrors(self):
+        arr = make_array(lambda g, u, z: g, [0, 10], [0])
+        with self.assertRaises(ValueError):
+            Emulator(arr, method="nearest")
+        emu = Emulator(arr)
+        with self.assertRaises(ValueError):
+            emu.query({"GLAT": 1, "UTSEC": 0, "GLON": 3})
+        with self.assertRaises(KeyError):
+            emu.query({"GLAT": 1})
+        with self.assertRaises(ValueError):
+            emu.query({"GLAT": 50, "UTSEC": 0}, run=True)
+
+
+class Fallback(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base, bindir = os.path.join(self.tempdir.name, "base"), os.path.join(self.tempdir.name, "bin")
+        os.mkdir(base)
+        os.mkdir(bindir)
+        make_auric_dir(base)
+        make_fake_bin(bindir, _stages)
+        make_fake_bin(bindir, ["mergeint"], _mergeint.replace("{", "{{").replace("}", "}}"))
+        self.auric = AURICManager(base)
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env.get("PATH", "")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testRunOutsideGrid(self):
+        arr = make_array(lambda g, u, z: g + z, [0, 10, 20], [45000.0], za=(90.0, 180.0),
+                         features=("1304 A (initial)", "1356 A (initial)"))
+        root = os.path.join(self.tempdir.name, "runs")
+        emu = Emulator(arr, auric=self.auric, root=root, fname="mergeint.int", processes=1)
+        res = emu.query({"GLAT": [15, 42], "UTSEC": 45000.0}, features=["1304 A (initial)"], run=True)
+        self.assertEqual(list(res.source), ["emulator", "auric"])
+        self.assertEqual(list(res.trusted), [True, True])
+        np.testing.assert_allclose(res.values[:, :, 0], [[105, 195], [132, 222]])
+        self.assertEqual(res.distance[1], 2.2)
+
+    def testFailedRun(self):
+        arr = make_array(lambda g, u, z: g + z, [0, 10, 20], [45000.0], za=(90.0, 180.0),
+                         features=("1304 A (initial)", "1356 A (initial)"))
+        root = os.path.join(self.tempdir.name, "runs")
+        emu = Emulator(arr, auric=self.auric, root=root, fname="mergeint.int", processes=1)
+        first = emu.query({"GLAT": 50, "UTSEC": 45000.0}, features=["1304 A (initial)"], run=True)
+        self.assertEqual(list(first.source), ["auric"])
+        make_fake_bin(os.path.join(self.tempdir.name, "bin"), ["mergeint"], "exit 1")
+        res = emu.query({"GLAT": 70, "UTSEC": 45000.0}, features=["1304 A (initial)"], run=True)
+        self.assertEqual(list(res.source), ["emulator"])
+        self.assertEqual(list(res.trusted), [False])
+        self.assertEqual(len(os.listdir(root)), 2)
@@ -0,0 +1,101 @@
+import os
+import time
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.batch import batch_stages, run_batch
+from pyauric.fake import FakeAURIC, commands, output_name
+from pyauric.manager import read_auric_file
+from pyauric.sweep import Sweep
+
+_day = ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact", "daychem", "mergever",
+        "losden", "losint", "mergeint"]
+
+
+class Fake(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.fake = FakeAURIC(os.path.join(self.tempdir.name, "auric"), time_scale=0.0, nfeatures=5)
+        self.auric = self.fake.manager(os.path.join(self.tempdir.name, "run"), band_options={"n2_lbh": True})
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testInstall(self):
+        for name in commands:
+            self.assertTrue(os.access(os.path.join(self.fake.bindir, name), os.X_OK))
+        self.assertIn("syn_lbh", commands)
+        self.assertEqual(self.auric.env["AURIC_ROOT"], self.fake.root)
+
+    def testBatch(self):
+        self.auric.deck.set_view(850.0, [100.0, 140.0, 180.0])
+        codes = self.auric.runbatch()
+        self.assertEqual(batch_stages(self.auric), _day + ["syn_lbh", "mergesyn"])
+        self.assertEqual(codes, [0] * 14)
+        ver = read_auric_file(self.auric.pathto("mergever.ver"))
+        self.assertEqual(len(ver["ALT"]), 100)
+        self.assertEqual(len(ver["profiles"]), 5)
+        out = self.auric.retrieve("mergeint.int", ["1304 A (initial)"])
+        np.testing.assert_allclose(out["ZA"], [100.0, 140.0, 180.0])
+        self.assertTrue(self.auric.exists(output_name("mergesyn")))
+        # the outputs only depend on the inputs
+        with open(self.auric.pathto("mergeint.int")) as f:
+            first = f.read()
+        self.auric.runbatch()
+        with open(self.auric.pathto("mergeint.int")) as f:
+            self.assertEqual(f.read(), first)
+
+    def testNightglow(self):
+        self.auric.set_params({"SZA": 150.0, "NALT": 40})
+        self.assertEqual(self.auric.runbatch(), [0] * 8)
+        self.assertEqual(len(self.auric.retrieve("niteglo.ver", [])["ALT"]), 40)
+
+    def testGeoparm(self):
+        self.auric.set_params({"UTSEC": 0.0, "GLON": 0.0})
+        self.assertEqual(self.auric.run_geoparm(False), 0)
+        self.assertGreater(self.auric.params["SZA"], 110)
+
+    def testMissingInput(self):
+        code = self.auric.new_command(["losint"]).run()
+        self.assertEqual(code, 2)
+
+    def testFailure(self):
+        self.auric.env["PYAURIC_FAKE_FAIL"] = "daychem"
+        codes = run_batch(self.auric)
+        self.assertEqual(codes["daychem"], 1)
+        self.assertFalse(self.auric.exists("daychem.ver"))
+        self.fake.configure(fail={"atmos": 1.0})
+        del self.auric.env["PYAURIC_FAKE_FAIL"]
+        self.assertEqual(self.auric.new_command(["atmos"]).run(), 1)
+
+    def testSeededFailures(self):
+        self.fake.configure(fail={"atmos": 0.5}, seed=3)
+        sweep = Sweep(self.auric, {"GLAT": np.arange(0, 60, 5.0)}, os.path.join(self.tempdir.name, "sweep"),
+                      processes=2, retries=0)
+        results = sweep.run()
+        first = [r.status == "done" for r in results]
+        self.assertIn(True, first)
+        self.assertIn(False, first)
+        # the same cases fail again
+        sweep = Sweep(self.auric, {"GLAT": np.arange(0, 60, 5.0)}, os.path.join(self.tempdir.name, "again"),
+                      processes=2, retries=0)
+        self.assertEqual([r.status == "done" for r in sweep.run()], first)
+
+    def testHang(self):
+        self.auric.env["PYAURIC_FAKE_HANG"] = "atmos"
+        start = time.monotonic()
+        result = self.auric.new_command(["atmos"]).execute(timeout=0.5)
+        self.assertTrue(result.timed_out)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def testCost(self):
+        self.fake.configure(stage_cost={"atmos": 0.4}, time_scale=0.5, mode="cpu")
+        self.auric.set_params({"NALT": 200})
+        self.auric.flush()
+        result = self.auric.new_command(["atmos"]).execute()
+        self.assertEqual(result.returncode, 0)
+        self.assertGreaterEqual(result.wall_time, 0.4)
+        with self.assertRaises(ValueError):
+            self.fake.configure(mode="spin")
@@ -0,0 +1,70 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.fanout import run_geometries, split_stages
+from pyauric.manager import AURICManager
+from tests.test_batch import make_fake_bin
+from tests.test_sweep import make_auric_dir
+
+_upstream = ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact", "daychem", "mergever"]
+
+# writes a .int file with one feature, twice the zenith angle, seen from the ZOBS in view.inp
+_mergeint = r"""awk 'NR == 1 {zobs = $1; next} {za[NR - 1] = $1; n = NR - 1}
+END {printf "%5d%5d\nZOBS = %7.3f km\nZenith Angles (deg)\n", n, 1, zobs
+     for (i = 1; i <= n; i++) printf "%12.2f\n", za[i]
+     printf "Intensities (R)\n1304 A (initial)\n"
+     for (i = 1; i <= n; i++) printf "%12.3E\n", 2 * za[i]}' view.inp > mergeint.int"""
+
+
+class FanOut(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base, bindir = os.path.join(self.tempdir.name, "base"), os.path.join(self.tempdir.name, "bin")
+        os.mkdir(base)
+        os.mkdir(bindir)
+        make_auric_dir(base)
+        self.count = os.path.join(self.tempdir.name, "upstream-runs")
+        make_fake_bin(bindir, _upstream, "echo {name} >> " + self.count + "; cat param.inp > {name}.out")
+        # the line-of-sight stages need the volume emission outputs
+        make_fake_bin(bindir, ["losden", "losint", "mergesyn"], "cat mergever.out > /dev/null && cat view.inp > {name}.out")
+        make_fake_bin(bindir, ["mergeint"], _mergeint.replace("{", "{{").replace("}", "}}"))
+        self.auric = AURICManager(base)
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env.get("PATH", "")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testSplit(self):
+        upstream, los = split_stages(_upstream + ["losden", "losint", "mergeint"])
+        self.assertEqual(upstream, _upstream)
+        self.assertEqual(los, ["losden", "losint", "mergeint"])
+
+    def testGeometries(self):
+        geometries = [(300.0, [90.0, 120.0, 180.0]), (850.0, np.linspace(100, 180, 5))]
+        root = os.path.join(self.tempdir.name, "views")
+        results = run_geometries(self.auric, geometries, root, concurrency=2)
+        self.assertEqual([r.error for r in results], [None, None])
+        self.assertEqual(results[0].codes, {"losden": 0, "losint": 0, "mergeint": 0, "mergesyn": 0})
+        for r, (zobs, za) in zip(results, geometries):
+            self.assertEqual(r.array.dims, ("ZA", "feature"))
+            np.testing.assert_allclose(r.array.coords["ZA"], za)
+            np.testing.assert_allclose(r.array.data[:, 0], 2 * np.asarray(za))
+            self.assertTrue(os.path.islink(os.path.join(r.path, "mergever.out")))
+        # the geometries share a read-only copy, not the files of the base run
+        shared = os.path.realpath(os.path.join(results[0].path, "mergever.out"))
+        self.assertNotEqual(shared, os.path.realpath(self.auric.pathto("mergever.out")))
+        self.assertEqual(os.stat(shared).st_mode & 0o222, 0)
+        self.assertNotEqual(os.stat(self.auric.pathto("mergever.out")).st_mode & 0o200, 0)
+        with open(self.count) as f:
+            self.assertEqual(f.read().split(), _upstream)
+        # the volume emission stages are up to date the second time
+        run_geometries(self.auric, geometries[:1], root)
+        with open(self.count) as f:
+            self.assertEqual(len(f.read().split()), len(_upstream))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.geometry import solar_geometry, regime, plan_sweep, day_of_year
+from pyauric.manager import AURICManager
+from pyauric.sweep import Sweep
+from tests.test_batch import make_fake_bin
+from tests.test_sweep import make_auric_dir
+
+
+class Geometry(unittest.TestCase):
+    def testSolarGeometry(self):
+        # equinox at the equator: overhead at noon, underfoot at midnight
+        sza, slt = solar_geometry(92080, [43200, 0], 0.0, 0.0)
+        self.assertLess(sza[0], 3.0)
+        self.assertGreater(sza[1], 177.0)
+        np.testing.assert_allclose((slt - [12.0, 0.0] + 12) % 24 - 12, 0.0, atol=0.2)
+        # June solstice noon at the tropic of cancer
+        sza, slt = solar_geometry(2024173, 43200 - 3600 * 6, 23.44, 90.0)
+        self.assertLess(sza, 1.0)
+        self.assertEqual(sza.shape, ())
+
+    def testBroadcast(self):
+        sza, slt = solar_geometry(92080, np.arange(0, 86400, 3600)[:, None], np.linspace(-60, 60, 5), 0.0)
+        self.assertEqual(sza.shape, (24, 5))
+        self.assertEqual(day_of_year([92080, 5001])[0].tolist(), [1992, 2005])
+
+    def testRegime(self):
+        self.assertEqual(regime([45, 100, 120, 89.5, 90.5], margin=1.0).tolist(),
+                         ["day", "twilight", "night", "day", "day"])
+        self.assertEqual(regime([90.5, 180.0]).tolist(), ["twilight", "twilight"])
+
+
+class Plan(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base, bindir = os.path.join(self.tempdir.name, "base"), os.path.join(self.tempdir.name, "bin")
+        os.mkdir(base)
+        os.mkdir(bindir)
+        make_auric_dir(base)
+        make_fake_bin(bindir, ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact", "daychem",
+                               "mergever", "niteglo", "losden", "losint", "mergeint", "mergesyn"])
+        make_fake_bin(bindir, ["geoparm"], "cat > /dev/null")
+        self.auric = AURICManager(base)
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env.get("PATH", "")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testPlan(self):
+        # noon, dusk and midnight at GLON 0 on the equinox
+        cases = [{"UTSEC": t, "GLAT": 0.0} for t in (43200, 66600, 0)]
+        plan = plan_sweep(self.auric, cases)
+        self.assertEqual(plan.regime.tolist(), ["day", "twilight", "night"])
+        self.assertEqual(plan.invalid, [1])
+        day, night = plan.groups
+        self.assertIn("peflux", day)
+        self.assertIn("niteglo", night)
+        self.assertEqual(list(plan.groups.values()), [[0], [2]])
+        # without geoparm the cases' own SZA is used
+        self.assertEqual(plan_sweep(self.auric, cases, geoparm=False).invalid, [])
+
+    def testSweepSkipsInvalid(self):
+        cases = [{"UTSEC": t, "GLAT": 0.0} for t in (43200, 66600)]
+        sweep = Sweep(self.auric, cases, os.path.join(self.tempdir.name, "sweep"), processes=1, geoparm=False)
+        results = sweep.run()
+        self.assertEqual([r.status for r in results], ["done", "invalid"])
+        self.assertFalse(os.path.exists(sweep.path(1)))
+
+    def testGeoparmTwilight(self):
+        # geoparm puts the case in twilight although the plan keeps it
+        make_fake_bin(os.path.join(self.tempdir.name, "bin"), ["geoparm"],
+                      "cat > /dev/null; echo run >> ../geoparm.log; "
+                      "sed -i 's/^\\( *SZA = *\\)[0-9.]*/\\1 100.00/' param.inp")
+        root = os.path.join(self.tempdir.name, "sweep")
+        sweep = Sweep(self.auric, [{"UTSEC": 43200, "GLAT": 0.0}], root, processes=1, geoparm=False)
+        result, = sweep.run()
+        self.assertEqual(result.status, "invalid")
+        self.assertIn("SZA is 100.00", result.error)
+        with open(os.path.join(root, "geoparm.log")) as f:
+            self.assertEqual(len(f.read().split()), 1)
+        result, = sweep.run(resume=True)
+        self.assertEqual(result.status, "invalid")
+        with open(os.path.join(root, "geoparm.log")) as f:
+            self.assertEqual(len(f.read().split()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from pyauric.manager import AURICManager
+from pyauric.sweep import Sweep, SweepJournal, case_key
+from tests.test_batch import make_fake_bin
+from tests.test_sweep import make_auric_dir
+
+
+class Journal(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base = os.path.join(self.tempdir.name, "base")
+        bindir = os.path.join(self.tempdir.name, "bin")
+        os.mkdir(base)
+        os.mkdir(bindir)
+        make_auric_dir(base)
+        names = ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact",
+                 "daychem", "mergever", "losden", "losint", "mergeint", "mergesyn"]
+        # every case runs except GLAT = 20
+        make_fake_bin(bindir, names, 'grep -Eq "GLAT = +20.00" param.inp && exit 1; cat param.inp > {name}.out')
+        self.auric = AURICManager(base)
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env.get("PATH", "")
+        self.root = os.path.join(self.tempdir.name, "sweep")
+        self.journal = os.path.join(self.root, ".pyauric-sweep.jsonl")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def statuses(self, results):
+        return [r.status for r in results]
+
+    def testResume(self):
+        sweep = Sweep(self.auric, {"GLAT": [10, 20, 30]}, self.root, processes=1, retries=1)
+        self.assertEqual(self.statuses(sweep.run()), ["done", "quarantined", "done"])
+        journal = SweepJournal(self.journal)
+        self.assertEqual(journal.failures(case_key({"GLAT": 20})), 2)
+        self.assertEqual(len(journal.entries), 4)
+        self.assertIn("atmos.out", journal.last(case_key({"GLAT": 10}))["outputs"])
+
+        results = sweep.run(collect=lambda case: case.params["GLAT"], resume=True)
+        self.assertEqual(self.statuses(results), ["skipped", "quarantined", "skipped"])
+        self.assertEqual(results[2].value, 30)
+        self.assertEqual(len(SweepJournal(self.journal).entries), 4)
+
+        # a changed output means the case has to run again
+        with open(os.path.join(sweep.path(0), "losint.out"), "a") as f:
+            f.write("garbage\n")
+        # and a bigger retry budget lets the quarantined case try again
+        sweep.retries = 2
+        results = sweep.run(resume=True)
+        self.assertEqual(self.statuses(results), ["done", "quarantined", "skipped"])
+        self.assertEqual(len(SweepJournal(self.journal).entries), 6)
+
+    def testFreshRun(self):
+        sweep = Sweep(self.auric, [{"GLAT": 10}], self.root, processes=1)
+        sweep.run()
+        self.assertEqual(self.statuses(sweep.run()), ["done"])
+        self.assertEqual(len(SweepJournal(self.journal).entries), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
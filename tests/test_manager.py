@@ -0,0 +1,137 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import pyauric
+from pyauric.manager import AURICManager, read_auric_file, AURICFileIndex, parse_params, update_params
+from pyauric.cache import ParseCache
+from tests.test_reader import write_sample
+
+
+class LazyLoading(unittest.TestCase):
+    features = ["1304 A (initial)", "1356 A (initial)", "O+e 834 A (initial)"]
+
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.filename = os.path.join(self.tempdir.name, "test.ver")
+        write_sample(self.filename, features=self.features)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testIndex(self):
+        index = AURICFileIndex(self.filename)
+        self.assertEqual(index.features, self.features)
+        self.assertEqual(index.header["type"], "Volume emission rates (ph/cm3/s)")
+        self.assertTrue(index.is_current())
+
+    def testSelectedFeatures(self):
+        full = read_auric_file(self.filename)
+        self.assertEqual(len(full["ALT"]), 23)
+        some = read_auric_file(self.filename, features=self.features[1:2])
+        self.assertEqual(list(some["profiles"]), self.features[1:2])
+        self.assertEqual(some["ALT"], full["ALT"])
+        self.assertEqual(some["profiles"][self.features[1]], full["profiles"][self.features[1]])
+
+    def testStaleIndex(self):
+        index = AURICFileIndex(self.filename)
+        write_sample(self.filename, nalt=7, features=self.features[:1])
+        os.utime(self.filename, ns=(0, 0))
+        self.assertFalse(index.is_current())
+        out = read_auric_file(self.filename, index=index)
+        self.assertEqual(list(out["profiles"]), self.features[:1])
+        self.assertEqual(len(out["ALT"]), 7)
+
+
+class ManagerCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        with open(os.path.join(self.tempdir.name, "param.inp"), "w") as f:
+            f.write(pyauric._param_format + "\n")
+        write_sample(os.path.join(self.tempdir.name, "test.ver"))
+        self.auric = AURICManager(self.tempdir.name)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def on_disk(self):
+        return {x[0]: x[1] for x in parse_params(self.auric.pathto("param.inp")) if len(x) > 1}
+
+    def testParams(self):
+        self.assertEqual(self.auric.params["GLAT"], 42.0)
+        self.assertEqual(self.auric.params["GLAT"], 42.0)
+        self.assertEqual(self.auric.cache.hits, 1)
+        self.auric.set_params({"GLAT": 12.0})
+        self.auric.set_params({"GLON": 5.0})
+        self.assertEqual(self.auric.params["GLAT"], 12.0)
+        # nothing is written until the deck is flushed
+        self.assertEqual(self.on_disk()["GLAT"], 42.0)
+        self.assertEqual(self.auric.flush(), ["param.inp"])
+        self.assertEqual(self.on_disk()["GLON"], 5.0)
+        self.assertEqual(self.auric.flush(), [])
+
+    def testChangedOnDisk(self):
+        self.assertEqual(self.auric.params["GLAT"], 42.0)
+        update_params(self.auric.pathto("param.inp"), {"GLAT": -3.0})
+        os.utime(self.auric.pathto("param.inp"), ns=(0, 0))
+        self.assertEqual(self.auric.params["GLAT"], -3.0)
+
+    def testReload(self):
+        # a rewrite of the same size within the same mtime goes unnoticed until reload
+        self.assertEqual(self.auric.params["GLAT"], 42.0)
+        st = os.stat(self.auric.pathto("param.inp"))
+        update_params(self.auric.pathto("param.inp"), {"GLAT": 43.0})
+        os.utime(self.auric.pathto("param.inp"), ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(self.auric.params["GLAT"], 42.0)
+        self.auric.deck.reload("param.inp")
+        self.assertEqual(self.auric.params["GLAT"], 43.0)
+
+    def testRadtrans(self):
+        self.auric.write("radtrans.opt", options={"1304": "ON"})
+        options = self.auric.radtrans_options
+        self.assertEqual(len(options), 12)
+        self.assertTrue(options["1304"])
+        self.assertFalse(options["1356"])
+        self.assertEqual(self.auric.flush(), ["radtrans.opt"])
+        self.assertEqual(self.auric.radtrans_options, options)
+        self.assertEqual(sorted(os.listdir(self.tempdir.name)), ["param.inp", "radtrans.opt", "test.ver"])
+        with self.assertRaises(TypeError):
+            self.auric.write("radtrans.opt", options={}, filename="other.opt")
+
+    def testLoad(self):
+        df = self.auric.load("test.ver")
+        df.iloc[0, 0] = -1.0
+        again = self.auric.load("test.ver")
+        self.assertEqual(self.auric.cache.hits, 1)
+        self.assertNotEqual(again.iloc[0, 0], -1.0)
+        self.auric.load("test.ver", engine="numpy")
+        self.assertEqual(self.auric.cache.misses, 2)
+
+    def testLabels(self):
+        for size in (0, 2**20):
+            self.auric.cache = ParseCache(size)
+            for _ in range(2):
+                df = self.auric.load("test.ver")
+                self.assertEqual(df.filename, self.auric.pathto("test.ver"))
+                self.assertEqual(df.title, "Data from test.ver")
+                self.assertIsInstance(df.ylabel, str)
+
+    def testReadOnly(self):
+        out = self.auric.load("test.ver", returnDataFrame=False)
+        name = next(iter(out["data"]))
+        with self.assertRaises(ValueError):
+            out["data"][name][0] = -1.0
+        out["data"][name] = None
+        self.assertIsNotNone(self.auric.load("test.ver", returnDataFrame=False)["data"][name])
+
+
+class BandOptions(unittest.TestCase):
+    def testNotShared(self):
+        with TemporaryDirectory(prefix="pyauric-test-") as path:
+            first = AURICManager(path)
+            first.band_options["n2_lbh"] = True
+            self.assertFalse(AURICManager(path).band_options["n2_lbh"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from pyauric.manager import AURICManager
+from pyauric.pool import WorkdirPool, clone_file
+from pyauric.sweep import Sweep
+from tests.test_batch import make_fake_bin
+from tests.test_sweep import make_auric_dir
+
+_dayglow = ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact",
+            "daychem", "mergever", "losden", "losint", "mergeint", "mergesyn"]
+
+
+def glat(auric):
+    return auric.params["GLAT"], sorted(os.listdir(auric.path))
+
+
+class Pool(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base = os.path.join(self.tempdir.name, "base")
+        bindir = os.path.join(self.tempdir.name, "bin")
+        os.mkdir(base)
+        os.mkdir(bindir)
+        make_auric_dir(base)
+        make_fake_bin(bindir, _dayglow)
+        self.auric = AURICManager(base)
+        self.auric.env["PATH"] = bindir + ":" + self.auric.env.get("PATH", "")
+        self.root = os.path.join(self.tempdir.name, "pool")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testCloneFile(self):
+        src = self.auric.pathto("dbpath.inp")
+        dst = os.path.join(self.tempdir.name, "dbpath.inp")
+        self.assertIn(clone_file(src, dst), ("reflink", "copy"))
+        self.assertEqual(os.stat(src).st_mtime_ns, os.stat(dst).st_mtime_ns)
+        # files are never hard linked, so writing to the clone leaves the template alone
+        self.assertNotEqual(os.stat(src).st_ino, os.stat(dst).st_ino)
+        with open(dst, "w") as f:
+            f.write("/elsewhere\n")
+        with open(src) as f:
+            self.assertEqual(f.read(), "/dev/null\n")
+
+    def testLeaseResets(self):
+        with WorkdirPool(self.auric, self.root, 1) as pool:
+            with pool.lease() as case:
+                case.set_params({"GLAT": 10.0})
+                case.runbatch()
+                self.assertTrue(case.exists("mergeint.out"))
+                slot = case.path
+            self.assertEqual(sorted(os.listdir(slot)), ["dbpath.inp", "param.inp", "view.inp"])
+            self.assertEqual(self.auric.params["GLAT"], 42.0)
+            with pool.lease() as case:
+                self.assertEqual(case.path, slot)
+                self.assertEqual(case.params["GLAT"], 42.0)
+        self.assertFalse(os.path.exists(self.root))
+
+    def testLeaseTimeout(self):
+        with WorkdirPool(self.auric, self.root, 1) as pool:
+            with pool.lease():
+                with self.assertRaises(TimeoutError):
+                    with pool.lease(timeout=0.01):
+                        pass
+
+    def testSweep(self):
+        for processes in (1, 2):
+            root = os.path.join(self.tempdir.name, "sweep-{}".format(processes))
+            sweep = Sweep(self.auric, {"GLAT": [10, 20, 30]}, root, processes=processes, reuse_workdirs=True)
+            results = sweep.run(collect=glat)
+            self.assertEqual([r.error for r in results], [None] * 3)
+            self.assertEqual([r.value[0] for r in results], [10, 20, 30])
+            self.assertIn("mergeint.out", results[0].value[1])
+            self.assertEqual(len(set(r.path for r in results)), processes)
+            # the pool directories are removed; the sweep journal is all that's left
+            self.assertEqual([f for f in os.listdir(root) if not f.startswith(".")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import fortranformat as ff
+
+from pyauric.reader import auric_file_reader
+
+
+def write_sample(filename, nalt=23, features=("1304 A (initial)", "1356 A (initial)", "O+e 834 A (initial)")):
+    """Write a small .ver-like file, including a short last record in every block."""
+    iw = ff.FortranRecordWriter('6F12.2')
+    dw = ff.FortranRecordWriter('6E12.3')
+    rng = np.random.RandomState(0)
+    alt = np.linspace(100, 1000, nalt)
+    with open(filename, 'w') as f:
+        f.write("{:5d}{:5d}\n".format(nalt, len(features)))
+        f.write("Altitudes (km)\n")
+        f.write(iw.write(alt) + "\n")
+        f.write("Volume emission rates (ph/cm3/s)\n")
+        for feature in features:
+            f.write(feature + "\n")
+            f.write(dw.write(rng.lognormal(size=nalt) * 10.0 ** rng.randint(-30, 30, nalt)) + "\n")
+
+
+class EngineEquivalence(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.filename = os.path.join(self.tempdir.name, "test.ver")
+        write_sample(self.filename)
+        self.reader = auric_file_reader()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testDataFrame(self):
+        expected = self.reader.read(self.filename, engine='fortran')
+        result = self.reader.read(self.filename, engine='numpy')
+        self.assertEqual(list(result.columns), list(expected.columns))
+        self.assertEqual(result.index.name, expected.index.name)
+        np.testing.assert_array_equal(result.index.values, expected.index.values)
+        np.testing.assert_array_equal(result.values, expected.values)
+        self.assertEqual(result.ylabel, expected.ylabel)
+
+    def testDict(self):
+        expected = self.reader.read(self.filename, returnDataFrame=False, engine='fortran')
+        result = self.reader.read(self.filename, returnDataFrame=False, engine='numpy')
+        self.assertEqual(result['info'], expected['info'])
+        self.assertEqual(result['ylabel'], expected['ylabel'])
+        self.assertEqual(list(result['index']), list(expected['index']))
+        self.assertEqual(list(result['data']), list(expected['data']))
+        for k in expected['data']:
+            np.testing.assert_array_equal(result['data'][k], expected['data'][k])
+
+    def testFortranOnlyNumbers(self):
+        # exponents without an 'E' are only understood by the fortran reader
+        with open(self.filename, 'a') as f:
+            f.write("989 A (initial)\n   1.000-100   2.500E+01\n")
+        expected = self.reader.read(self.filename, returnDataFrame=False, engine='fortran')
+        result = self.reader.read(self.filename, returnDataFrame=False, engine='numpy')
+        np.testing.assert_array_equal(result['data']['989 A (initial)'], expected['data']['989 A (initial)'])
+
+    def testCRLF(self):
+        with open(self.filename, 'rb') as f:
+            raw = f.read()
+        with open(self.filename, 'wb') as f:
+            f.write(raw.replace(b"\n", b"\r\n"))
+        expected = self.reader.read(self.filename, returnDataFrame=False, engine='fortran')
+        result = self.reader.read(self.filename, returnDataFrame=False, engine='numpy')
+        self.assertEqual(result['info'], expected['info'])
+        self.assertEqual(result['ylabel'], expected['ylabel'])
+        self.assertEqual(list(result['data']), list(expected['data']))
+        self.assertEqual(len(result['data']), 3)
+        for k in expected['data']:
+            np.testing.assert_array_equal(result['data'][k], expected['data'][k])
+
+    def testBadEngine(self):
+        with self.assertRaises(ValueError):
+            self.reader.read(self.filename, engine='cython')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.fake import FakeAURIC
+from pyauric.retention import RetentionPolicy, read_manifest, verify_manifest, manifest_name
+from pyauric.sweep import Sweep
+
+_rules = [("mergever.ver", "archive"), ("merge*", "compress"), ("*.ver", "delete")]
+
+
+class Policy(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.fake = FakeAURIC(os.path.join(self.tempdir.name, "auric"), time_scale=0.0, nfeatures=4)
+        self.auric = self.fake.manager(os.path.join(self.tempdir.name, "run"), band_options={"n2_lbh": True})
+        self.auric.sinks = []
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testApply(self):
+        self.auric.runbatch()
+        ver = self.auric.load("mergever.ver", returnDataFrame=False)
+        intensities = self.auric.load("mergeint.int", returnDataFrame=False)
+        manifest = RetentionPolicy(_rules).apply(self.auric.path)
+        left = sorted(f for f in os.listdir(self.auric.path))
+        self.assertNotIn("atmos.ver", left)
+        self.assertNotIn("mergeint.int", left)
+        self.assertIn("mergeint.int.gz", left)
+        self.assertIn("mergever.ver.pyar", left)
+        self.assertIn("losint.int", left)
+        self.assertIn(manifest_name, left)
+        self.assertEqual(manifest["mergeint.int.gz"]["action"], "compress")
+        self.assertEqual(manifest["mergever.ver.pyar"]["source"], "mergever.ver")
+        self.assertEqual(manifest["losint.int"]["action"], "keep")
+        self.assertEqual(manifest["param.inp"]["action"], "keep")
+        self.assertEqual(read_manifest(self.auric.path), manifest)
+        self.assertEqual(verify_manifest(self.auric.path), [])
+
+        # load finds the compressed and archived files
+        self.auric.cache.invalidate()
+        for engine in ("numpy", "fortran"):
+            out = self.auric.load("mergeint.int", returnDataFrame=False, engine=engine)
+            for k, v in intensities["data"].items():
+                np.testing.assert_allclose(out["data"][k], v)
+        out = self.auric.load("mergever.ver", returnDataFrame=False)
+        for k, v in ver["data"].items():
+            np.testing.assert_allclose(out["data"][k], v)
+        df = self.auric.load("mergeint.int")
+        self.assertEqual(list(df.columns), list(intensities["data"]))
+
+        # applying it again changes nothing
+        again = RetentionPolicy(_rules).apply(self.auric.path)
+        self.assertEqual(again["mergeint.int.gz"]["sha1"], manifest["mergeint.int.gz"]["sha1"])
+        with open(os.path.join(self.auric.path, "losint.int"), "a") as f:
+            f.write("\n")
+        self.assertEqual(verify_manifest(self.auric.path), ["losint.int"])
+
+    def testBatchScriptKept(self):
+        self.auric.runbatch()
+        with open(self.auric.batchfile, "w") as f:
+            f.write("atmos\n")
+        manifest = RetentionPolicy([("*", "delete")]).apply(self.auric.path)
+        self.assertEqual(manifest["onerun.sh"]["action"], "keep")
+        self.assertTrue(os.path.exists(self.auric.batchfile))
+        self.assertNotIn("mergeint.int", manifest)
+
+    def testCompressRemovesOriginal(self):
+        self.auric.runbatch()
+        RetentionPolicy([("mergeint.int", "compress")]).apply(self.auric.path)
+        left = os.listdir(self.auric.path)
+        self.assertIn("mergeint.int.gz", left)
+        self.assertNotIn("mergeint.int", left)
+
+    def testInvalid(self):
+        with self.assertRaises(ValueError):
+            RetentionPolicy([("*", "shred")])
+        with self.assertRaises(ValueError):
+            RetentionPolicy([], default="shred")
+
+    def testSweep(self):
+        policy = RetentionPolicy([("mergeint.int", "compress")], default="delete")
+        sweep = Sweep(self.auric, {"GLAT": [0.0, 30.0]}, os.path.join(self.tempdir.name, "sweep"),
+                      processes=2, retention=policy)
+        results = sweep.run()
+        self.assertEqual([r.status for r in results], ["done", "done"])
+        for r in results:
+            files = set(os.listdir(r.path)) - {".pyauric-batch.json", manifest_name}
+            self.assertEqual(files, {"mergeint.int.gz", "param.inp", "view.inp", "radtrans.opt", "dbpath.inp"})
+        # the journal checks the files that were left
+        self.assertEqual([r.status for r in sweep.run(resume=True)], ["skipped", "skipped"])
+
+    def testPooledSweep(self):
+        # pool slots are reset after each case, so the policy isn't applied there
+        class Refuse(RetentionPolicy):
+            def apply(self, path, params=None):
+                raise AssertionError("applied to a pool slot")
+        sweep = Sweep(self.auric, {"GLAT": [0.0, 30.0]}, os.path.join(self.tempdir.name, "pooled"),
+                      processes=1, reuse_workdirs=True, retention=Refuse([]))
+        results = sweep.run(collect=lambda case: case.exists("mergeint.int"))
+        self.assertEqual([r.error for r in results], [None, None])
+        self.assertEqual([r.value for r in results], [True, True])
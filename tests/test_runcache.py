@@ -0,0 +1,60 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from pyauric.manager import AURICManager, write_radtrans_options
+from pyauric.runcache import RunCache
+from tests.test_sweep import make_auric_dir
+from tests.test_batch import make_fake_bin
+
+
+class Reuse(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        work = os.path.join(self.tempdir.name, "work")
+        self.bindir = os.path.join(self.tempdir.name, "bin")
+        os.mkdir(work)
+        os.mkdir(self.bindir)
+        make_auric_dir(work)
+        write_radtrans_options(os.path.join(work, "radtrans.opt"), {})
+        self.auric = AURICManager(work)
+        self.auric.env["PATH"] = self.bindir + ":" + self.auric.env["PATH"]
+        make_fake_bin(self.bindir, [c.cmd for c in self.auric.batch])
+        self.auric.run_cache = RunCache(os.path.join(self.tempdir.name, "cache"))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testBinariesChanged(self):
+        self.auric.runbatch()
+        key = self.auric.run_cache.key(self.auric)
+        self.assertIn(key, self.auric.run_cache)
+        os.utime(os.path.join(self.bindir, "atmos"), ns=(0, 0))
+        self.assertNotEqual(self.auric.run_cache.key(self.auric), key)
+
+    def testHit(self):
+        self.auric.runbatch()
+        clone = self.auric.clone(os.path.join(self.tempdir.name, "clone"))
+        clone.env = self.auric.env
+        with self.assertLogs("pyauric.manager", "INFO"):
+            self.assertEqual(set(clone.runbatch()), {None})
+        with open(clone.pathto("losint.out")) as f, open(self.auric.pathto("losint.out")) as g:
+            self.assertEqual(f.read(), g.read())
+        # the restored outputs are in the ledger, so an incremental run has nothing to do
+        clone.run_cache = None
+        self.assertEqual(set(clone.runbatch(incremental=True)), {None})
+
+    def testKey(self):
+        cache = self.auric.run_cache
+        key = cache.key(self.auric)
+        self.auric.set_params({"GLAT": 10.0})
+        self.assertNotEqual(cache.key(self.auric), key)
+
+    def testEviction(self):
+        self.auric.run_cache.maxsize = 0
+        self.auric.runbatch()
+        self.assertEqual(self.auric.run_cache.entries(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
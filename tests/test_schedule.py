@@ -0,0 +1,87 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from pyauric.command import CommandResult
+from pyauric.manager import AURICManager
+from pyauric.schedule import CostModel
+from pyauric.sweep import Sweep
+from pyauric.trace import Tracer
+from tests.test_batch import make_fake_bin
+from tests.test_sweep import make_auric_dir
+
+
+class Model(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.auric = AURICManager(self.tempdir.name)
+        make_auric_dir(self.tempdir.name)
+        self.model = CostModel()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testPredict(self):
+        day = self.model.predict(self.auric, {"SZA": 30})
+        night = self.model.predict(self.auric, {"SZA": 130})
+        self.assertGreater(day, night)
+        self.assertGreater(self.model.predict(self.auric, {"SZA": 130, "NALT": 300}), 2 * night)
+        self.auric.band_options["n2_lbh"] = True
+        self.assertAlmostEqual(self.model.predict(self.auric, {"SZA": 30}), day + 3.0)
+        self.assertEqual(self.model.predict(self.auric, {"SZA": 100}), 0.0)
+
+    def testUpdate(self):
+        tracer = Tracer()
+        for wall_time, code in [(4.0, 0), (6.0, 0), (100.0, 1)]:
+            tracer.record(CommandResult("peflux", code, wall_time, [], False, 0.0, None, None), nalt=200)
+        self.model.update(tracer)
+        self.assertEqual(self.model.samples["peflux"], 2)
+        self.assertAlmostEqual(self.model.cost("peflux", 100), 2.5)
+        self.assertAlmostEqual(self.model.cost("peflux", 400), 10.0)
+
+
+class Scheduled(unittest.TestCase):
+    def testLongestFirst(self):
+        with TemporaryDirectory(prefix="pyauric-test-") as tempdir:
+            base, bindir = os.path.join(tempdir, "base"), os.path.join(tempdir, "bin")
+            os.mkdir(base)
+            os.mkdir(bindir)
+            make_auric_dir(base)
+            make_fake_bin(bindir, ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact",
+                                   "daychem", "mergever", "niteglo", "losden", "losint", "mergeint", "mergesyn"])
+            auric = AURICManager(base)
+            auric.env["PATH"] = bindir + ":" + auric.env.get("PATH", "")
+            started = []
+            cases = [{"SZA": 130}, {"SZA": 30}, {"SZA": 130, "NALT": 300}]
+            sweep = Sweep(auric, cases, os.path.join(tempdir, "sweep"), processes=1, schedule=CostModel())
+            results = sweep.run(collect=lambda case: started.append((case.params["SZA"], case.params["NALT"])) or case.params["NALT"])
+            self.assertEqual([r.status for r in results], ["done"] * 3)
+            self.assertEqual([r.value for r in results], [100, 100, 300])
+            self.assertEqual(started, [(30, 100), (130, 300), (130, 100)])
+
+
+    def testWorkerTimings(self):
+        with TemporaryDirectory(prefix="pyauric-test-") as tempdir:
+            base, bindir = os.path.join(tempdir, "base"), os.path.join(tempdir, "bin")
+            os.mkdir(base)
+            os.mkdir(bindir)
+            make_auric_dir(base)
+            stages = ["atmos", "ionos", "solar", "colden", "pesource", "peflux", "e_impact",
+                      "daychem", "mergever", "losden", "losint", "mergeint", "mergesyn"]
+            make_fake_bin(bindir, stages)
+            auric = AURICManager(base)
+            auric.env["PATH"] = bindir + ":" + auric.env.get("PATH", "")
+            for processes, reuse in [(1, False), (2, False), (2, True)]:
+                auric.tracer = Tracer()
+                sweep = Sweep(auric, [{"SZA": 30}, {"SZA": 40}], os.path.join(tempdir, "sweep"),
+                              processes=processes, reuse_workdirs=reuse)
+                sweep.run()
+                self.assertEqual(len(auric.tracer.records), 2 * len(stages))
+                model = CostModel().update(auric.tracer)
+                self.assertEqual(model.samples["peflux"], 2)
+                with open(os.path.join(tempdir, "sweep", ".pyauric-sweep.jsonl")) as f:
+                    self.assertNotIn("trace", f.readline())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import gzip
+import time
+import asyncio
+import unittest
+from tempfile import TemporaryDirectory
+
+from pyauric.fake import FakeAURIC
+from pyauric.pool import clone_settings
+from pyauric.runcache import RunCache
+from pyauric.scratch import Scratch
+
+_merged = ["mergeint.int", "mergesyn.syn", "mergever.ver"]
+
+
+class Tight(Scratch):
+    """A Scratch whose filesystem fills up during every run."""
+    def _full(self):
+        return True
+
+
+class InMemory(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        fake = FakeAURIC(os.path.join(self.tempdir.name, "auric"), time_scale=0.0, nfeatures=3)
+        self.auric = fake.manager(os.path.join(self.tempdir.name, "run"), band_options={"n2_lbh": True})
+        self.root = os.path.join(self.tempdir.name, "shm")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def outputs(self):
+        return sorted(f for f in os.listdir(self.auric.path) if not f.endswith((".inp", ".opt")))
+
+    def testKeep(self):
+        self.auric.scratch = Scratch(self.root, reserve=0)
+        self.assertEqual(set(self.auric.runbatch()), {0})
+        self.assertEqual(self.auric.scratch.last, "memory")
+        self.assertEqual(self.auric.scratch.persisted, _merged)
+        self.assertEqual(self.outputs(), _merged)
+        self.assertEqual(os.listdir(self.root), [])
+        self.assertGreater(self.auric.scratch.peak, 0)
+        self.assertEqual(len(self.auric.retrieve("mergeint.int", [])["ZA"]), 19)
+
+    def testCompress(self):
+        self.auric.scratch = Scratch(self.root, keep=["mergeint.int"], compress=True, reserve=0)
+        self.auric.runbatch()
+        self.assertEqual(self.outputs(), ["mergeint.int.gz"])
+        with gzip.open(self.auric.pathto("mergeint.int.gz"), "rt") as f:
+            self.assertTrue(f.readline().strip())
+        # an uncompressed copy replaces the compressed one
+        self.auric.scratch.compress = False
+        self.auric.runbatch()
+        self.assertEqual(self.outputs(), ["mergeint.int"])
+
+    def testNoRoom(self):
+        self.auric.scratch = Scratch(self.root, reserve=2**62)
+        self.assertFalse(self.auric.scratch.fits())
+        self.assertEqual(set(self.auric.runbatch()), {0})
+        self.assertEqual(self.auric.scratch.last, "disk")
+        self.assertIn("atmos.ver", self.outputs())
+
+    def testFilledUp(self):
+        self.auric.scratch = Tight(self.root, reserve=0)
+        self.auric.env["PYAURIC_FAKE_FAIL"] = "mergesyn"
+        codes = self.auric.runbatch()
+        self.assertEqual(codes[-1], 1)
+        self.assertEqual(self.auric.scratch.last, "disk")
+        self.assertIn("atmos.ver", self.outputs())
+        self.assertEqual(os.listdir(self.root), [])
+
+    def testRunCache(self):
+        self.auric.scratch = Scratch(self.root, reserve=0)
+        self.auric.run_cache = RunCache(os.path.join(self.tempdir.name, "cache"))
+        self.auric.runbatch()
+        clone = self.auric.clone(os.path.join(self.tempdir.name, "clone"), **clone_settings(self.auric))
+        self.assertIs(clone.scratch, self.auric.scratch)
+        self.assertEqual(set(clone.runbatch()), {None})
+        self.assertTrue(clone.exists("mergeint.int"))
+
+    def testTimeout(self):
+        self.auric.scratch = Scratch(self.root, reserve=0)
+        self.auric.env["PYAURIC_FAKE_HANG"] = "atmos"
+        start = time.monotonic()
+        codes = self.auric.runbatch(timeout=0.5)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertNotEqual(codes[0], 0)
+
+    def testAsync(self):
+        self.auric.scratch = Scratch(self.root, reserve=0)
+        codes = asyncio.run(self.auric.runbatch_async(concurrency=2))
+        self.assertEqual(set(codes), {0})
+        self.assertEqual(self.outputs(), _merged)
@@ -0,0 +1,74 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.manager import AURICManager, read_auric_file
+from pyauric.stack import open_stack
+from pyauric.sweep import Sweep, CaseResult
+from pyauric.synthetic import write_ver, write_int, feature_names
+from tests.test_sweep import make_auric_dir
+
+
+class Stack(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base = os.path.join(self.tempdir.name, "base")
+        os.mkdir(base)
+        make_auric_dir(base)
+        self.auric = AURICManager(base)
+        self.root = os.path.join(self.tempdir.name, "sweep")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def fake_outputs(self, sweep, write, skip=()):
+        # stand in for sweep.run(): each case gets its own output file
+        for i in range(len(sweep)):
+            if i in skip:
+                continue
+            os.makedirs(sweep.path(i))
+            write(os.path.join(sweep.path(i), "out"), 10, 4, seed=i)
+
+    def testGrid(self):
+        sweep = Sweep(self.auric, {"GLAT": [0, 30], "UTSEC": [0, 100, 200]}, self.root)
+        self.fake_outputs(sweep, write_ver)
+        features = feature_names(4)[1:3]
+        arr = sweep.stack("out", features)
+        self.assertEqual(arr.dims, ("GLAT", "UTSEC", "ALT", "feature"))
+        self.assertEqual(arr.shape, (2, 3, 10, 2))
+        self.assertEqual(list(arr.coords["UTSEC"]), [0, 100, 200])
+        expected = read_auric_file(os.path.join(sweep.path(4), "out"))
+        np.testing.assert_allclose(arr.data[1, 1, :, 0], expected["profiles"][features[0]])
+        np.testing.assert_allclose(arr.feature(features[1])[1, 1], expected["profiles"][features[1]])
+        np.testing.assert_allclose(arr.coords["ALT"], expected["ALT"])
+
+    def testMemmap(self):
+        sweep = Sweep(self.auric, [{"GLAT": 0}, {"GLAT": 10, "GLON": 5}, {"GLAT": 20}], self.root)
+        self.fake_outputs(sweep, write_int, skip=[1])
+        filename = os.path.join(self.tempdir.name, "stack.npy")
+        arr = sweep.stack("out", filename=filename)
+        self.assertEqual(arr.dims, ("case", "ZA", "feature"))
+        self.assertTrue(np.isnan(arr.data[1]).all())
+        self.assertTrue(np.isnan(arr.coords["GLON"][0]))
+        again = open_stack(filename)
+        self.assertIsInstance(again.data, np.memmap)
+        self.assertEqual(again.dims, arr.dims)
+        self.assertEqual(again.coords["feature"], feature_names(4))
+        np.testing.assert_array_equal(again.data[2], arr.data[2])
+
+    def testFailedCasesLeftOut(self):
+        sweep = Sweep(self.auric, {"GLAT": [0, 30, 60]}, self.root)
+        self.fake_outputs(sweep, write_ver)
+        results = [CaseResult(0, sweep.cases[0], sweep.path(0), [0, 0], None, None, "done"),
+                   CaseResult(1, sweep.cases[1], sweep.path(1), [0, 1], None, None, "quarantined"),
+                   CaseResult(2, sweep.cases[2], sweep.path(2), [0, 0], None, None, "skipped")]
+        arr = sweep.stack("out", results=results)
+        self.assertFalse(np.isnan(arr.data[0]).any())
+        self.assertTrue(np.isnan(arr.data[1]).all())
+        self.assertFalse(np.isnan(arr.data[2]).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
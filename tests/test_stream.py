@@ -0,0 +1,65 @@
+import os
+import threading
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.archive import write_archive
+from pyauric.manager import read_auric_file
+from pyauric.stream import iter_profiles, find_outputs
+from pyauric.synthetic import write_ver, write_int, feature_names
+
+
+class Stream(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.root = self.tempdir.name
+        for i in range(6):
+            path = os.path.join(self.root, "run-{}".format(i))
+            os.mkdir(path)
+            write_ver(os.path.join(path, "atmos.ver"), 12, 4, seed=i)
+            write_int(os.path.join(path, "losint.int"), 5, 3, seed=i)
+            with open(os.path.join(path, "notes.txt"), "w") as f:
+                f.write("not an output\n")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testWalk(self):
+        files = list(find_outputs(self.root))
+        self.assertEqual(len(files), 12)
+        self.assertEqual(files[0], ("run-0", os.path.join(self.root, "run-0", "atmos.ver")))
+
+    def testRecords(self):
+        for prefetch in (0, 2):
+            records = list(iter_profiles(self.root, prefetch=prefetch))
+            self.assertEqual(len(records), 6 * (4 + 3))
+            rec = records[4]
+            self.assertEqual((rec.run, rec.feature), ("run-0", feature_names(3)[0]))
+            expected = read_auric_file(rec.file)
+            np.testing.assert_allclose(rec.values, expected["profiles"][rec.feature])
+            np.testing.assert_allclose(rec.index, expected["ZA"])
+
+    def testFeaturesAndArchives(self):
+        write_archive(os.path.join(self.root, "run-3", "atmos.ver"))
+        names = feature_names(4)[1:2]
+        records = list(iter_profiles(self.root, features=names, patterns=("*.ver",)))
+        self.assertEqual([r.feature for r in records], names * 6)
+        self.assertIsInstance(records[3].values.base, np.memmap)
+        records = list(iter_profiles(self.root, features=lambda name: name.startswith("1356")))
+        self.assertEqual(len(records), 12)
+
+    def testEarlyExit(self):
+        stream = iter_profiles(self.root, prefetch=1)
+        next(stream)
+        stream.close()
+        self.assertFalse([t for t in threading.enumerate() if t.name == "pyauric-prefetch"])
+
+    def testErrors(self):
+        with self.assertRaises(FileNotFoundError):
+            list(iter_profiles([("missing", os.path.join(self.root, "missing.ver"))]))
+
+
+if __name__ == "__main__":
+    unittest.main()
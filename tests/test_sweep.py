@@ -0,0 +1,74 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import pyauric
+from pyauric.fake import FakeAURIC
+from pyauric.manager import AURICManager, parse_params
+from pyauric.sweep import Sweep, param_grid
+
+
+def make_auric_dir(path):
+    """Write the input files a cloneable AURIC directory needs."""
+    with open(os.path.join(path, "param.inp"), "w") as f:
+        f.write(pyauric._param_format + "\n")
+    with open(os.path.join(path, "dbpath.inp"), "w") as f:
+        f.write("/dev/null\n")
+    with open(os.path.join(path, "view.inp"), "w") as f:
+        f.write("   300.0000   observer altitude (km)\n    90.00000\n   180.00000\n")
+
+
+class Grid(unittest.TestCase):
+    def testOrder(self):
+        cases = param_grid({"GLAT": [0, 30], "UTSEC": [0, 100, 200]})
+        self.assertEqual(len(cases), 6)
+        self.assertEqual(dict(cases[1]), {"GLAT": 0, "UTSEC": 100})
+        self.assertEqual(dict(cases[3]), {"GLAT": 30, "UTSEC": 0})
+
+
+class RunSweep(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        base = os.path.join(self.tempdir.name, "base")
+        os.mkdir(base)
+        make_auric_dir(base)
+        self.auric = AURICManager(base)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testCasesAreIsolated(self):
+        # the cases run the fake executables the base manager's environment points to
+        fake = FakeAURIC(os.path.join(self.tempdir.name, "auric"), time_scale=0.0)
+        self.auric.env.update(fake.env)
+        sweep = Sweep(self.auric, {"GLAT": [10, 20, 30]}, os.path.join(self.tempdir.name, "sweep"), processes=2)
+        results = sweep.run()
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        for r in results:
+            self.assertIsNone(r.error)
+            self.assertTrue(r.codes)
+            self.assertEqual(set(r.codes), {0})
+            params = {x[0]: x[1] for x in parse_params(os.path.join(r.path, "param.inp")) if len(x) > 1}
+            self.assertEqual(params["GLAT"], r.params["GLAT"])
+        self.assertEqual(len(set(r.path for r in results)), 3)
+
+    def testFailureLeavesNoOutputs(self):
+        fake = FakeAURIC(os.path.join(self.tempdir.name, "auric"), time_scale=0.0)
+        self.auric.env.update(fake.env)
+        sweep = Sweep(self.auric, [{"GLAT": 10}], os.path.join(self.tempdir.name, "sweep"), processes=1, retries=0)
+        first, = sweep.run(collect=_has_mergeint)
+        self.assertTrue(first.value)
+        self.auric.env["PYAURIC_FAKE_FAIL"] = "mergeint"
+        again, = sweep.run(collect=_has_mergeint)
+        self.assertEqual(again.status, "quarantined")
+        self.assertIsNone(again.value)
+        self.assertFalse(os.path.exists(os.path.join(again.path, "mergeint.int")))
+        self.assertTrue(os.path.exists(os.path.join(again.path, "param.inp")))
+
+
+def _has_mergeint(auric):
+    return auric.exists("mergeint.int")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from pyauric.manager import read_auric_file, read_view, read_radtrans_options, parse_params
+from pyauric.reader import auric_file_reader
+from pyauric.synthetic import make_run_dir
+
+
+class Generator(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.path = make_run_dir(self.tempdir.name, nalt=50, nza=7, nfeatures=15, nwave=40)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testOutputs(self):
+        reader = auric_file_reader()
+        for fname, shape in [("atmos.ver", (50, 15)), ("losint.int", (7, 15)), ("syn.syn", (40, 7))]:
+            fpath = os.path.join(self.path, fname)
+            df = reader.read(fpath)
+            self.assertEqual(df.shape, shape)
+            np.testing.assert_array_equal(reader.read(fpath, engine="numpy").values, df.values)
+        ver = read_auric_file(os.path.join(self.path, "atmos.ver"))
+        self.assertEqual(len(ver["ALT"]), 50)
+        self.assertEqual(len(ver["profiles"]), 15)
+        intensities = read_auric_file(os.path.join(self.path, "losint.int"))
+        self.assertEqual(intensities["ZOBS"], 300.0)
+        self.assertEqual(len(intensities["ZA"]), 7)
+
+    def testInputs(self):
+        params = {x[0]: x[1] for x in parse_params(os.path.join(self.path, "param.inp")) if len(x) > 1}
+        self.assertEqual(params["NALT"], 50)
+        h, za = read_view(os.path.join(self.path, "view.inp"))
+        self.assertEqual(len(za), 7)
+        self.assertTrue(read_radtrans_options(os.path.join(self.path, "radtrans.opt"))["1304"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+
+from pyauric.manager import AURICManager
+from pyauric.reader import auric_file_reader
+from pyauric.synthetic import make_run_dir, feature_names
+from pyauric.transport import SharedOutput, attach
+
+
+class Transport(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory(prefix="pyauric-test-")
+        self.path = make_run_dir(self.tempdir.name, nalt=20, nza=9, nfeatures=6)
+        self.auric = AURICManager(self.path)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testFromWorker(self):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            block = pool.submit(SharedOutput("losint.int"), self.auric).result()
+        expected = auric_file_reader().read(self.auric.pathto("losint.int"))
+        with attach(block) as out:
+            self.assertEqual(out.features, list(expected.columns))
+            df = out.read()
+            pd.testing.assert_frame_equal(df, expected)
+            self.assertTrue(np.shares_memory(df.values, out.data))
+            del df
+        self.assertTrue(out.released)
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=block.name)
+
+    def testFeatures(self):
+        names = feature_names(6)[2:4]
+        block = SharedOutput("atmos.ver", names, np.float32)(self.auric)
+        self.assertEqual(block.shape, (3, 20))
+        out = attach(block)
+        try:
+            np.testing.assert_allclose(out.profile(names[1]), self.auric.load("atmos.ver")[names[1]], rtol=1e-6)
+        finally:
+            out.release()
+            out.release()
+
+    def testUnclaimed(self):
+        # a block nobody releases is removed when the process holding it exits
+        script = ("import sys; from pyauric.manager import AURICManager; "
+                  "from pyauric.transport import SharedOutput; "
+                  "print(SharedOutput('losint.int')(AURICManager(sys.argv[1])).name)")
+        name = subprocess.run([sys.executable, "-c", script, self.path], check=True, capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()